@@ -0,0 +1,109 @@
+import hmac
+import json
+import time
+import hashlib
+from threading import Lock, Timer
+
+UNLOCKED = "unlocked"
+LOCKED = "locked"
+
+
+# Command topic of a camera's door agent (Transmitter scripts/door_agent.py)
+def actuator_topic(camera_id):
+    return f"doors/{camera_id}/actuator"
+
+
+# HMAC-SHA256 over every field of a command but "sig"; the door agent checks it with the same key
+def command_signature(command, key):
+    body = json.dumps({k: v for k, v in command.items() if k != "sig"}, sort_keys=True, separators=(",", ":"))
+    return hmac.new(key.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+
+# MEC side of a door / LED: turns recognition results into agent commands.
+# A recognized face unlocks right away and keeps the door unlocked for `hold`
+# seconds after the last recognition; anything else only locks once that
+# hold runs out. Commands are published on state changes only (plus a
+# refresh every `refresh` seconds while unlocked, so the agent's failsafe
+# ttl does not lock a door that is still in use), never per frame.
+# Commands carry a timestamp and are signed with `key`, shared with the agent.
+# `publish(topic, payload, qos=..., retain=...)` sends over MQTT.
+class DoorActuator:
+
+    def __init__(self, camera_id, publish, key, hold=3.0, refresh=10.0, ttl=30.0):
+        self.camera_id = camera_id
+        self.topic = actuator_topic(camera_id)
+        self.publish = publish
+        self.key = key
+        self.hold = hold
+        self.refresh = refresh
+        self.ttl = ttl
+
+        self.state = None
+        self.unlock_until = 0.0
+        self.last_sent = 0.0
+        self._lock = Lock()
+        self._timer = None
+
+        self.requests = 0
+        self.sent = 0
+
+    # Apply a recognition status ("Recognized" unlocks, anything else locks after the hold)
+    def set(self, status, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.requests += 1
+            if status == "Recognized":
+                self.unlock_until = now + self.hold
+                if self.state != UNLOCKED or now - self.last_sent >= self.refresh:
+                    self._send(UNLOCKED, now)
+                self._arm(self.hold)
+            elif self.state is None:
+                self._send(LOCKED, now)  # Ensure LED is off at the start
+            # else: an unlocked door locks when its hold timer fires
+
+    # Lock immediately (shutdown)
+    def lock(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.unlock_until = 0.0
+            if self.state != LOCKED:
+                self._send(LOCKED, time.monotonic())
+
+    def _send(self, state, now):
+        payload = {"state": state, "ts": time.time()}
+        if state == UNLOCKED:
+            payload["ttl"] = self.ttl
+        payload["sig"] = command_signature(payload, self.key)
+        try:
+            self.publish(self.topic, json.dumps(payload), qos=1)
+        except Exception as e:
+            print(f"Error sending {state} to {self.camera_id}: {e}")
+            return
+        self.state = state
+        self.last_sent = now
+        self.sent += 1
+        print(f"{self.camera_id}: door {state}")
+
+    # One pending timer per door, pushed back as long as recognitions keep arriving
+    def _arm(self, delay):
+        if self._timer is None:
+            self._timer = Timer(delay, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            self._timer = None
+            now = time.monotonic()
+            if self.state != UNLOCKED:
+                return
+            if now < self.unlock_until:
+                self._arm(self.unlock_until - now)
+            else:
+                self._send(LOCKED, now)
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "requests": self.requests, "sent": self.sent}
@@ -0,0 +1,206 @@
+import time
+import asyncio
+import requests
+from threading import Lock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from options import Options
+
+# aiohttp is optional; without it the asyncio client runs requests in threads
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# Routes that add data on the server: repeating one that may have reached the
+# server would register the face twice, so these are only retried when the
+# connection could not be made (the request was never sent)
+NON_IDEMPOTENT_ROUTES = ("vision/face/register",)
+
+
+# Per-endpoint request / error counts and latency, shared by both clients
+class EndpointStats:
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = Lock()
+
+    def record(self, route, elapsed, ok):
+        with self._lock:
+            s = self._stats.setdefault(route, {"requests": 0, "errors": 0, "total_s": 0.0,
+                                               "max_s": 0.0, "last_s": 0.0})
+            s["requests"] += 1
+            if not ok:
+                s["errors"] += 1
+            s["total_s"] += elapsed
+            s["last_s"] = elapsed
+            s["max_s"] = max(s["max_s"], elapsed)
+
+    # Milliseconds per endpoint
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {route: {"requests": s["requests"],
+                            "errors": s["errors"],
+                            "avg_ms": 1000 * s["total_s"] / s["requests"] if s["requests"] else 0.0,
+                            "max_ms": 1000 * s["max_s"],
+                            "last_ms": 1000 * s["last_s"]}
+                    for route, s in self._stats.items()}
+
+
+# Shared client for the face API.
+# One keep-alive session per process so frames and face crops reuse pooled
+# TCP connections instead of opening a new one per request. Every call goes
+# through Options.endpoint, has connect/read timeouts, bounded retries with
+# backoff (register only on connection failures), and is timed per endpoint.
+class FaceApiClient:
+
+    def __init__(self, opts=None, pool_size=None):
+        self.opts = opts or Options()
+        self.timeout = (self.opts.connectTimeout, self.opts.readTimeout)
+        pool_size = pool_size or self.opts.poolSize
+
+        # Detect / recognize are safe to repeat, so their POSTs are retried on
+        # connection and read errors and on 502 / 503 / 504
+        retry = Retry(total=self.opts.maxRetries,
+                      connect=self.opts.maxRetries,
+                      read=self.opts.maxRetries,
+                      status=self.opts.maxRetries,
+                      backoff_factor=self.opts.retryBackoff,
+                      status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["POST"]),
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              pool_block=True, max_retries=retry)
+
+        # NON_IDEMPOTENT_ROUTES get their own adapter (the longest mounted prefix wins)
+        # that only retries failed connections
+        once = Retry(total=self.opts.maxRetries,
+                     connect=self.opts.maxRetries,
+                     read=0, status=0, other=0,
+                     backoff_factor=self.opts.retryBackoff,
+                     allowed_methods=frozenset(["POST"]),
+                     raise_on_status=False)
+        once_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                                   pool_block=True, max_retries=once)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        for route in NON_IDEMPOTENT_ROUTES:
+            self.session.mount(self.opts.endpoint(route), once_adapter)
+
+        self.latency = EndpointStats()
+
+    # POST an image (bytes) plus form fields to a route and return the JSON reply
+    def post(self, route, image, **data) -> dict:
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.post(self.opts.endpoint(route),
+                                         files={"image": image},
+                                         data=data or None,
+                                         timeout=self.timeout)
+            result = response.json()
+            ok = True
+            return result
+        finally:
+            self.latency.record(route, time.perf_counter() - start, ok)
+
+    def detect(self, image) -> dict:
+        return self.post("vision/face", image)
+
+    def recognize(self, image, min_confidence=0.6) -> dict:
+        return self.post("vision/face/recognize", image, min_confidence=min_confidence)
+
+    def register(self, image, user_id) -> dict:
+        return self.post("vision/face/register", image, userid=user_id)
+
+    # Per-endpoint latency counters (milliseconds)
+    def stats(self) -> dict:
+        return self.latency.snapshot()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+# Face client for Options.faceBackend: the HTTP face API or the local engine,
+# both with detect / recognize / register / stats / close
+def create_face_client(opts=None, pool_size=None):
+    opts = opts or Options()
+    if opts.faceBackend == "local":
+        from local_engine import LocalFaceEngine
+        return LocalFaceEngine(opts)
+    return FaceApiClient(opts, pool_size=pool_size)
+
+
+# asyncio counterpart of FaceApiClient with the same methods as coroutines.
+# With aiohttp the requests share one keep-alive connector on the event loop;
+# without it (or with the local backend) each call runs the synchronous client
+# in a worker thread.
+class AsyncFaceApiClient:
+
+    def __init__(self, opts=None, limit=None):
+        self.opts = opts or Options()
+        self.limit = limit or self.opts.poolSize
+        self.latency = EndpointStats()
+        self._session = None
+        use_aiohttp = aiohttp is not None and self.opts.faceBackend == "http"
+        self._sync = None if use_aiohttp else create_face_client(self.opts, pool_size=self.limit)
+
+    async def _session_for_loop(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=30)
+            timeout = aiohttp.ClientTimeout(sock_connect=self.opts.connectTimeout,
+                                            sock_read=self.opts.readTimeout)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def post(self, route, image, **data) -> dict:
+        if self._sync is not None:
+            return await asyncio.to_thread(self._sync.post, route, image, **data)
+
+        session = await self._session_for_loop()
+        idempotent = route not in NON_IDEMPOTENT_ROUTES
+        start = time.perf_counter()
+        ok = False
+        try:
+            for attempt in range(self.opts.maxRetries + 1):
+                form = aiohttp.FormData()
+                form.add_field("image", bytes(image), filename="image.jpg", content_type="image/jpeg")
+                for key, value in data.items():
+                    form.add_field(key, str(value))
+                try:
+                    async with session.post(self.opts.endpoint(route), data=form) as response:
+                        if idempotent and response.status in (502, 503, 504) and attempt < self.opts.maxRetries:
+                            raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                        result = await response.json(content_type=None)
+                        ok = True
+                        return result
+                except (aiohttp.ClientConnectionError, aiohttp.ClientResponseError, asyncio.TimeoutError) as e:
+                    # Register is only sent again when the connection could not be made
+                    unsent = isinstance(e, aiohttp.ClientConnectorError)
+                    if attempt >= self.opts.maxRetries or not (idempotent or unsent):
+                        raise
+                    await asyncio.sleep(self.opts.retryBackoff * (2 ** attempt))
+        finally:
+            self.latency.record(route, time.perf_counter() - start, ok)
+
+    async def detect(self, image) -> dict:
+        return await self.post("vision/face", image)
+
+    async def recognize(self, image, min_confidence=0.6) -> dict:
+        return await self.post("vision/face/recognize", image, min_confidence=min_confidence)
+
+    async def register(self, image, user_id) -> dict:
+        return await self.post("vision/face/register", image, userid=user_id)
+
+    def stats(self) -> dict:
+        if self._sync is not None:
+            return self._sync.stats()
+        return self.latency.snapshot()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        if self._sync is not None:
+            self._sync.close()
@@ -0,0 +1,376 @@
+import json
+import time
+import asyncio
+import threading
+import cv2
+import paho.mqtt.client as mqtt
+from concurrent.futures import ThreadPoolExecutor
+import recognition as rx
+import frame_codec
+from api_client import AsyncFaceApiClient
+from face_batcher import build_mosaic, split_result
+from recognition_cache import face_hash
+from cameras import camera_from_topic
+from pipeline import FairScheduler
+
+# Concurrency limits for the asyncio receiver
+MAX_CONCURRENT_DETECT = 2
+MAX_CONCURRENT_RECOGNIZE = rx.RECOGNITION_WORKERS
+IMAGE_WORKERS = rx.IMAGE_WORKERS  # threads for JPEG decode / encode (OpenCV releases the GIL)
+MAX_PENDING_TASKS = 64    # background recognize / result tasks; new faces wait for a slot
+RECONNECT_MIN = 1.0       # seconds between broker reconnect attempts, doubling up to RECONNECT_MAX
+RECONNECT_MAX = 30.0
+
+
+# Runs a paho client on an asyncio event loop instead of its own network thread
+# (the socket callbacks pattern from paho's loop_asyncio example). misc_loop()
+# also reconnects, with exponential backoff, when the broker goes away.
+class AsyncioMqtt:
+
+    def __init__(self, loop, client):
+        self.loop = loop
+        self.client = client
+        self.reconnects = 0
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    def on_socket_open(self, client, userdata, sock):
+        self.loop.add_reader(sock, client.loop_read)
+
+    def on_socket_close(self, client, userdata, sock):
+        self.loop.remove_reader(sock)
+
+    def on_socket_register_write(self, client, userdata, sock):
+        self.loop.add_writer(sock, client.loop_write)
+
+    def on_socket_unregister_write(self, client, userdata, sock):
+        self.loop.remove_writer(sock)
+
+    # Keepalive pings; reconnects while the connection is down (runs until cancelled)
+    async def misc_loop(self):
+        delay = RECONNECT_MIN
+        while True:
+            if self.client.loop_misc() == mqtt.MQTT_ERR_SUCCESS:
+                delay = RECONNECT_MIN
+                await asyncio.sleep(1)
+                continue
+            print(f"MQTT connection lost, reconnecting in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            try:
+                self.client.reconnect()  # on_connect subscribes again
+                self.reconnects += 1
+            except OSError as e:
+                print(f"MQTT reconnect failed: {e}")
+                delay = min(delay * 2, RECONNECT_MAX)
+
+
+def encode_jpeg(image):
+    _, encoded = cv2.imencode('.jpg', image)
+    return encoded.tobytes()
+
+
+# asyncio mode of recognition.py.
+# MQTT, face API calls and LED control share one event loop; concurrency is
+# bounded with semaphores and only JPEG work leaves the loop, on a small fixed
+# thread pool. Detection, tracking, motion
+# gating and logging reuse the settings and helpers of recognition.py.
+class AsyncReceiver:
+
+    def __init__(self):
+        self.loop = None
+        self.loop_thread = None
+        self.client = None
+        self.frames = None        # newest undecoded payload per camera, handed out fairly
+        self.frame_ready = None
+        self.detect_sem = None
+        self.recognize_sem = None
+        self.api = AsyncFaceApiClient(rx.opts, limit=MAX_CONCURRENT_DETECT + MAX_CONCURRENT_RECOGNIZE)
+        self.image_pool = ThreadPoolExecutor(IMAGE_WORKERS, thread_name_prefix="image")
+        self.tasks = set()
+        self.task_slot = None     # set when a task finishes
+        self.dropped_tasks = 0
+
+    # paho callback, runs on the event loop
+    def on_message(self, client, userdata, msg):
+        if msg.topic == rx.MQTT_FACES_REGISTERED:
+            rx.faces_registered(msg.payload)
+            return
+        camera_id = camera_from_topic(msg.topic, rx.DEFAULT_CAMERA)
+        rx.stream_received(rx.cameras.get(camera_id), msg.payload)
+        if frame_codec.frame_flags(msg.payload) & frame_codec.FLAG_KEYFRAME:
+            # Edge display frame: shown right away, never replaces queued face crops
+            self.try_spawn(self.process_frame(rx.cameras.get(camera_id), msg.payload, time.time()))
+            return
+        if rx.FRAME_SAMPLING and not rx.cameras.get(camera_id).sampler.admit(len(self.tasks)):
+            return
+        self.frames.put(camera_id, (msg.payload, time.time()))
+        self.frame_ready.set()
+
+    async def run_image(self, fn, *args):
+        return await self.loop.run_in_executor(self.image_pool, fn, *args)
+
+    # Door actuators publish from the loop and from their hold timers
+    def publish(self, topic, payload, **kwargs):
+        if threading.get_ident() == self.loop_thread:
+            self.client.publish(topic, payload, **kwargs)
+        else:
+            self.loop.call_soon_threadsafe(lambda: self.client.publish(topic, payload, **kwargs))
+
+    def set_led(self, camera, status):
+        rx.set_led(camera, status)  # only queues an MQTT publish on state changes
+
+    # Run `coro` as a background task once fewer than MAX_PENDING_TASKS are pending
+    async def spawn(self, coro):
+        while len(self.tasks) >= MAX_PENDING_TASKS:
+            self.task_slot.clear()
+            await self.task_slot.wait()
+        self.start_task(coro)
+
+    # Same without waiting (callbacks); the task is dropped when none is free
+    def try_spawn(self, coro):
+        if len(self.tasks) >= MAX_PENDING_TASKS:
+            coro.close()
+            self.dropped_tasks += 1
+            return False
+        self.start_task(coro)
+        return True
+
+    def start_task(self, coro):
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.task_done)
+
+    def task_done(self, task):
+        self.tasks.discard(task)
+        self.task_slot.set()
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error in receiver task: {task.exception()!r}")
+
+    async def recognize(self, image_bytes):
+        async with self.recognize_sem:
+            try:
+                return await self.api.recognize(image_bytes, min_confidence=0.6)
+            except Exception as e:
+                print(f"Error during recognition: {e}")
+                return {}
+
+    # Same steps as recognition.handle_track_result, with blocking parts off the loop
+    async def handle_result(self, result, camera, track, current_frame, x_min, y_min, trace=None, recognized_at=None):
+        recognized_ID, status = rx.parse_recognition_result(result)
+        if result.get("predictions"):
+            self.set_led(camera, status)
+        rx.tracer.result_done(trace, recognize_response=recognized_at, actuation=time.time())
+        camera.recognitions += 1
+        cv2.putText(current_frame, recognized_ID, (x_min, y_min - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        rx.log_recognition(recognized_ID, status, camera, track, rx.result_confidence(result), trace)
+        await self.run_image(rx.save_latest_frame, current_frame, camera)
+
+        if track is not None:
+            if result.get("success"):
+                camera.tracker.set_identity(track.id, recognized_ID, status)
+            else:
+                camera.tracker.clear_pending(track.id)
+
+    # `key` is the crop's hash for the recognition cache (None: not cached)
+    async def recognize_one(self, camera, crop, track, current_frame, x_min, y_min, trace, key=None):
+        generation = rx.recognition_cache.generation
+        result = await self.recognize(await self.run_image(encode_jpeg, crop))
+        if key is not None:
+            rx.recognition_cache.put(key, result, camera.id, generation)
+        await self.handle_result(result, camera, track, current_frame, x_min, y_min, trace, time.time())
+
+    async def recognize_batch(self, camera, faces, current_frame, trace):
+        generation = rx.recognition_cache.generation
+        mosaic, layout = await self.run_image(build_mosaic, [crop for crop, _, _, _, _ in faces])
+        result = await self.recognize(await self.run_image(encode_jpeg, mosaic))
+        recognized_at = time.time()
+        for (_, track, x_min, y_min, key), crop_result in zip(faces, split_result(result, layout)):
+            if key is not None:
+                rx.recognition_cache.put(key, crop_result, camera.id, generation)
+            await self.handle_result(crop_result, camera, track, current_frame, x_min, y_min, trace, recognized_at)
+
+    async def process_frame(self, camera, payload, received):
+        header, current_frame, edge_faces = await self.run_image(rx.decode_message, payload)
+        trace = rx.tracer.start(camera.id, header)
+        trace.mark("receive", received)
+        trace.mark("decode")
+        camera.frames_received += 1
+
+        # Edge camera: a display-only keyframe, or face crops found on the Pi
+        if header is not None and header.flags & frame_codec.FLAG_KEYFRAME:
+            camera.frame = current_frame
+            await self.run_image(rx.save_latest_frame, current_frame, camera)
+            return
+        if edge_faces is not None:
+            trace.mark("detect_request")
+            trace.mark("detect_response")
+            rx.tracer.frame_done(trace)
+            camera.frames_processed += 1
+            canvas = await self.run_image(rx.edge_canvas, camera, edge_faces)
+            await self.handle_faces(camera, canvas, [prediction for prediction, _, _ in edge_faces], trace,
+                                    crops=[image for _, _, image in edge_faces])
+            return
+
+        # Nothing moved in the doorway: no detection call (cheap, and the gate is
+        # not thread-safe, so it runs on the loop)
+        if rx.MOTION_GATING and not camera.motion_gate.check(current_frame):
+            return
+
+        encoded = await self.run_image(encode_jpeg, current_frame)
+        async with self.detect_sem:
+            trace.mark("detect_request")
+            detect_start = time.perf_counter()
+            if rx.RECOGNITION_MODE == "frame":
+                response = await self.api.recognize(encoded, min_confidence=0.6)
+            else:
+                response = await self.api.detect(encoded)
+        camera.sampler.observe(time.perf_counter() - detect_start, len(self.tasks))
+        camera.frames_processed += 1
+        trace.mark("detect_response")
+        rx.tracer.frame_done(trace)
+
+        predictions = response.get("predictions", [])
+        if not predictions:
+            camera.sampler.faces(0)
+            self.set_led(camera, "Not Recognized")  # Turn LED off when no face is detected
+            await self.run_image(rx.save_latest_frame, current_frame, camera)
+            return
+        await self.handle_faces(camera, current_frame, predictions, trace)
+
+    # Same steps as recognition.handle_faces; `crops` are the face images of an edge camera
+    async def handle_faces(self, camera, current_frame, predictions, trace, crops=None):
+        mode = rx.RECOGNITION_MODE if crops is None or rx.RECOGNITION_MODE != "frame" else "batch"
+        camera.faces_detected += len(predictions)
+        camera.last_activity = time.time()
+        if rx.TRACKING and mode != "frame":
+            tracks = camera.tracker.update([(p["x_min"], p["y_min"], p["x_max"], p["y_max"])
+                                             for p in predictions])
+        else:
+            tracks = [None] * len(predictions)
+        camera.sampler.faces(len(predictions), new=any(t is not None and t.name is None for t in tracks))
+
+        faces = []
+        for i, (pred, track) in enumerate(zip(predictions, tracks)):
+            x_min, y_min, x_max, y_max = pred["x_min"], pred["y_min"], pred["x_max"], pred["y_max"]
+            if mode == "frame":
+                await self.spawn(self.handle_result({"predictions": [pred]}, camera, None, current_frame,
+                                                    x_min, y_min, trace, time.time()))
+                continue
+            if track is not None and not camera.tracker.needs_recognition(track):
+                # Known track: cached identity, and the door stays unlocked while it is in view
+                if track.name is not None:
+                    cv2.putText(current_frame, track.name, (x_min, y_min - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+                if track.status is not None:
+                    self.set_led(camera, track.status)
+                continue
+            crop = crops[i] if crops is not None else current_frame[y_min:y_max, x_min:x_max].copy()
+            if crop.size == 0:
+                continue
+            key = None
+            if rx.RECOGNITION_CACHE:
+                key = face_hash(crop)
+                cached = rx.recognition_cache.get(key, camera.id)
+                if cached is not None:
+                    await self.spawn(self.handle_result(cached, camera, track, current_frame, x_min, y_min,
+                                                        trace, time.time()))
+                    continue
+            faces.append((crop, track, x_min, y_min, key))
+
+        # Live stream; names are added as recognition results come back
+        await self.run_image(rx.save_latest_frame, current_frame, camera)
+        if not faces:
+            return
+        if mode == "batch":
+            await self.spawn(self.recognize_batch(camera, faces, current_frame, trace))
+        else:
+            for crop, track, x_min, y_min, key in faces:
+                await self.spawn(self.recognize_one(camera, crop, track, current_frame, x_min, y_min, trace, key))
+
+    async def consume(self):
+        while True:
+            item = self.frames.poll()
+            if item is None:
+                self.frame_ready.clear()
+                await self.frame_ready.wait()
+                continue
+
+            camera_id, (payload, received) = item
+            try:
+                await self.process_frame(rx.cameras.get(camera_id), payload, received)
+            except Exception as e:
+                print(f"Error processing frame from {camera_id}: {e}")
+            finally:
+                self.frames.done(camera_id)
+                self.frame_ready.set()  # another consumer may be waiting for this camera
+
+    # Rate-control feedback for the transmitter (see recognition.publish_feedback)
+    async def publish_feedback(self):
+        last = {}
+        while True:
+            await asyncio.sleep(rx.FEEDBACK_INTERVAL)
+            now = self.loop.time()
+            for camera in rx.cameras.all():
+                last_count, last_time = last.get(camera.id, (0, now - rx.FEEDBACK_INTERVAL))
+                fps = (camera.frames_processed - last_count) / max(now - last_time, 1e-6)
+                last[camera.id] = (camera.frames_processed, now)
+                feedback = {"width": rx.FRAME_WIDTH, "height": rx.FRAME_HEIGHT, "fps": round(fps, 2),
+                            "capacity": rx.detect_capacity(camera, MAX_CONCURRENT_DETECT),
+                            "backlog": len(self.tasks)}
+                self.client.publish(rx.feedback_topic(camera.id), json.dumps(feedback))
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread = threading.get_ident()
+        self.frames = FairScheduler("detect", weight=lambda camera_id: rx.cameras.get(camera_id).weight(
+            boost=rx.ACTIVE_CAMERA_WEIGHT, window=rx.ACTIVITY_WINDOW))
+        self.frame_ready = asyncio.Event()
+        self.detect_sem = asyncio.Semaphore(MAX_CONCURRENT_DETECT)
+        self.recognize_sem = asyncio.Semaphore(MAX_CONCURRENT_RECOGNIZE)
+        self.task_slot = asyncio.Event()
+
+        # Latency histograms plus this receiver's backlog on /metrics
+        rx.tracer.gauges["pending_tasks"] = lambda: {"recognize": len(self.tasks), "dropped": self.dropped_tasks}
+        rx.tracer.gauges["recognition_cache"] = rx.recognition_cache.stats
+        rx.tracer.gauges["face_api_avg_ms"] = lambda: {route: round(s["avg_ms"], 2)
+                                                       for route, s in self.api.stats().items()}
+        if rx.METRICS_PORT:
+            rx.tracer.serve(rx.METRICS_PORT)
+
+        self.client = rx.new_mqtt_client()
+        self.client.on_connect = rx.on_connect
+        self.client.on_message = self.on_message
+        mqtt_io = AsyncioMqtt(self.loop, self.client)
+        self.client.connect(rx.MQTT_BROKER)
+        rx.client = self.client
+        rx.mqtt_publish = self.publish
+
+        try:
+            # One consumer per detect slot so a slow detect call does not stall the queue
+            consumers = [self.consume() for _ in range(MAX_CONCURRENT_DETECT)]
+            await asyncio.gather(*consumers, self.publish_feedback(), mqtt_io.misc_loop())
+        finally:
+            rx.all_leds_off()  # Turn LEDs off when the program ends
+            self.client.disconnect()
+            await self.api.close()
+            self.image_pool.shutdown(wait=False)
+
+
+def main():
+    rx.open_logs()
+    try:
+        asyncio.run(AsyncReceiver().run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        rx.close_logs()
+        rx.tracer.close()
+        rx.close_frame_ring()
+        rx.api.close()
+
+
+if __name__ == "__main__":
+    main()
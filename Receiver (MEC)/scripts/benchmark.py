@@ -0,0 +1,338 @@
+# Receiver benchmark without the Pi, the camera or the face API server.
+# Frames (a folder of recorded JPEGs, or synthetic ones) are published
+# through an in-process MQTT stand-in into recognition.py's threaded
+# pipeline, which talks to mock_face_api.MockFaceApi over HTTP. Every
+# combination of worker counts and frame sizes runs for a fixed time; the
+# report has frames/s, recognitions/s, drop rate and latency percentiles.
+#
+#   python3 benchmark.py
+#   python3 benchmark.py --frames recorded/ --fps 30 --detect-workers 1 2 4 --sizes 640x480 1280x720
+#   python3 benchmark.py --latency 0.08 --api-workers 2 --json results.json
+import os
+import re
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+import threading
+import cv2
+import numpy as np
+import frame_codec
+from mock_face_api import MockFaceApi
+from tracing import Tracer
+from cameras import CameraRegistry
+from recognition_cache import RecognitionCache
+
+
+# Topic matching with MQTT wildcards (+ one level, # the rest)
+def topic_matches(pattern, topic):
+    pattern_parts, topic_parts = pattern.split("/"), topic.split("/")
+    for i, part in enumerate(pattern_parts):
+        if part == "#":
+            return True
+        if i >= len(topic_parts) or (part != "+" and part != topic_parts[i]):
+            return False
+    return len(pattern_parts) == len(topic_parts)
+
+
+class Message:
+
+    def __init__(self, topic, payload):
+        self.topic = topic
+        self.payload = payload
+
+
+# In-process broker: routes publishes to subscribed clients
+class InProcessBroker:
+
+    def __init__(self):
+        self.clients = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic, payload):
+        with self._lock:
+            clients = list(self.clients)
+        for client in clients:
+            if any(topic_matches(pattern, topic) for pattern in client.subscriptions):
+                client.deliver(Message(topic, payload))
+
+
+# The subset of paho's Client used by recognition.py. Messages are handed to
+# on_message on the client's own network thread, as with loop_start().
+class InProcessClient:
+
+    def __init__(self, broker, queue_size=1000):
+        self.broker = broker
+        self.subscriptions = set()
+        self.on_connect = None
+        self.on_message = None
+        self.queue_size = queue_size
+        self.delivered = 0
+        self.dropped = 0
+        self._inbox = []
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def connect(self, host=None, port=1883, keepalive=60):
+        with self.broker._lock:
+            self.broker.clients.append(self)
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+
+    def subscribe(self, topic, qos=0):
+        topics = topic if isinstance(topic, list) else [(topic, qos)]
+        self.subscriptions.update(t for t, _ in topics)
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.broker.publish(topic, payload)
+
+    def deliver(self, message):
+        with self._cond:
+            if len(self._inbox) >= self.queue_size:
+                self.dropped += 1  # a real broker would also drop QoS 0 traffic for a slow client
+                return
+            self._inbox.append(message)
+            self._cond.notify()
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._inbox or not self._running)
+                if not self._running and not self._inbox:
+                    return
+                message = self._inbox.pop(0)
+            if self.on_message is not None:
+                self.on_message(self, None, message)
+                self.delivered += 1
+
+    def loop_start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="mqtt-stand-in", daemon=True)
+        self._thread.start()
+
+    def loop_stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(5.0)
+
+    def disconnect(self):
+        with self.broker._lock:
+            if self in self.broker.clients:
+                self.broker.clients.remove(self)
+
+
+# Synthetic frames: textured background with face-like ellipses that move
+def synthetic_frames(width, height, count=30, faces=1, seed=0):
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        for f in range(faces):
+            cx = int((f + 1) * width / (faces + 1) + 20 * np.sin(i / 5 + f))
+            cy = int(height / 2 + 10 * np.cos(i / 7 + f))
+            axes = (height // 10, height // 8)
+            cv2.ellipse(frame, (cx, cy), axes, 0, 0, 360, (150, 170, 210), -1)
+            cv2.circle(frame, (cx - axes[0] // 2, cy - axes[1] // 4), max(2, axes[0] // 8), (40, 40, 40), -1)
+            cv2.circle(frame, (cx + axes[0] // 2, cy - axes[1] // 4), max(2, axes[0] // 8), (40, 40, 40), -1)
+        frames.append(frame)
+    return frames
+
+
+# Recorded JPEGs (sorted by name), scaled to the requested size
+def recorded_frames(directory, width, height, limit=300):
+    paths = sorted(p for p in glob.glob(os.path.join(directory, "*")) if p.lower().endswith((".jpg", ".jpeg", ".png")))
+    frames = []
+    for path in paths[:limit]:
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames.append(cv2.resize(frame, (width, height)))
+    if not frames:
+        raise SystemExit(f"No images in {directory}")
+    return frames
+
+
+def encode_frames(frames, quality=80):
+    return [cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for frame in frames]
+
+
+# Publish encoded frames for `duration` seconds at `fps` per camera
+def publish_frames(broker, encoded, width, height, cameras, fps, duration, stop):
+    interval = 1.0 / fps
+    seq = 0
+    published = 0
+    deadline = time.perf_counter() + duration
+    next_time = time.perf_counter()
+    while not stop.is_set() and time.perf_counter() < deadline:
+        jpeg = encoded[seq % len(encoded)]
+        for camera_id in cameras:
+            broker.publish(f"doors/{camera_id}/frames", frame_codec.pack_frame(jpeg, seq, width, height))
+            published += 1
+        seq += 1
+        next_time += interval
+        delay = next_time - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    return published
+
+
+# One configuration: a fresh pipeline, published frames, then the counters
+def run_case(rx, args, api_url, encoded, width, height, detect_workers, recognition_workers, image_workers):
+    broker = InProcessBroker()
+    client = InProcessClient(broker)
+
+    # Fresh receiver state for this case
+    rx.opts.serverUrl = api_url
+    rx.api.close()
+    rx.api = rx.create_face_client(rx.opts, pool_size=detect_workers + recognition_workers)
+    rx.RECOGNITION_WORKERS = recognition_workers
+    rx.DETECT_WORKERS = detect_workers
+    rx.IMAGE_WORKERS = image_workers
+    rx.RECOGNITION_MODE = args.mode
+    rx.MOTION_GATING = args.motion_gating
+    rx.FRAME_SAMPLING = args.sampling
+    rx.RECOGNITION_CACHE = args.cache
+    rx.recognition_cache = RecognitionCache(rx.CACHE_SIZE, rx.CACHE_TTL, rx.CACHE_THRESHOLD)
+    rx.stop_event = threading.Event()
+    rx.cameras = CameraRegistry(rx.new_camera)
+    rx.tracer = Tracer()
+    rx.client = client
+    rx.start_pipeline()
+
+    client.on_connect = rx.on_connect
+    client.on_message = rx.on_message
+    client.connect()
+    client.loop_start()
+    workers = [threading.Thread(target=rx.process_frames, daemon=True) for _ in range(detect_workers)]
+    for worker in workers:
+        worker.start()
+
+    camera_ids = [f"bench{i}" for i in range(args.cameras)]
+    start = time.perf_counter()
+    published = publish_frames(broker, encoded, width, height, camera_ids, args.fps, args.duration, rx.stop_event)
+    elapsed = time.perf_counter() - start
+
+    # Let in-flight work finish, then stop everything
+    time.sleep(args.drain)
+    client.loop_stop()
+    rx.stop_event.set()
+    for worker in workers:
+        worker.join(5.0)
+    stats = rx.pipeline_stats()
+    rx.stop_pipeline()
+    rx.all_leds_off()
+    client.disconnect()
+
+    cameras = list(stats["cameras"].values())
+    processed = sum(c["frames_processed"] for c in cameras)
+    recognitions = sum(c["recognitions"] for c in cameras)
+    dropped = {name: s["dropped"] for name, s in stats.items() if name != "cameras"}
+    dropped["mqtt"] = client.dropped
+    latency = rx.tracer.percentiles()
+    return {"size": f"{width}x{height}",
+            "detect_workers": detect_workers,
+            "recognition_workers": recognition_workers,
+            "image_workers": image_workers,
+            "published": published,
+            "published_fps": round(published / elapsed, 2),
+            "processed_fps": round(processed / elapsed, 2),
+            "recognitions_per_s": round(recognitions / elapsed, 2),
+            "drop_rate": round(1 - processed / published, 3) if published else 0.0,
+            "dropped": dropped,
+            "cache": rx.recognition_cache.stats(),
+            "latency_ms": {name: latency[name] for name in ("decode", "queue", "detect", "recognize",
+                                                           "receive_to_actuation", "end_to_end")}}
+
+
+def print_report(results):
+    header = (f"{'size':>10} {'det':>4} {'rec':>4} {'img':>4} {'pub/s':>7} {'proc/s':>7} {'recog/s':>8} {'drop':>6}"
+              f" {'detect p50/p95/p99 ms':>24} {'end-to-end p50/p95/p99 ms':>28}")
+    print(header)
+    print("-" * len(header))
+
+    def triple(p):
+        return "/".join("-" if p[k] is None else f"{p[k]:.0f}" for k in ("p50", "p95", "p99"))
+
+    for r in results:
+        print(f"{r['size']:>10} {r['detect_workers']:>4} {r['recognition_workers']:>4} {r['image_workers']:>4}"
+              f" {r['published_fps']:>7} {r['processed_fps']:>7} {r['recognitions_per_s']:>8} {r['drop_rate']:>6.1%}"
+              f" {triple(r['latency_ms']['detect']):>24} {triple(r['latency_ms']['end_to_end']):>28}")
+
+
+def parse_size(text):
+    match = re.fullmatch(r"(\d+)x(\d+)", text)
+    if not match:
+        raise argparse.ArgumentTypeError("sizes look like 640x480")
+    return int(match.group(1)), int(match.group(2))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the receiver pipeline with a mock face API")
+    parser.add_argument("--frames", help="folder of recorded JPEG frames (default: synthetic frames)")
+    parser.add_argument("--faces", type=int, default=1, help="faces per synthetic frame and per mock detect call")
+    parser.add_argument("--sizes", type=parse_size, nargs="+", default=[(640, 480)], help="published frame sizes")
+    parser.add_argument("--detect-workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--recognition-workers", type=int, nargs="+", default=[5])
+    parser.add_argument("--image-workers", type=int, nargs="+", help="decode / encode threads (default: one per core)")
+    parser.add_argument("--cameras", type=int, default=1, help="cameras publishing at the same time")
+    parser.add_argument("--fps", type=float, default=15, help="frames per second per camera")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per configuration")
+    parser.add_argument("--drain", type=float, default=1.0, help="seconds to let queued work finish")
+    parser.add_argument("--mode", choices=("batch", "single", "frame"), default="batch")
+    parser.add_argument("--motion-gating", action="store_true", help="keep motion gating on")
+    parser.add_argument("--sampling", action="store_true", help="keep adaptive frame sampling on")
+    parser.add_argument("--cache", action="store_true", help="keep the recognition result cache on")
+    parser.add_argument("--latency", type=float, default=0.03, help="mock API mean latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.01, help="mock API latency deviation (s)")
+    parser.add_argument("--api-workers", type=int, default=0, help="mock API concurrent requests (0 = unlimited)")
+    parser.add_argument("--known", type=float, default=0.8, help="share of faces the mock recognizes")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # The receiver module, with its log and tracing kept out of the real log files
+    import recognition as rx
+    workdir = tempfile.mkdtemp(prefix="benchmark-")
+    rx.open_logs(os.path.join(workdir, "recognition_logs.csv"), os.path.join(workdir, "recognition_events.db"))
+    rx.TRACE_LOG_PATH = None
+
+    api = MockFaceApi(latency=args.latency, jitter=args.jitter, workers=args.api_workers,
+                      faces=args.faces, known=args.known).start()
+    results = []
+    try:
+        for width, height in args.sizes:
+            frames = recorded_frames(args.frames, width, height) if args.frames else \
+                synthetic_frames(width, height, faces=args.faces)
+            encoded = encode_frames(frames)
+            for detect_workers in args.detect_workers:
+                for recognition_workers in args.recognition_workers:
+                    for image_workers in args.image_workers or [rx.IMAGE_WORKERS]:
+                        print(f"Running {width}x{height}, {detect_workers} detect / {recognition_workers} recognize"
+                              f" / {image_workers} image workers...")
+                        results.append(run_case(rx, args, api.url, encoded, width, height,
+                                                detect_workers, recognition_workers, image_workers))
+    finally:
+        api.stop()
+        rx.close_logs()
+        rx.close_frame_ring()
+        rx.api.close()
+
+    print()
+    print_report(results)
+    print(f"\nMock API requests: {api.stats()}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items()}, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+# Bulk face enrollment.
+# Registers many users at once from a directory tree or a zip archive with
+# one folder of photos per user (photos outside a user folder are skipped):
+#
+#   people/alice/1.jpg, people/alice/2.jpg, people/bob/a.png, ...
+#
+#   python3 bulk_enroll.py people/            (or people.zip)
+#   python3 bulk_enroll.py people/ --best 5 --workers 16 --report report.json
+#
+# Every photo is decoded and sent to face detection by a pool of workers.
+# Photos without exactly one usable face, blurry or too small faces, and
+# near-duplicates of a better photo of the same person are rejected; the
+# best N of the rest are registered with concurrent, pooled requests. Only the
+# face box of a candidate is kept; its photo is read and cropped again when it
+# is registered, so memory does not grow with the number of photos.
+# Registered photos are appended to a state file, so an interrupted run
+# resumes where it stopped, without registering near-duplicates of them.
+# At the end the receiver is told over MQTT that new faces exist, so it
+# drops its cached recognition results.
+import os
+import sys
+import json
+import time
+import zipfile
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import cv2
+import numpy as np
+import paho.mqtt.client as mqtt
+from options import Options
+from api_client import create_face_client
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Defaults for the quality checks
+BEST_PER_USER = 5
+MIN_FACE_SIZE = 80         # pixels, shorter side of the face box
+MIN_SHARPNESS = 60.0       # variance of the Laplacian of the face crop
+MAX_HASH_DISTANCE = 6      # bits; closer crops of one user count as duplicates
+FACE_MARGIN = 0.25         # context kept around the face box when registering
+
+MQTT_BROKER = "172.30.212.124"
+MQTT_FACES_REGISTERED = "faces/registered"
+
+
+# Photo files per user: {user: [(name, read_bytes), ...]}. A photo belongs to the
+# folder it is in; photos outside a user folder (at the top of the tree, or next to
+# the user folders) are skipped.
+def list_images(source):
+    files = []
+    if zipfile.is_zipfile(source):
+        archive = zipfile.ZipFile(source)
+        lock = threading.Lock()
+
+        def reader(name):
+            def read():
+                with lock:
+                    return archive.read(name)
+            return read
+
+        for name in archive.namelist():
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append((name, reader(name)))
+    else:
+        for root, _, filenames in os.walk(source):
+            for filename in sorted(filenames):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    files.append((os.path.relpath(path, source), lambda path=path: open(path, "rb").read()))
+
+    def folder_of(name):
+        return name.replace(os.sep, "/").strip("/").rpartition("/")[0]
+
+    folders = {folder_of(name) for name, _ in files}
+    parents = {folder.rpartition("/")[0] for folder in folders if folder}
+    images = defaultdict(list)
+    skipped = 0
+    for name, read in files:
+        folder = folder_of(name)
+        if not folder or folder in parents:
+            skipped += 1
+            continue
+        images[folder.rpartition("/")[2]].append((name, read))
+    if skipped:
+        print(f"Skipped {skipped} photos that are not in a user folder (expected user/photo)")
+    return images
+
+
+# 64-bit difference hash of a grayscale crop
+def dhash(gray):
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# One accepted photo of a user
+class Candidate:
+
+    def __init__(self, user, name, score, read, box, phash):
+        self.user = user
+        self.name = name
+        self.score = score
+        self.read = read      # reads the photo again at registration
+        self.box = box        # (x_min, y_min, x_max, y_max) of the face with some margin
+        self.phash = phash
+
+    # JPEG bytes of the face with its margin, or None if the photo cannot be read any more
+    def crop(self):
+        try:
+            data = self.read()
+        except OSError:
+            return None
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        x_min, y_min, x_max, y_max = self.box
+        _, encoded = cv2.imencode(".jpg", frame[y_min:y_max, x_min:x_max], [cv2.IMWRITE_JPEG_QUALITY, 95])
+        return encoded.tobytes()
+
+
+# Persisted progress: one JSON line per registered photo, with the hash of its face
+# so a resumed run does not register a near-duplicate of it
+class EnrollState:
+
+    def __init__(self, path):
+        self.path = path
+        self.done = defaultdict(set)
+        self.hashes = defaultdict(list)
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # line cut off by an interrupted run
+                    self.done[entry["user"]].add(entry["image"])
+                    if entry.get("phash") is not None:
+                        self.hashes[entry["user"]].append(entry["phash"])
+
+    def record(self, user, image, phash=None):
+        with self._lock:
+            self.done[user].add(image)
+            if phash is not None:
+                self.hashes[user].append(phash)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"user": user, "image": image, "phash": phash}) + "\n")
+
+
+class BulkEnroller:
+
+    def __init__(self, api, args):
+        self.api = api
+        self.args = args
+        self.rejected = Counter()
+        self.errors = Counter()
+        self.detected = 0
+        self.registered = 0
+        self.failed = 0
+        self.registered_users = set()
+        self._lock = threading.Lock()
+
+    def _error(self, key):
+        with self._lock:
+            self.errors[key] += 1
+
+    # Decode, detect and score one photo; returns a Candidate or a rejection reason
+    def analyze(self, user, name, read):
+        try:
+            data = read()
+        except OSError:
+            return "unreadable"
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return "unreadable"
+
+        # Large photos are scaled down before detection; boxes are scaled back
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.args.max_side / max(height, width))
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+        _, encoded = cv2.imencode(".jpg", small)
+        try:
+            response = self.api.detect(encoded.tobytes())
+        except Exception as e:
+            self._error(type(e).__name__)
+            return "detect_error"
+        with self._lock:
+            self.detected += 1
+
+        predictions = response.get("predictions", [])
+        if len(predictions) != 1:
+            return "no_face" if not predictions else "several_faces"
+        pred = predictions[0]
+        x_min, y_min = max(0, int(pred["x_min"] / scale)), max(0, int(pred["y_min"] / scale))
+        x_max, y_max = min(width, int(pred["x_max"] / scale)), min(height, int(pred["y_max"] / scale))
+        face_w, face_h = x_max - x_min, y_max - y_min
+        if min(face_w, face_h) < self.args.min_face:
+            return "too_small"
+
+        gray = cv2.cvtColor(frame[y_min:y_max, x_min:x_max], cv2.COLOR_BGR2GRAY)
+        if gray.size == 0:
+            return "too_small"
+        sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+        if sharpness < self.args.min_sharpness:
+            return "blurry"
+
+        # Register the face with some context so the server can find it again
+        mx, my = int(face_w * FACE_MARGIN), int(face_h * FACE_MARGIN)
+        box = (max(0, x_min - mx), max(0, y_min - my), min(width, x_max + mx), min(height, y_max + my))
+
+        # Sharper, larger, more confident faces first
+        score = float(pred.get("confidence", 1.0)) * min(sharpness, 1000.0) * np.sqrt(face_w * face_h)
+        return Candidate(user, name, score, read, box, dhash(gray))
+
+    # Best `wanted` candidates of a user that are not near-duplicates of each other
+    # or of the hashes in `registered` (photos registered by an earlier run)
+    def select(self, candidates, wanted, registered=()):
+        chosen = []
+        for candidate in sorted(candidates, key=lambda c: c.score, reverse=True):
+            if len(chosen) >= wanted:
+                break
+            hashes = list(registered) + [c.phash for c in chosen]
+            if any(hamming(candidate.phash, phash) <= self.args.max_hash_distance for phash in hashes):
+                self.rejected["duplicate"] += 1
+                continue
+            chosen.append(candidate)
+        return chosen
+
+    def register(self, candidate, state):
+        crop = candidate.crop()
+        if crop is None:
+            self._error("unreadable")
+            return False
+        try:
+            response = self.api.register(crop, candidate.user)
+        except Exception as e:
+            self._error(type(e).__name__)
+            return False
+        if not response.get("success", True):
+            self._error(str(response.get("error", "register_failed")))
+            return False
+        state.record(candidate.user, candidate.name, candidate.phash)
+        with self._lock:
+            self.registered_users.add(candidate.user)
+        return True
+
+    def run(self, images, state):
+        args = self.args
+        start = time.perf_counter()
+
+        # Users that already have their photos from an earlier run are skipped
+        todo = []
+        wanted = {}
+        for user, files in sorted(images.items()):
+            remaining = args.best - len(state.done[user])
+            if remaining <= 0:
+                continue
+            wanted[user] = remaining
+            todo.extend((user, name, read) for name, read in files if name not in state.done[user])
+        print(f"{len(images)} users, {len(todo)} photos to check, "
+              f"{sum(1 for u in images if u not in wanted)} users already enrolled")
+
+        # Detect and score in parallel
+        candidates = defaultdict(list)
+        with ThreadPoolExecutor(args.workers) as pool:
+            futures = [pool.submit(self.analyze, user, name, read) for user, name, read in todo]
+            for i, future in enumerate(as_completed(futures), 1):
+                result = future.result()
+                if isinstance(result, Candidate):
+                    candidates[result.user].append(result)
+                else:
+                    self.rejected[result] += 1
+                if i % args.progress == 0 or i == len(futures):
+                    elapsed = time.perf_counter() - start
+                    print(f"  checked {i}/{len(futures)} photos ({i / elapsed:.1f}/s)")
+        detect_time = time.perf_counter() - start
+
+        # Best photos per user, registered concurrently
+        chosen = []
+        for user, remaining in wanted.items():
+            chosen.extend(self.select(candidates.get(user, []), remaining, state.hashes[user]))
+        print(f"Registering {len(chosen)} photos of {len(set(c.user for c in chosen))} users")
+
+        register_start = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as pool:
+            futures = [pool.submit(self.register, candidate, state) for candidate in chosen]
+            for i, future in enumerate(as_completed(futures), 1):
+                if future.result():
+                    self.registered += 1
+                else:
+                    self.failed += 1
+                if i % args.progress == 0 or i == len(futures):
+                    print(f"  registered {self.registered}/{len(futures)} ({self.failed} failed)")
+        register_time = time.perf_counter() - register_start
+
+        total = time.perf_counter() - start
+        enrolled = sum(1 for user in images if state.done[user])
+        missing = sorted(user for user in images if not state.done[user])
+        return {"users": len(images),
+                "users_enrolled": enrolled,
+                "users_without_photos": missing,
+                "photos_checked": len(todo),
+                "faces_detected": self.detected,
+                "rejected": dict(self.rejected),
+                "registered": self.registered,
+                "register_failed": self.failed,
+                "errors": dict(self.errors),
+                "detect_seconds": round(detect_time, 2),
+                "register_seconds": round(register_time, 2),
+                "total_seconds": round(total, 2),
+                "photos_per_second": round(len(todo) / detect_time, 2) if detect_time else 0.0,
+                "registrations_per_second": round(self.registered / register_time, 2) if register_time else 0.0,
+                "api": self.api.stats()}
+
+
+# Announce newly registered users to the receiver (recognition cache invalidation)
+def notify_registered(broker, users):
+    try:
+        client = mqtt.Client()
+        client.connect(broker)
+        client.loop_start()
+        client.publish(MQTT_FACES_REGISTERED, json.dumps({"users": sorted(users)}), qos=1).wait_for_publish(5.0)
+        client.loop_stop()
+        client.disconnect()
+    except Exception as e:
+        print(f"Could not notify the receiver at {broker}: {e}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Register many users from a folder or zip of photos per user")
+    parser.add_argument("source", help="directory with one sub-directory per user, or a zip with the same layout")
+    parser.add_argument("--best", type=int, default=BEST_PER_USER, help="photos to register per user")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent detect / register requests")
+    parser.add_argument("--min-face", type=int, default=MIN_FACE_SIZE, help="smallest face box side in pixels")
+    parser.add_argument("--min-sharpness", type=float, default=MIN_SHARPNESS, help="Laplacian variance below which a face is blurry")
+    parser.add_argument("--max-hash-distance", type=int, default=MAX_HASH_DISTANCE, help="dHash distance treated as a duplicate")
+    parser.add_argument("--max-side", type=int, default=1280, help="photos are scaled down to this size for detection")
+    parser.add_argument("--state", default="enroll_state.jsonl", help="progress file used to resume")
+    parser.add_argument("--report", help="write the final report as JSON to this file")
+    parser.add_argument("--progress", type=int, default=100, help="print progress every N photos")
+    parser.add_argument("--broker", default=MQTT_BROKER, help="MQTT broker of the receiver to notify (empty: none)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not os.path.exists(args.source):
+        raise SystemExit(f"{args.source} does not exist")
+
+    opts = Options()
+    api = create_face_client(opts, pool_size=args.workers)
+    state = EnrollState(args.state)
+    enroller = BulkEnroller(api, args)
+    try:
+        report = enroller.run(list_images(args.source), state)
+    finally:
+        api.close()
+    if args.broker and enroller.registered_users:
+        notify_registered(args.broker, enroller.registered_users)
+
+    print(json.dumps({k: v for k, v in report.items() if k != "api"}, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if not report["register_failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
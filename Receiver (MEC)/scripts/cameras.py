@@ -0,0 +1,88 @@
+import time
+from threading import Lock
+
+
+# Everything the receiver keeps per camera / door
+class CameraState:
+
+    def __init__(self, camera_id, tracker, motion_gate, actuator, sampler):
+        self.id = camera_id
+        self.tracker = tracker
+        self.motion_gate = motion_gate
+        self.actuator = actuator    # DoorActuator of this door's LED / lock
+        self.sampler = sampler      # FrameSampler choosing the frames that go to detection
+
+        # Latest decoded frame and the annotated copy for display (read-only
+        # views in the threaded receiver, which keeps the FrameBuffer behind each)
+        self.lock = Lock()
+        self.frame = None
+        self.frame_buffer = None
+        self.frame_seq = 0
+        self.processed_frame = None
+        self.processed_buffer = None
+
+        # Order of the frames when several image workers decode / encode in parallel
+        self.received_seq = 0       # stamped on receipt
+        self.decoded_seq = 0        # newest frame decoded so far
+        self.stream_seq = 0         # stamped when queued for the live stream
+        self.streamed_seq = 0       # newest frame written to the live stream
+        self.streamed_at = 0.0      # last time an annotated frame was written to it
+        self.annotated_at = 0.0     # last time an annotated frame was ready for it
+        self.raw_at = 0.0           # last time a received frame was written to it as it is
+
+        # Stats
+        self.frames_received = 0
+        self.frames_stale = 0       # decoded after a newer frame of this camera, dropped
+        self.frames_processed = 0
+        self.faces_detected = 0
+        self.recognitions = 0
+        self.last_activity = 0.0    # last time a face was seen
+
+    # Recently active cameras get a larger share of detection capacity
+    def weight(self, now=None, boost=3, window=10.0):
+        now = time.time() if now is None else now
+        return boost if now - self.last_activity < window else 1
+
+    def stats(self):
+        return {"frames_received": self.frames_received,
+                "frames_processed": self.frames_processed,
+                "frames_stale": self.frames_stale,
+                "faces_detected": self.faces_detected,
+                "recognitions": self.recognitions,
+                "tracker": self.tracker.stats(),
+                "motion_gate": self.motion_gate.stats(),
+                "actuator": self.actuator.stats(),
+                "sampler": self.sampler.stats()}
+
+
+# Camera states by ID, created the first time a camera publishes.
+# `factory(camera_id)` builds a new CameraState.
+class CameraRegistry:
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._cameras = {}
+        self._lock = Lock()
+
+    def get(self, camera_id):
+        with self._lock:
+            camera = self._cameras.get(camera_id)
+            if camera is None:
+                camera = self.factory(camera_id)
+                self._cameras[camera_id] = camera
+            return camera
+
+    def all(self):
+        with self._lock:
+            return list(self._cameras.values())
+
+    def stats(self):
+        return {camera.id: camera.stats() for camera in self.all()}
+
+
+# "doors/<camera>/frames" -> "<camera>"; any other topic -> default_id
+def camera_from_topic(topic, default_id="default"):
+    parts = topic.split("/")
+    if len(parts) == 3 and parts[0] == "doors" and parts[2] == "frames":
+        return parts[1]
+    return default_id
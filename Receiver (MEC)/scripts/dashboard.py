@@ -1,41 +1,162 @@
 import dash
 from dash import dcc, html, dash_table
-from dash.dependencies import Input, Output
-import pandas as pd
-import base64
-import os
-import flask
-import threading
+from dash.dependencies import Input, Output, State
+import plotly.graph_objects as go
+import io
+import csv
 import time
-import subprocess  # To run the matplot.py script
+import zlib
+import datetime
+import urllib.parse
+import flask
+from metrics_service import EventMetrics
+from event_store import EventStore
+from frame_ring import FrameRing
+
+# Event store written by the receiver (recognition.EVENT_DB_PATH)
+EVENT_DB_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_events.db"
+
+# Shared-memory rings the receiver publishes each camera's frames to
+# (recognition.FRAME_RING_NAME + "_" + camera ID). /stream?camera=<id> shows one
+# camera, STREAM_CAMERA when none is given (recognition.DEFAULT_CAMERA for a
+# single-camera setup). A stream keeps its attachment; only after
+# STREAM_REATTACH_IDLE seconds without a frame (the receiver stopped, or was
+# restarted with a new ring) does it attach again.
+FRAME_RING_NAME = "face_recognition_frames"
+STREAM_CAMERA = "default"
+STREAM_REATTACH_IDLE = 30.0
+
+# Rows per page of the logs table
+LOG_PAGE_SIZE = 20
+# Bars in the "Top Recognized Faces" chart
+TOP_FACES = 10
+
+# Counters of the recognition events, read incrementally; pages come from the store
+event_store = EventStore(EVENT_DB_PATH, readonly=True)
+metrics = EventMetrics(event_store)
 
-# Paths to files
-LOG_FILE_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_logs.csv"
-FRAME_FILE_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\latest_frame.jpg"
-BAR_CHART_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\latest_bar_chart.png"
+# Columns of the CSV export (the recognition_logs.csv columns first) and rows per streamed chunk
+EXPORT_FIELDS = ["Timestamp", "Name", "Status", "Camera", "Track", "Confidence", "LatencyMs", "FrameSeq"]
+EXPORT_CHUNK_ROWS = 1000
 
 # Initialize the Dash app
 app = dash.Dash(__name__)
 app.title = "5G Facial Recognition Dashboard"
 
-# Serve the CSV file download
+# "2024-05-01", "2024-05-01 13:45[:10]" or seconds since the epoch -> seconds since the epoch.
+# With end_of_day, a bare date means the end of that day.
+def parse_time(text, end_of_day=False):
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M"):
+        try:
+            return datetime.datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    day = datetime.datetime.strptime(text, "%Y-%m-%d")  # ValueError if this fails too
+    return (day + datetime.timedelta(days=1 if end_of_day else 0)).timestamp()
+
+# CSV bytes of the exported events, EXPORT_CHUNK_ROWS rows per chunk
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for i, (ts, camera, track, name, status, confidence, latency_ms, frame_seq) in enumerate(rows, 1):
+        writer.writerow([datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S"), name, status,
+                         camera, track, confidence, latency_ms, frame_seq])
+        if i % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+# gzip stream of `chunks`, compressed as they are produced
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Stream the recognition events as CSV, generated row by row from a snapshot of the store.
+# Query parameters (all optional): start, end (dates or times, end exclusive),
+# minutes (last N minutes), name, status, camera, gzip=1
 @app.server.route('/download')
 def download_csv():
-    return flask.send_file(LOG_FILE_PATH, as_attachment=True)
+    args = flask.request.args
+    try:
+        start = parse_time(args["start"]) if args.get("start") else None
+        end = parse_time(args["end"], end_of_day=True) if args.get("end") else None
+        if args.get("minutes"):
+            start = time.time() - float(args["minutes"]) * 60
+    except ValueError:
+        return flask.Response("start / end must look like 2024-05-01 or 2024-05-01 13:45, minutes a number\n",
+                              status=400, mimetype="text/plain")
 
-# Function to generate the bar chart using matplot.py
-def generate_bar_chart():
-    subprocess.run(['python', 'matplot.py'])  # Run matplot.py in a separate process
+    rows = event_store.export_rows(start, end, name=args.get("name") or None,
+                                   status=args.get("status") or None, camera=args.get("camera") or None)
+    chunks = csv_chunks(rows)
+    filename = "recognition_logs.csv"
+    mimetype = "text/csv"
+    if args.get("gzip", "").lower() in ("1", "true", "yes", "on"):
+        chunks = gzip_chunks(chunks)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    return flask.Response(chunks, mimetype=mimetype,
+                          headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
-# Function to run the matplot.py in the background
-def background_matplot():
-    while True:
-        generate_bar_chart()
-        time.sleep(30)  # Run it every 30 seconds
+# Attach to a camera's frame ring; None while the receiver is not running or has
+# not had a frame from that camera yet
+def open_frame_ring(camera_id):
+    try:
+        return FrameRing(f"{FRAME_RING_NAME}_{camera_id}")
+    except (OSError, ValueError):
+        return None
 
-# Start the background thread for generating the bar chart
-thread = threading.Thread(target=background_matplot, daemon=True)
-thread.start()
+# Multipart JPEG stream of one camera's frames
+def mjpeg_frames(camera_id):
+    ring = None
+    seq = 0
+    try:
+        while True:
+            if ring is None:
+                ring = open_frame_ring(camera_id)
+                if ring is None:
+                    time.sleep(1.0)
+                    continue
+                seq = 0
+            frame = ring.wait(after=seq, timeout=STREAM_REATTACH_IDLE)
+            if frame is None:
+                ring.close()
+                ring = None
+                continue
+            seq, _, data = frame
+            yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " +
+                   str(len(data)).encode() + b"\r\n\r\n" + data + b"\r\n")
+    finally:
+        if ring is not None:
+            ring.close()
+
+# Serve the live stream to the dashboard (and any MJPEG viewer); ?camera=<id> picks the camera
+@app.server.route('/stream')
+def stream():
+    camera_id = flask.request.args.get("camera") or STREAM_CAMERA
+    if "/" in camera_id:
+        return flask.Response("camera must be a camera ID such as door1\n", status=400, mimetype="text/plain")
+    return flask.Response(mjpeg_frames(camera_id), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+# Bar chart of the most recognized names, built from the in-memory counts
+def top_faces_figure():
+    top = metrics.top_names(TOP_FACES)
+    figure = go.Figure(go.Bar(x=[name for name, _ in top], y=[count for _, count in top],
+                              marker_color="skyblue"))
+    figure.update_layout(xaxis_title="Name", yaxis_title="Recognized Count",
+                         margin={"l": 40, "r": 20, "t": 20, "b": 40}, height=420)
+    return figure
 
 # Define the app layout
 app.layout = html.Div(
@@ -49,20 +170,27 @@ app.layout = html.Div(
             n_intervals=0
         ),
 
+        # Log version and page last sent to this browser
+        dcc.Store(id="logs-version"),
+        # Version of the name counts behind the chart in this browser
+        dcc.Store(id="chart-version"),
+
         # Live feed and bar chart side by side
         html.Div(
             children=[
                 html.Div(
                     children=[
                         html.H4("Live Stream"),
-                        html.Img(id="live-feed", style={"maxWidth": "640px", "maxHeight": "480px", "display": "block", "margin": "0 auto"})
+                        dcc.Input(id="stream-camera", placeholder=f"Camera ({STREAM_CAMERA})", debounce=True),
+                        html.Img(id="live-feed", src="/stream", style={"maxWidth": "640px", "maxHeight": "480px", "display": "block", "margin": "0 auto"})
                     ],
                     style={"width": "48%", "display": "inline-block", "verticalAlign": "top"}
                 ),
                 html.Div(
                     children=[
                         html.H4("Top Recognized Faces"),
-                        html.Img(id="bar-chart", style={"maxWidth": "640px", "maxHeight": "480px", "display": "block", "margin": "0 auto"})
+                        dcc.Graph(id="bar-chart", config={"displayModeBar": False},
+                                  style={"maxWidth": "640px", "maxHeight": "480px", "margin": "0 auto"})
                     ],
                     style={"width": "48%", "display": "inline-block", "verticalAlign": "top"}
                 )
@@ -102,28 +230,40 @@ app.layout = html.Div(
                     columns=[
                         {"name": "Timestamp", "id": "Timestamp"},
                         {"name": "Name", "id": "Name"},
-                        {"name": "Status", "id": "Status"}
+                        {"name": "Status", "id": "Status"},
+                        {"name": "Camera", "id": "Camera"}
                     ],
                     style_table={"overflowX": "auto"},
                     style_cell={"textAlign": "left"},
                     style_header={"fontWeight": "bold"},
-                    sort_action="native"  # Enable sorting
+                    # Pages are cut on the server, most recent first
+                    page_action="custom",
+                    page_current=0,
+                    page_size=LOG_PAGE_SIZE,
+                    page_count=1
                 ),
             ],
             style={"maxHeight": "300px", "overflowY": "scroll", "marginBottom": "20px"}
         ),
 
-        # Download Button
+        # Download Button with optional filters
         html.Div(
             children=[
+                dcc.Input(id="download-name", placeholder="Name", debounce=True),
+                dcc.Input(id="download-start", placeholder="From (YYYY-MM-DD [HH:MM])", debounce=True),
+                dcc.Input(id="download-end", placeholder="To (YYYY-MM-DD [HH:MM])", debounce=True),
+                dcc.Checklist(id="download-gzip", options=[{"label": " gzip", "value": "gzip"}], value=[],
+                              style={"display": "inline-block"}),
                 html.A(
                     html.Button("Download Logs as CSV", id="download-btn", n_clicks=0),
+                    id="download-link",
                     href="/download",
                     target="_blank",
                     style={"marginTop": "20px"}
                 )
             ],
-            style={"textAlign": "center"}
+            style={"textAlign": "center", "display": "flex", "gap": "10px", "justifyContent": "center",
+                   "alignItems": "center"}
         )
     ],
     style={"padding": "20px", "fontFamily": "Arial, sans-serif"}
@@ -133,42 +273,59 @@ app.layout = html.Div(
     [Output("recognized-count", "children"),
      Output("unrecognized-count", "children"),
      Output("logs-table", "data"),
-     Output("live-feed", "src"),
-     Output("bar-chart", "src")],  # Output for the bar chart image
-    [Input("interval-component", "n_intervals")]
+     Output("logs-table", "page_count"),
+     Output("logs-version", "data")],
+    [Input("interval-component", "n_intervals"),
+     Input("logs-table", "page_current")],
+    [State("logs-version", "data")]
+)
+def update_dashboard(_, page_current, sent):
+    # Only the rows appended since the last refresh are read
+    metrics.refresh()
+
+    page_current = page_current or 0
+    current = [metrics.version, page_current]
+    if sent == current:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    recognized_count, unrecognized_count = metrics.counts()
+    logs = metrics.page(page_current, LOG_PAGE_SIZE)
+    return recognized_count, unrecognized_count, logs, metrics.page_count(LOG_PAGE_SIZE), current
+
+# Redraw the chart only when the recognized counts changed
+@app.callback(
+    [Output("bar-chart", "figure"),
+     Output("chart-version", "data")],
+    [Input("interval-component", "n_intervals")],
+    [State("chart-version", "data")]
+)
+def update_chart(_, sent):
+    metrics.refresh()
+    if sent == metrics.names_version:
+        return dash.no_update, dash.no_update
+    return top_faces_figure(), metrics.names_version
+
+# Download link for the chosen filters
+@app.callback(
+    Output("download-link", "href"),
+    [Input("download-name", "value"),
+     Input("download-start", "value"),
+     Input("download-end", "value"),
+     Input("download-gzip", "value")]
+)
+def update_download_link(name, start, end, compress):
+    params = {key: value for key, value in (("name", name), ("start", start), ("end", end)) if value}
+    if compress:
+        params["gzip"] = "1"
+    return "/download" + ("?" + urllib.parse.urlencode(params) if params else "")
+
+# Live stream of the chosen camera
+@app.callback(
+    Output("live-feed", "src"),
+    [Input("stream-camera", "value")]
 )
-def update_dashboard(_):
-    recognized_count, unrecognized_count, logs = 0, 0, []
-
-    if os.path.exists(LOG_FILE_PATH):
-        logs_df = pd.read_csv(LOG_FILE_PATH)
-
-        # Clean up the logs by dropping empty rows or rows with missing data
-        logs_df = logs_df.dropna(subset=["Name", "Status"])  # Drop rows where "Name" or "Status" is missing
-        logs_df = logs_df[logs_df["Name"].str.strip() != ""]  # Remove rows with empty "Name" fields
-
-        # Count the total recognized faces
-        recognized_count = logs_df[logs_df["Status"] == "Recognized"].shape[0]
-        # Count the total unrecognized faces
-        unrecognized_count = logs_df[logs_df["Status"] == "Not Recognized"].shape[0]
-
-        # Sort logs by most recent
-        logs_df.sort_values("Timestamp", ascending=False, inplace=True)  # Sort logs by most recent
-        logs = logs_df.to_dict("records")
-
-    # Prepare the live feed image
-    frame_src = None
-    if os.path.exists(FRAME_FILE_PATH):
-        with open(FRAME_FILE_PATH, "rb") as image_file:
-            frame_src = "data:image/jpeg;base64," + base64.b64encode(image_file.read()).decode("utf-8")
-
-    # Prepare the bar chart image
-    bar_chart_src = None
-    if os.path.exists(BAR_CHART_PATH):
-        with open(BAR_CHART_PATH, "rb") as image_file:
-            bar_chart_src = "data:image/png;base64," + base64.b64encode(image_file.read()).decode("utf-8")
-
-    return recognized_count, unrecognized_count, logs, frame_src, bar_chart_src
+def update_stream_camera(camera_id):
+    return "/stream" + ("?" + urllib.parse.urlencode({"camera": camera_id.strip()}) if camera_id else "")
 
 # Run the app
 if __name__ == "__main__":
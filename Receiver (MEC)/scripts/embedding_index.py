@@ -0,0 +1,201 @@
+import os
+import numpy as np
+from threading import Lock, Thread
+
+EMBEDDINGS_FILE = "embeddings.f32"  # float32 rows, L2-normalised, append-only
+LABELS_FILE = "labels.txt"          # user ID of each row, one per line
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+# Inverted-file index over the gallery: rows are bucketed by their nearest
+# k-means centroid and a query only scores the rows of its `nprobe` closest
+# buckets, so search cost stops growing with the full gallery size.
+class IvfIndex:
+
+    def __init__(self, matrix, nlist=None, nprobe=8, iterations=10, sample=50000, seed=0):
+        count = len(matrix)
+        self.nlist = nlist or max(1, int(np.sqrt(count)))
+        self.nprobe = min(nprobe, self.nlist)
+        self.size = count
+
+        rng = np.random.default_rng(seed)
+        train = matrix[rng.choice(count, min(sample, count), replace=False)]
+        centroids = train[rng.choice(len(train), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(train @ centroids.T, axis=1)
+            for c in range(self.nlist):
+                members = train[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = normalize(centroids)
+        self.centroids = centroids
+
+        # Assign every row in chunks to keep the temporary score matrix small
+        assign = np.empty(count, dtype=np.int32)
+        for start in range(0, count, 65536):
+            assign[start:start + 65536] = np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    # Best (row, score) per query among the probed buckets
+    def search(self, matrix, queries):
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+        rows = np.full(len(queries), -1, dtype=np.int64)
+        scores = np.full(len(queries), -1.0, dtype=np.float32)
+        for i, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[c] for c in probes[i]])
+            if len(candidates) == 0:
+                continue
+            candidate_scores = matrix[candidates] @ query
+            best = int(np.argmax(candidate_scores))
+            rows[i] = candidates[best]
+            scores[i] = candidate_scores[best]
+        return rows, scores
+
+
+# On-disk gallery of face embeddings, several per user.
+# Embeddings are one float32 matrix file that is memory-mapped at startup;
+# registrations append to it. Rows appended by another process (registration.py,
+# bulk_enroll.py) are mapped on the next search, once the file has grown.
+# Matching is one batched cosine-similarity matrix product for all query
+# faces. Above `ivf_threshold` rows an IvfIndex is used, with rows added
+# since it was built searched exactly, and it is rebuilt once those make up
+# `rebuild_fraction` of the gallery. Indexes are built in a background thread,
+# one at a time; searches meanwhile use the previous index (or search exactly).
+class EmbeddingGallery:
+
+    def __init__(self, directory, dim=128, ivf_threshold=20000, nprobe=8, rebuild_fraction=0.1):
+        self.directory = directory
+        self.dim = dim
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.rebuild_fraction = rebuild_fraction
+        self._lock = Lock()
+        self._build_lock = Lock()   # held while an index is being built
+
+        os.makedirs(directory, exist_ok=True)
+        self.embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+        self.labels_path = os.path.join(directory, LABELS_FILE)
+
+        self.labels = []
+        if os.path.exists(self.labels_path):
+            with open(self.labels_path, encoding="utf-8") as f:
+                self.labels = [line.rstrip("\n") for line in f]
+
+        # A registration cut short leaves the two files out of step: keep the common rows
+        rows = os.path.getsize(self.embeddings_path) // (dim * 4) if os.path.exists(self.embeddings_path) else 0
+        if rows != len(self.labels):
+            self.labels = self.labels[:rows]
+            with open(self.labels_path, "w", encoding="utf-8") as f:
+                f.writelines(label + "\n" for label in self.labels)
+            with open(self.embeddings_path, "ab") as f:
+                f.truncate(len(self.labels) * dim * 4)
+        self._labels_offset = os.path.getsize(self.labels_path) if os.path.exists(self.labels_path) else 0
+        self._rows = len(self.labels)
+        self._matrix = self._map()
+        self._index = None
+
+    def __len__(self):
+        return self._rows
+
+    def _map(self):
+        if not self._rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self.embeddings_path, dtype=np.float32, mode="r", shape=(self._rows, self.dim))
+
+    # Map rows another process appended since the last look (call with the lock held)
+    def _refresh(self):
+        try:
+            size = os.path.getsize(self.embeddings_path)
+        except OSError:
+            return
+        if size // (self.dim * 4) <= self._rows:
+            return
+        with open(self.labels_path, "rb") as f:
+            f.seek(self._labels_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]  # a label still being written waits for the next look
+        self._labels_offset += len(complete)
+        self.labels.extend(line.decode("utf-8") for line in complete.splitlines())
+        rows = min(size // (self.dim * 4), len(self.labels))
+        if rows > self._rows:
+            self._rows = rows
+            self._matrix = self._map()
+
+    # Append embeddings of one user (one row per face) and persist them
+    def add(self, user_id, embeddings):
+        embeddings = normalize(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-d embeddings, got {embeddings.shape[1]}")
+        with self._lock:
+            self._refresh()  # rows of other processes first, so labels stay in file order
+            with open(self.embeddings_path, "ab") as f:
+                f.write(embeddings.tobytes())
+            lines = ((user_id + "\n") * len(embeddings)).encode("utf-8")
+            with open(self.labels_path, "ab") as f:
+                f.write(lines)
+            self.labels.extend([user_id] * len(embeddings))
+            self._labels_offset += len(lines)
+            self._rows += len(embeddings)
+            self._matrix = self._map()
+        return len(embeddings)
+
+    # Best match per query embedding: list of (user_id, similarity); user_id is None for an empty gallery
+    def search(self, queries):
+        queries = normalize(queries)
+        with self._lock:
+            self._refresh()
+            matrix, labels = self._matrix, self.labels
+        if len(matrix) == 0:
+            return [(None, 0.0)] * len(queries)
+
+        index = self._ensure_index(matrix)
+        if index is None:
+            scores = queries @ matrix.T
+            rows = np.argmax(scores, axis=1)
+            best = scores[np.arange(len(queries)), rows]
+        else:
+            rows, best = index.search(matrix, queries)
+            # Rows added after the index was built are scored exactly
+            if index.size < len(matrix):
+                tail = matrix[index.size:] @ queries.T
+                tail_rows = np.argmax(tail, axis=0)
+                tail_best = tail[tail_rows, np.arange(len(queries))]
+                better = tail_best > best
+                rows = np.where(better, tail_rows + index.size, rows)
+                best = np.where(better, tail_best, best)
+
+        return [(labels[row], float(score)) if row >= 0 else (None, 0.0) for row, score in zip(rows, best)]
+
+    # Current index (None: search exactly); starts building a new one when it is missing or stale
+    def _ensure_index(self, matrix):
+        if len(matrix) < self.ivf_threshold:
+            return None
+        index = self._index
+        stale = index is None or len(matrix) - index.size > self.rebuild_fraction * len(matrix)
+        if stale and self._build_lock.acquire(blocking=False):
+            Thread(target=self._build_index, args=(matrix,), name="gallery-index", daemon=True).start()
+        return index
+
+    def _build_index(self, matrix):
+        try:
+            self._index = IvfIndex(matrix, nprobe=self.nprobe)
+        except Exception as e:
+            print(f"Error building the gallery index: {e}")
+        finally:
+            self._build_lock.release()
+
+    def users(self):
+        return sorted(set(self.labels))
+
+    def stats(self):
+        return {"embeddings": self._rows, "users": len(set(self.labels)),
+                "indexed": self._index.size if self._index is not None else 0}
@@ -0,0 +1,258 @@
+# Indexed store of access events (SQLite in WAL mode).
+# The receiver queues one event per recognition; a background thread inserts
+# them in batches, one transaction per batch. WAL lets the dashboard read
+# while the receiver writes, and the indexes on time, name and status answer
+# "last 15 minutes", "per-person counts today" or "unrecognized bursts"
+# without scanning the whole history.
+#
+#   python3 event_store.py import recognition_logs.csv recognition_events.db
+import sys
+import csv
+import time
+import queue
+import sqlite3
+import datetime
+import threading
+
+# Columns of an event, in table order
+EVENT_FIELDS = ["ts", "camera", "track", "name", "status", "confidence", "latency_ms", "frame_seq"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,           -- seconds since the epoch
+    camera TEXT,
+    track INTEGER,              -- tracker track ID
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,       -- "Recognized" / "Not Recognized"
+    confidence REAL,
+    latency_ms REAL,            -- MQTT receive -> recognition result
+    frame_seq INTEGER           -- sequence number of the frame in the camera's stream
+);
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS events_name_ts ON events (name, ts);
+CREATE INDEX IF NOT EXISTS events_status_ts ON events (status, ts, name);  -- covers the count queries
+"""
+
+_STOP = object()
+
+
+# Start of today (local time) as seconds since the epoch
+def start_of_day(now=None):
+    day = datetime.datetime.fromtimestamp(time.time() if now is None else now).date()
+    return time.mktime(day.timetuple())
+
+
+# "ts >= ? AND ts < ? AND name = ? ..." for the given filters
+def _where(start=None, end=None, name=None, status=None, camera=None):
+    clauses, args = [], []
+    for column, op, value in (("ts", ">=", start), ("ts", "<", end), ("name", "=", name),
+                              ("status", "=", status), ("camera", "=", camera)):
+        if value is not None:
+            clauses.append(f"{column} {op} ?")
+            args.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+
+class EventStore:
+
+    def __init__(self, path, batch_size=500, flush_interval=0.5, queue_size=10000, readonly=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval    # longest time an event waits in the queue
+        self.readonly = readonly                # readers (dashboard) never start the writer
+
+        self.written = 0
+        self.dropped = 0
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()         # one read connection per thread
+
+        self._queue = None
+        self._thread = None
+        if not readonly:
+            connection = self._connect()
+            connection.executescript(SCHEMA)
+            connection.close()
+            self._queue = queue.Queue(maxsize=queue_size)
+            self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+            self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=10.0)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints, no fsync per batch
+        return connection
+
+    # Read connection of the calling thread
+    def _reader(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            connection.executescript(SCHEMA)  # the dashboard may start before the receiver
+            connection.execute("PRAGMA query_only=ON")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    # Queue one event (dict with EVENT_FIELDS keys; ts defaults to now). Never touches the disk.
+    def record(self, event, timeout=0.5):
+        row = tuple(event.get(field) for field in EVENT_FIELDS)
+        if row[0] is None:
+            row = (time.time(),) + row[1:]
+        try:
+            self._queue.put(row, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+
+    def _insert(self, connection, rows):
+        try:
+            with connection:
+                connection.executemany(f"INSERT INTO events ({', '.join(EVENT_FIELDS)}) "
+                                       f"VALUES ({', '.join('?' * len(EVENT_FIELDS))})", rows)
+            with self._stats_lock:
+                self.written += len(rows)
+        except sqlite3.Error as e:
+            print(f"Error writing events: {e}")
+
+    def _run(self):
+        connection = self._connect()
+        stopping = False
+        while not stopping:
+            batch = []
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+            if batch:
+                self._insert(connection, batch)
+        connection.close()
+
+    # Write everything still queued and stop the writer thread
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {"written": self.written, "dropped": self.dropped,
+                    "queued": self._queue.qsize() if self._queue is not None else 0}
+
+    # Events in [start, end) matching the filters, newest first
+    def events(self, start=None, end=None, name=None, status=None, camera=None, limit=None, offset=0):
+        where, args = _where(start, end, name, status, camera)
+        sql = f"SELECT {', '.join(EVENT_FIELDS)} FROM events{where} ORDER BY ts DESC, id DESC"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            args += [limit, offset]
+        return [dict(row) for row in self._reader().execute(sql, args)]
+
+    # Events of the last `seconds` seconds, newest first
+    def recent(self, seconds, **filters):
+        return self.events(start=time.time() - seconds, **filters)
+
+    def count(self, start=None, end=None, **filters):
+        where, args = _where(start, end, **filters)
+        return self._reader().execute(f"SELECT count(*) FROM events{where}", args).fetchone()[0]
+
+    # (recognized, not recognized) in [start, end)
+    def status_counts(self, start=None, end=None):
+        # One range count per status on the (status, ts) index
+        return (self.count(start, end, status="Recognized"),
+                self.count(start, end, status="Not Recognized"))
+
+    # [(name, recognized count), ...] most frequent first, e.g. per-person counts
+    # today with start=start_of_day()
+    def name_counts(self, start=None, end=None, limit=10):
+        where, args = _where(start, end, status="Recognized")
+        sql = f"SELECT name, count(*) AS n FROM events{where} GROUP BY name ORDER BY n DESC, name"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return [tuple(row) for row in self._reader().execute(sql, args)]
+
+    # Runs of unrecognized faces: at least `min_count` events, each within `gap`
+    # seconds of the previous one (per camera). Oldest first.
+    def unrecognized_bursts(self, start=None, end=None, gap=30.0, min_count=5):
+        where, args = _where(start, end, status="Not Recognized")
+        bursts = []
+        current = {}
+        rows = self._reader().execute(f"SELECT ts, camera FROM events{where} ORDER BY ts", args)
+        for ts, camera in rows:
+            burst = current.get(camera)
+            if burst is not None and ts - burst["end"] <= gap:
+                burst["end"] = ts
+                burst["count"] += 1
+                continue
+            if burst is not None and burst["count"] >= min_count:
+                bursts.append(burst)
+            current[camera] = {"camera": camera, "start": ts, "end": ts, "count": 1}
+        bursts.extend(b for b in current.values() if b["count"] >= min_count)
+        return sorted(bursts, key=lambda b: b["start"])
+
+    # Events with an ID above `after_id`, oldest first: (id, ts, name, status, camera)
+    def since(self, after_id, limit=10000):
+        return [tuple(row) for row in self._reader().execute(
+            "SELECT id, ts, name, status, camera FROM events WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))]
+
+    # Events in [start, end) matching the filters as EVENT_FIELDS tuples, oldest
+    # first, fetched `batch` rows at a time. The rows come from one SELECT on a
+    # connection of their own, so in WAL mode they are a consistent snapshot
+    # even while the receiver keeps inserting.
+    def export_rows(self, start=None, end=None, name=None, status=None, camera=None, batch=1000):
+        where, args = _where(start, end, name, status, camera)
+        connection = sqlite3.connect(self.path, timeout=10.0)
+        try:
+            cursor = connection.execute(f"SELECT {', '.join(EVENT_FIELDS)} FROM events{where} ORDER BY ts, id", args)
+            while True:
+                rows = cursor.fetchmany(batch)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            connection.close()
+
+    # Highest event ID (0 when empty); changes whenever events were added
+    def last_id(self, status=None):
+        where, args = _where(status=status)
+        return self._reader().execute(f"SELECT coalesce(max(id), 0) FROM events{where}", args).fetchone()[0]
+
+    # Copy the rows of a recognition_logs.csv (Timestamp, Name, Status) into the store
+    def import_csv(self, csv_path):
+        rows = []
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                name, status = (row.get("Name") or "").strip(), (row.get("Status") or "").strip()
+                if not name or not status:
+                    continue
+                try:
+                    ts = datetime.datetime.strptime(row["Timestamp"], "%Y-%m-%d %H:%M:%S").timestamp()
+                except (KeyError, ValueError):
+                    continue
+                rows.append((ts, None, None, name, status, None, None, None))
+        connection = self._connect()
+        connection.executescript(SCHEMA)
+        self._insert(connection, rows)
+        connection.close()
+        return len(rows)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "import":
+        sys.exit("usage: python3 event_store.py import <recognition_logs.csv> <events.db>")
+    store = EventStore(sys.argv[3], readonly=True)
+    print(f"Imported {store.import_csv(sys.argv[2])} events")
+    store.close()
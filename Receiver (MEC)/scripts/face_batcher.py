@@ -0,0 +1,135 @@
+import math
+import cv2
+import numpy as np
+from threading import Lock, Timer
+
+
+# Place each crop, scaled to fit, on a grid of square tiles.
+# Returns the mosaic and, per crop, its (x, y, width, height, scale) on it.
+def build_mosaic(crops, tile_size=160, gap=16):
+    cols = math.ceil(math.sqrt(len(crops)))
+    rows = math.ceil(len(crops) / cols)
+    cell = tile_size + gap
+    mosaic = np.zeros((rows * cell + gap, cols * cell + gap, 3), np.uint8)
+
+    layout = []
+    for i, crop in enumerate(crops):
+        h, w = crop.shape[:2]
+        scale = tile_size / max(h, w)
+        tw, th = max(1, int(w * scale)), max(1, int(h * scale))
+        x0 = gap + (i % cols) * cell
+        y0 = gap + (i // cols) * cell
+        mosaic[y0:y0 + th, x0:x0 + tw] = cv2.resize(crop, (tw, th))
+        layout.append((x0, y0, tw, th, scale))
+    return mosaic, layout
+
+
+# Split a recognize response for a mosaic into one response per crop,
+# with boxes in crop coordinates
+def split_result(result, layout):
+    per_crop = [[] for _ in layout]
+
+    for pred in result.get("predictions", []) if result else []:
+        cx = (pred["x_min"] + pred["x_max"]) / 2
+        cy = (pred["y_min"] + pred["y_max"]) / 2
+        for i, (x0, y0, tw, th, scale) in enumerate(layout):
+            if x0 <= cx < x0 + tw and y0 <= cy < y0 + th:
+                mapped = dict(pred)
+                mapped["x_min"] = int(max(0, pred["x_min"] - x0) / scale)
+                mapped["y_min"] = int(max(0, pred["y_min"] - y0) / scale)
+                mapped["x_max"] = int(min(tw, pred["x_max"] - x0) / scale)
+                mapped["y_max"] = int(min(th, pred["y_max"] - y0) / scale)
+                per_crop[i].append(mapped)
+                break
+
+    # A failed request ({} or {"success": False, ...}) is a failure for every crop,
+    # not an empty "nobody recognized" answer
+    failed = not result or result.get("success") is False
+    results = []
+    for preds in per_crop:
+        if failed:
+            results.append({})
+            continue
+        # Keep the best match if the server split one crop into several faces
+        preds.sort(key=lambda p: p.get("confidence", 0), reverse=True)
+        results.append({"success": result.get("success", True), "predictions": preds[:1]})
+    return results
+
+
+# Groups face crops into one recognition request.
+# Crops are letterboxed into square tiles and laid out on a single mosaic
+# image, the mosaic is encoded once and sent through `recognize_async`
+# (same signature as recognition.recognize_face_async), and every face the
+# server finds is mapped back to the tile - and so to the crop and callback -
+# it came from.
+#
+# window = 0   -> one batch per frame (call end_frame() after adding its crops)
+# window > 0   -> crops from several frames are collected for `window` seconds
+class FaceBatcher:
+
+    def __init__(self, recognize_async, executor, window=0.0, max_batch=16, tile_size=160, gap=16):
+        self.recognize_async = recognize_async
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.tile_size = tile_size
+        self.gap = gap  # blank border so the detector never merges neighbouring tiles
+
+        self._pending = []
+        self._lock = Lock()
+        self._timer = None
+
+        self.batches = 0
+        self.faces = 0
+
+    # Queue one crop; callback(result) receives a recognize-style response
+    # containing only the predictions for this crop, with boxes in crop coordinates
+    # (None if the request was dropped before it was sent)
+    def add(self, crop, callback):
+        if crop is None or crop.size == 0:
+            callback({})
+            return
+
+        with self._lock:
+            self._pending.append((crop, callback))
+            full = len(self._pending) >= self.max_batch
+            if not full and self.window > 0 and self._timer is None:
+                self._timer = Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self.flush()
+
+    # Called once all crops of a frame have been added
+    def end_frame(self):
+        if self.window <= 0:
+            self.flush()
+
+    # Send everything queued so far as one request
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not batch:
+            return
+
+        mosaic, layout = build_mosaic([crop for crop, _ in batch], self.tile_size, self.gap)
+        _, encoded = cv2.imencode('.jpg', mosaic)
+        callbacks = [callback for _, callback in batch]
+
+        self.batches += 1
+        self.faces += len(batch)
+        self.executor.submit(self.recognize_async, encoded.tobytes(),
+                             lambda result: self._dispatch(result, layout, callbacks))
+
+    def _dispatch(self, result, layout, callbacks):
+        if result is None:
+            for callback in callbacks:
+                callback(None)
+            return
+        for callback, crop_result in zip(callbacks, split_result(result, layout)):
+            callback(crop_result)
@@ -0,0 +1,104 @@
+from threading import Lock
+import cv2
+import numpy as np
+
+
+# One frame held by any number of pipeline stages.
+# The owner that gets it from the pool holds one reference; every other
+# holder calls retain() and, when done, release(). When the last reference
+# is released the array goes back to its pool for the next frame.
+# `jpeg` keeps the encoded bytes the frame was decoded from when they match
+# the array exactly, so the frame can be sent on without re-encoding.
+class FrameBuffer:
+
+    __slots__ = ("pool", "array", "jpeg", "refs", "_readonly")
+
+    def __init__(self, pool, array, jpeg=None):
+        self.pool = pool        # None: not pooled (e.g. the array cv2.imdecode returned)
+        self.array = array
+        self.jpeg = jpeg
+        self.refs = 1
+        self._readonly = None
+
+    # Read-only view for consumers that must not draw on the shared frame
+    def view(self):
+        if self._readonly is None:
+            self._readonly = self.array.view()
+            self._readonly.flags.writeable = False
+        return self._readonly
+
+    def retain(self):
+        with _refs_lock:
+            self.refs += 1
+        return self
+
+    def release(self):
+        with _refs_lock:
+            self.refs -= 1
+            last = self.refs == 0
+        if last and self.pool is not None:
+            self.jpeg = None
+            self.pool._give_back(self)
+
+
+# Reference counts are only touched for a few holders per frame; one lock for all is enough
+_refs_lock = Lock()
+
+
+# Preallocated frame arrays of one shape, reused instead of allocating a new
+# array for every decoded or annotated frame. The pool grows when all arrays
+# are in use; at most `max_free` idle arrays are kept. A buffer that is never
+# released is simply garbage-collected and the pool allocates a replacement.
+class FramePool:
+
+    def __init__(self, shape, dtype=np.uint8, preallocate=8, max_free=32):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.max_free = max_free
+        self._free = [np.empty(self.shape, dtype) for _ in range(preallocate)]
+        self._lock = Lock()
+
+        self.allocated = preallocate
+        self.reused = 0
+        self.wrapped = 0
+
+    # An empty pooled buffer (contents undefined)
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                array = self._free.pop()
+            else:
+                self.allocated += 1
+                array = None
+        if array is None:
+            array = np.empty(self.shape, self.dtype)
+        return FrameBuffer(self, array)
+
+    def _give_back(self, buffer):
+        with self._lock:
+            if len(self._free) < self.max_free:
+                self._free.append(buffer.array)
+
+    # A buffer with a copy of `image` (same shape), e.g. a frame to draw on
+    def copy_of(self, image):
+        buffer = self.acquire()
+        np.copyto(buffer.array, image)
+        return buffer
+
+    # A buffer holding `image` at the pool's size: the image itself when it
+    # already has that size (no copy; `jpeg` is kept), otherwise resized into
+    # a pooled array
+    def from_image(self, image, jpeg=None):
+        if image.shape == self.shape:
+            with self._lock:
+                self.wrapped += 1
+            return FrameBuffer(None, image, jpeg)
+        buffer = self.acquire()
+        cv2.resize(image, (self.shape[1], self.shape[0]), dst=buffer.array)
+        return buffer
+
+    def stats(self):
+        with self._lock:
+            return {"allocated": self.allocated, "free": len(self._free),
+                    "reused": self.reused, "wrapped": self.wrapped}
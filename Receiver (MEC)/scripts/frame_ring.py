@@ -0,0 +1,127 @@
+import time
+import struct
+from threading import Lock
+from multiprocessing import shared_memory
+
+# Shared memory layout:
+#   header  "<4sIIQ" magic, slots, slot_size, seq of the newest complete frame (padded to 32 bytes)
+#   slots   "<QQId" begin seq, end seq, length, timestamp (padded to 32 bytes), then slot_size bytes of JPEG
+RING_MAGIC = b"RNG1"
+_HEADER = struct.Struct("<4sIIQ")
+_SLOT = struct.Struct("<QQId")
+_HEADER_SIZE = 32
+_SLOT_HEADER_SIZE = 32
+_LATEST_OFFSET = 12
+
+
+# Ring of the latest encoded frames in shared memory, so another process
+# (the dashboard) can read them without any file I/O.
+# One process creates the ring and writes; any number of readers attach by
+# name. A slot's begin / end sequence numbers bracket each write: a reader
+# takes a slot whose end matches, copies it, and only keeps the copy if begin
+# still matches afterwards (the writer did not lap it meanwhile).
+class FrameRing:
+
+    def __init__(self, name, slots=4, slot_size=512 * 1024, create=False):
+        self.name = name
+        self.create = create
+        if create:
+            size = _HEADER_SIZE + slots * (_SLOT_HEADER_SIZE + slot_size)
+            try:
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # Left over from a receiver that did not shut down cleanly
+                stale = shared_memory.SharedMemory(name)
+                stale.close()
+                stale.unlink()
+                self.shm = shared_memory.SharedMemory(name, create=True, size=size)
+            _HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, slots, slot_size, 0)
+        else:
+            self.shm = _attach(name)
+            magic, slots, slot_size, _ = _HEADER.unpack_from(self.shm.buf, 0)
+            if magic != RING_MAGIC:
+                self.shm.close()
+                raise ValueError(f"{name} is not a frame ring")
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._lock = Lock()
+        self.written = 0
+        self.dropped = 0    # frames larger than a slot
+
+    def _slot_offset(self, seq):
+        return _HEADER_SIZE + (seq % self.slots) * (_SLOT_HEADER_SIZE + self.slot_size)
+
+    @property
+    def latest(self):
+        return struct.unpack_from("<Q", self.shm.buf, _LATEST_OFFSET)[0]
+
+    # Store one encoded frame; returns its sequence number (0 if it did not fit)
+    def write(self, data, timestamp=None):
+        if len(data) > self.slot_size:
+            self.dropped += 1
+            return 0
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            seq = self.latest + 1
+            offset = self._slot_offset(seq)
+            buf = self.shm.buf
+            struct.pack_into("<Q", buf, offset, seq)    # begin
+            start = offset + _SLOT_HEADER_SIZE
+            buf[start:start + len(data)] = data
+            _SLOT.pack_into(buf, offset, seq, seq, len(data), timestamp)
+            struct.pack_into("<Q", buf, _LATEST_OFFSET, seq)
+            self.written += 1
+        return seq
+
+    # Newest complete frame after `after` as (seq, timestamp, bytes), or None
+    def read_latest(self, after=0):
+        latest = self.latest
+        for seq in range(latest, max(after, latest - self.slots), -1):
+            offset = self._slot_offset(seq)
+            _, end, length, timestamp = _SLOT.unpack_from(self.shm.buf, offset)
+            if end != seq:
+                continue
+            start = offset + _SLOT_HEADER_SIZE
+            data = bytes(self.shm.buf[start:start + length])
+            begin = struct.unpack_from("<Q", self.shm.buf, offset)[0]
+            if begin == seq:
+                return seq, timestamp, data
+        return None
+
+    # Wait up to `timeout` seconds for a frame newer than `after`
+    def wait(self, after=0, timeout=1.0, poll=0.01):
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.read_latest(after)
+            if frame is not None or time.monotonic() >= deadline:
+                return frame
+            time.sleep(poll)
+
+    def stats(self):
+        return {"latest": self.latest, "written": self.written, "dropped": self.dropped,
+                "slots": self.slots, "slot_size": self.slot_size}
+
+    def close(self):
+        self.shm.close()
+        if self.create:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+# Attach to an existing segment without letting this process's resource
+# tracker unlink it on exit (only the creating process owns it)
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        shm = shared_memory.SharedMemory(name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
@@ -0,0 +1,112 @@
+import time
+from threading import Lock
+
+IDLE = "idle"            # no face in view
+NEW_FACE = "new_face"    # a face without an identity yet
+TRACKING = "tracking"    # only faces whose identity is cached by the tracker
+
+
+# Decides which incoming frames of one camera go to detection.
+# The target rate follows what the camera sees: idle_fps with nobody in view,
+# every frame (or max_fps) while a new face waits for an identity, track_fps
+# while only known faces are tracked. When the detect latency goes over
+# latency_budget or more than max_outstanding requests are queued, the rate
+# is halved (down to min_fps) and then recovers step by step (AIMD).
+class FrameSampler:
+
+    def __init__(self, idle_fps=2.0, track_fps=5.0, max_fps=0.0, min_fps=1.0, latency_budget=0.5,
+                 max_outstanding=8, new_face_hold=2.0, face_hold=3.0, recovery=0.1, smoothing=0.3):
+        self.idle_fps = idle_fps
+        self.track_fps = track_fps
+        self.max_fps = max_fps                  # 0 = every frame
+        self.min_fps = min_fps                  # floor while backing off
+        self.latency_budget = latency_budget    # seconds per detect call
+        self.max_outstanding = max_outstanding  # queued / in-flight API requests
+        self.new_face_hold = new_face_hold      # seconds at full rate after a new face
+        self.face_hold = face_hold              # seconds at track_fps after the last face
+        self.recovery = recovery                # rate factor regained per good detect call
+        self.smoothing = smoothing              # weight of the newest latency sample
+
+        self.factor = 1.0
+        self.latency = None
+        self.last_sample = 0.0
+        self.last_new_face = 0.0
+        self.last_face = 0.0
+        self.sampled = 0
+        self.skipped = 0
+        self.backoffs = 0
+        self._lock = Lock()
+
+    def state(self, now=None):
+        now = time.time() if now is None else now
+        if now - self.last_new_face < self.new_face_hold:
+            return NEW_FACE
+        if now - self.last_face < self.face_hold:
+            return TRACKING
+        return IDLE
+
+    # Target frames per second before backoff (0 = every frame)
+    def target_fps(self, now=None):
+        state = self.state(now)
+        if state == NEW_FACE:
+            return self.max_fps
+        if state == TRACKING:
+            return self.track_fps
+        return self.idle_fps
+
+    def _rate(self, now, outstanding):
+        target = self.target_fps(now)
+        factor = self.factor
+        if outstanding > self.max_outstanding:
+            factor = min(factor, 0.5)  # back off at once, before the next latency sample
+        if factor >= 1.0:
+            return target
+        if not target:
+            # "Every frame" has no rate to scale; back off from the track rate instead
+            target = max(self.track_fps, self.idle_fps)
+        return max(self.min_fps, target * factor)
+
+    # Called for every incoming frame; True if it should be decoded and detected
+    def admit(self, outstanding=0, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            rate = self._rate(now, outstanding)
+            if rate and now - self.last_sample < 1.0 / rate:
+                self.skipped += 1
+                return False
+            self.last_sample = now
+            self.sampled += 1
+            return True
+
+    # A detect call took `latency` seconds with `outstanding` requests queued
+    def observe(self, latency, outstanding=0):
+        with self._lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += self.smoothing * (latency - self.latency)
+            if self.latency > self.latency_budget or outstanding > self.max_outstanding:
+                self.factor = max(self.factor / 2, 0.05)
+                self.backoffs += 1
+            else:
+                self.factor = min(1.0, self.factor + self.recovery)
+
+    # Result of a detection: how many faces, and whether one of them is new
+    def faces(self, count, new=False, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            if count:
+                self.last_face = now
+            if new:
+                self.last_new_face = now
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {"state": self.state(now),
+                    "rate_fps": round(self._rate(now, 0), 2),
+                    "factor": round(self.factor, 3),
+                    "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                    "sampled": self.sampled,
+                    "skipped": self.skipped,
+                    "backoffs": self.backoffs}
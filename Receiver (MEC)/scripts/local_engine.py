@@ -0,0 +1,152 @@
+import time
+import threading
+import cv2
+import numpy as np
+from options import Options
+from api_client import EndpointStats
+from embedding_index import EmbeddingGallery
+
+# SFace input size; also the largest image treated as a bare face crop
+FACE_SIZE = 112
+
+# Confidence reported for a similarity of exactly Options.matchThreshold: the
+# min_confidence the receiver passes to the face API, so the same threshold
+# means "the same person" with either backend
+MATCH_CONFIDENCE = 0.6
+
+
+# SFace cosine similarity -> confidence on the face API's scale: the calibrated
+# match threshold maps to MATCH_CONFIDENCE, 1.0 to 1.0, linear on either side
+def similarity_to_confidence(similarity, threshold):
+    if similarity >= threshold:
+        return MATCH_CONFIDENCE + (1.0 - MATCH_CONFIDENCE) * (similarity - threshold) / (1.0 - threshold)
+    return max(0.0, MATCH_CONFIDENCE * similarity / threshold)
+
+
+# Face detection, embedding and matching inside this process, as a drop-in
+# for FaceApiClient (same methods, same response shapes) when
+# Options.faceBackend is "local".
+# Faces are found with OpenCV's YuNet detector and embedded with SFace; the
+# embeddings of registered users live in an EmbeddingGallery and every face
+# of a request is matched in one batched similarity search. `confidence` of
+# a face is its cosine similarity to the best gallery embedding, mapped with
+# similarity_to_confidence so min_confidence keeps the face API's meaning.
+class LocalFaceEngine:
+
+    def __init__(self, opts=None):
+        self.opts = opts or Options()
+        self.gallery = EmbeddingGallery(self.opts.galleryDir, dim=128,
+                                        ivf_threshold=self.opts.galleryIvfThreshold)
+        self.latency = EndpointStats()
+        # The OpenCV models keep per-call state, so every thread gets its own pair
+        self._models = threading.local()
+
+    def _detector(self, width, height):
+        models = self._models
+        if getattr(models, "detector", None) is None:
+            models.detector = cv2.FaceDetectorYN.create(self.opts.detectorModel, "", (width, height),
+                                                        self.opts.detectorThreshold)
+            models.recognizer = cv2.FaceRecognizerSF.create(self.opts.embeddingModel, "")
+        models.detector.setInputSize((width, height))
+        return models.detector
+
+    def _decode(self, image):
+        if isinstance(image, np.ndarray):
+            return image
+        return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+    # YuNet rows: x, y, w, h, 5 landmarks, score
+    def _faces(self, frame):
+        height, width = frame.shape[:2]
+        _, faces = self._detector(width, height).detect(frame)
+        return faces if faces is not None else np.zeros((0, 15), dtype=np.float32)
+
+    def _embed(self, frame, faces):
+        recognizer = self._models.recognizer
+        return np.vstack([recognizer.feature(recognizer.alignCrop(frame, face)) for face in faces])
+
+    @staticmethod
+    def _box(face, width, height):
+        x, y, w, h = face[:4]
+        return {"confidence": float(face[14]),
+                "x_min": int(max(0, x)), "y_min": int(max(0, y)),
+                "x_max": int(min(width, x + w)), "y_max": int(min(height, y + h))}
+
+    def _timed(self, route, fn, *args):
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            self.latency.record(route, time.perf_counter() - start, ok)
+
+    def detect(self, image) -> dict:
+        return self._timed("vision/face", self._detect, image)
+
+    def recognize(self, image, min_confidence=0.6) -> dict:
+        return self._timed("vision/face/recognize", self._recognize, image, min_confidence)
+
+    def register(self, image, user_id) -> dict:
+        return self._timed("vision/face/register", self._register, image, user_id)
+
+    def _detect(self, image):
+        frame = self._decode(image)
+        if frame is None:
+            return {"success": False, "error": "Unable to decode image"}
+        height, width = frame.shape[:2]
+        predictions = [self._box(face, width, height) for face in self._faces(frame)]
+        return {"success": True, "predictions": predictions, "count": len(predictions)}
+
+    def _recognize(self, image, min_confidence):
+        frame = self._decode(image)
+        if frame is None:
+            return {"success": False, "error": "Unable to decode image"}
+        height, width = frame.shape[:2]
+        faces = self._faces(frame)
+        predictions = []
+        if len(faces):
+            embeddings = self._embed(frame, faces)
+        elif max(width, height) <= 2 * FACE_SIZE:
+            # A face crop too tight for the detector ("single" mode): look again with a
+            # border around it, so the face is still aligned by its landmarks
+            pad = max(width, height) // 2
+            padded = cv2.copyMakeBorder(frame, pad, pad, pad, pad, cv2.BORDER_CONSTANT)
+            faces = self._faces(padded)
+            if len(faces):
+                embeddings = self._embed(padded, faces)
+                faces = faces.copy()
+                faces[:, [0, 4, 6, 8, 10, 12]] -= pad  # x and landmark x back to the crop
+                faces[:, [1, 5, 7, 9, 11, 13]] -= pad
+        if len(faces):
+            matches = self.gallery.search(embeddings)
+            for face, (user_id, similarity) in zip(faces, matches):
+                prediction = self._box(face, width, height)
+                confidence = similarity_to_confidence(similarity, self.opts.matchThreshold)
+                if user_id is not None and confidence >= min_confidence:
+                    prediction.update({"userid": user_id, "confidence": confidence})
+                else:
+                    prediction.update({"userid": "unknown", "confidence": confidence})
+                predictions.append(prediction)
+        return {"success": True, "predictions": predictions, "count": len(predictions)}
+
+    # Embed the most prominent face of the image under `user_id`
+    def _register(self, image, user_id):
+        frame = self._decode(image)
+        if frame is None:
+            return {"success": False, "error": "Unable to decode image"}
+        faces = self._faces(frame)
+        if not len(faces):
+            return {"success": False, "error": "No face detected"}
+        largest = faces[np.argmax(faces[:, 2] * faces[:, 3])][None, :]
+        self.gallery.add(user_id, self._embed(frame, largest))
+        return {"success": True, "message": "face added", "userid": user_id}
+
+    def stats(self) -> dict:
+        stats = self.latency.snapshot()
+        stats["gallery"] = self.gallery.stats()
+        return stats
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,158 @@
+import os
+import csv
+import time
+import queue
+import datetime
+from threading import Thread, Lock
+
+# Columns of recognition_logs.csv
+LOG_FIELDS = ["Timestamp", "Name", "Status"]
+
+# Marker put on the queue to tell the writer thread to finish
+_STOP = object()
+
+
+# Append-only CSV writer.
+# Callers only put rows on a queue; a single background thread owns the file,
+# appends rows in batches, flushes/fsyncs periodically and rotates the file
+# when it grows too large or too old. Cost per row does not depend on the
+# size of the log, and concurrent callers can no longer lose rows.
+class LogWriter:
+
+    def __init__(self, path, fields=LOG_FIELDS, batch_size=500, flush_interval=1.0,
+                 max_bytes=0, rotate_interval=0, backup_count=5, queue_size=10000):
+        self.path = path
+        self.fields = list(fields)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval    # seconds between fsyncs
+        self.max_bytes = max_bytes              # rotate when file reaches this size (0 = never)
+        self.rotate_interval = rotate_interval  # rotate after this many seconds (0 = never)
+        self.backup_count = backup_count        # number of rotated files to keep
+
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self._stats_lock = Lock()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._writer = None
+        self._opened_at = 0.0
+        self._thread = Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    # Queue one row (dict keyed by field name). Never touches the disk.
+    def log(self, entry, timeout=0.5):
+        try:
+            self._queue.put(entry, timeout=timeout)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+
+    # Write everything still queued and stop the writer thread
+    def close(self, timeout=5.0):
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            return {"written": self.written, "dropped": self.dropped,
+                    "rotations": self.rotations, "queued": self._queue.qsize()}
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self._file = open(self.path, "a", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fields, extrasaction="ignore")
+        # Only a new (or empty) file gets a header
+        if self._file.tell() == 0:
+            self._writer.writeheader()
+        self._opened_at = time.time()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def _should_rotate(self):
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            return True
+        if self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval:
+            return True
+        return False
+
+    # Rename the current file to <name>.<timestamp><ext> and start a new one
+    def _rotate(self):
+        self._close_file()
+
+        base, ext = os.path.splitext(self.path)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        target = f"{base}.{stamp}{ext}"
+        suffix = 1
+        while os.path.exists(target):
+            target = f"{base}.{stamp}-{suffix}{ext}"
+            suffix += 1
+        os.replace(self.path, target)
+
+        # Keep only the newest backups
+        if self.backup_count:
+            directory = os.path.dirname(self.path) or "."
+            prefix = os.path.basename(base) + "."
+            backups = sorted(f for f in os.listdir(directory)
+                             if f.startswith(prefix) and f.endswith(ext) and f != os.path.basename(self.path))
+            for old in backups[:-self.backup_count]:
+                try:
+                    os.remove(os.path.join(directory, old))
+                except OSError:
+                    pass
+
+        with self._stats_lock:
+            self.rotations += 1
+        self._open()
+
+    def _write_batch(self, batch):
+        try:
+            self._writer.writerows(batch)
+            self._file.flush()
+            with self._stats_lock:
+                self.written += len(batch)
+        except Exception as e:
+            print(f"Error logging to CSV: {e}")
+
+    def _run(self):
+        self._open()
+        last_sync = time.time()
+        stopping = False
+
+        while not stopping:
+            batch = []
+            try:
+                # Wait for the first row, then drain whatever else is already queued
+                item = self._queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write_batch(batch)
+
+            now = time.time()
+            if now - last_sync >= self.flush_interval:
+                os.fsync(self._file.fileno())
+                last_sync = now
+                if self._should_rotate():
+                    self._rotate()
+
+        self._close_file()
@@ -1,24 +1,23 @@
-import pandas as pd
 import matplotlib
 matplotlib.use('Agg')  # Use non-GUI backend for matplotlib
 import matplotlib.pyplot as plt
 import os
+from event_store import EventStore
 
-LOG_FILE_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_logs.csv"
+EVENT_DB_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_events.db"
 BAR_CHART_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\latest_bar_chart.png"
 
 def generate_bar_chart():
-    # Read the logs from CSV
-    if os.path.exists(LOG_FILE_PATH):
-        logs_df = pd.read_csv(LOG_FILE_PATH)
-
-        # Count the occurrences of each recognized face
-        top_recognized_faces = logs_df[logs_df["Status"] == "Recognized"]['Name'].value_counts().reset_index()
-        top_recognized_faces.columns = ['Name', 'Recognized Count']
+    # Count the occurrences of each recognized face in the event store (indexed query)
+    if os.path.exists(EVENT_DB_PATH):
+        store = EventStore(EVENT_DB_PATH, readonly=True)
+        top_recognized_faces = store.name_counts(limit=None)
+        store.close()
 
         # Create the bar chart using Matplotlib
         plt.figure(figsize=(10, 6))
-        plt.bar(top_recognized_faces['Name'], top_recognized_faces['Recognized Count'], color='skyblue')
+        plt.bar([name for name, _ in top_recognized_faces], [count for _, count in top_recognized_faces],
+                color='skyblue')
         plt.xlabel('Name')
         plt.ylabel('Recognized Count')
         plt.title('Top Recognized Faces')
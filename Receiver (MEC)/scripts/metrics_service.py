@@ -0,0 +1,65 @@
+import datetime
+from collections import Counter
+from threading import Lock
+
+
+# Running aggregates of the receiver's EventStore for the dashboard.
+# refresh() only fetches the events added since the last call (by row ID);
+# pages are read from the store with the time index, so nothing but the
+# counters is kept in memory.
+class EventMetrics:
+
+    def __init__(self, store):
+        self.store = store
+        self._last_id = 0
+        self._lock = Lock()
+
+        self.total = 0
+        self.recognized = 0
+        self.unrecognized = 0
+        self.names = Counter()  # recognized count per name
+        self.version = 0
+        self.names_version = 0
+
+    # Fetch the events added since the last call; returns their number
+    def refresh(self):
+        with self._lock:
+            recognized = self.recognized
+            added = 0
+            while True:
+                rows = self.store.since(self._last_id)
+                if not rows:
+                    break
+                for _, _, name, status, _ in rows:
+                    if status == "Recognized":
+                        self.recognized += 1
+                        self.names[name] += 1
+                    elif status == "Not Recognized":
+                        self.unrecognized += 1
+                self._last_id = rows[-1][0]
+                self.total += len(rows)
+                added += len(rows)
+
+            if self.recognized != recognized:
+                self.names_version += 1
+            if added:
+                self.version += 1
+            return added
+
+    # One page of events (Timestamp, Name, Status, Camera), most recent first
+    def page(self, page=0, page_size=20):
+        events = self.store.events(limit=page_size, offset=page * page_size)
+        return [{"Timestamp": datetime.datetime.fromtimestamp(e["ts"]).strftime("%Y-%m-%d %H:%M:%S"),
+                 "Name": e["name"], "Status": e["status"], "Camera": e["camera"]} for e in events]
+
+    def page_count(self, page_size=20):
+        with self._lock:
+            return max(1, -(-self.total // page_size))
+
+    def top_names(self, n=10):
+        with self._lock:
+            return self.names.most_common(n)
+
+    def counts(self):
+        with self._lock:
+            return self.recognized, self.unrecognized
@@ -0,0 +1,180 @@
+# Stand-in for the face API (vision/face, vision/face/recognize,
+# vision/face/register) with configurable latency, worker count and faces per
+# frame, for benchmarks and for running the receiver without the real server.
+#
+#   python3 mock_face_api.py --port 32168 --latency 0.05 --faces 1
+#
+# Images are not analysed: only the JPEG size is read, and boxes are laid out
+# so that the receiver's crops, batching mosaics and tracking behave as they
+# would with real faces.
+import json
+import time
+import random
+import struct
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Mosaic geometry of face_batcher.build_mosaic (tile_size, gap)
+TILE_SIZE = 160
+TILE_GAP = 16
+
+
+# (width, height) from the SOF marker of the first JPEG in `data`, or None
+def jpeg_size(data):
+    start = data.find(b"\xff\xd8")
+    if start < 0:
+        return None
+    i = start + 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            i += 1
+            continue
+        marker = data[i + 1]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">HH", data[i + 5:i + 9])
+            return width, height
+        i += 2 + length
+    return None
+
+
+class MockFaceApi:
+
+    def __init__(self, port=0, host="127.0.0.1", latency=0.03, jitter=0.01, workers=0,
+                 faces=1, known=0.8, users=("alice", "bob", "carol"), seed=0):
+        self.latency = latency    # mean seconds per request
+        self.jitter = jitter      # standard deviation of the latency
+        self.faces = faces        # faces found per detect call
+        self.known = known        # share of recognized faces that match a registered user
+        self.users = list(users)
+        self.random = random.Random(seed)
+        # A limited number of workers makes requests queue like on a real server (0 = unlimited)
+        self.slots = threading.BoundedSemaphore(workers) if workers else None
+        self.requests = {}
+        self._lock = threading.Lock()
+
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"    # keep-alive, like the real server
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                route = self.path.split("/v1/", 1)[-1].strip("/")
+                result = api.handle(route, body)
+                payload = json.dumps(result).encode()
+                self.send_response(200 if result.get("success") else 400)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.url = f"http://{host}:{self.port}/v1/"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-face-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _sleep(self):
+        with self._lock:
+            delay = max(0.0, self.random.gauss(self.latency, self.jitter))
+        time.sleep(delay)
+
+    def _identity(self):
+        with self._lock:
+            if self.users and self.random.random() < self.known:
+                return self.random.choice(self.users), round(self.random.uniform(0.7, 0.95), 3)
+        return "unknown", 0.0
+
+    # Face boxes spread across a frame
+    def _frame_boxes(self, width, height):
+        size = max(20, height // 4)
+        step = width // (self.faces + 1) if self.faces else width
+        return [(step * (i + 1) - size // 2, height // 2 - size // 2,
+                 step * (i + 1) + size // 2, height // 2 + size // 2) for i in range(self.faces)]
+
+    # One box per tile of a recognition mosaic, or one box for a single face crop
+    def _crop_boxes(self, width, height):
+        cell = TILE_SIZE + TILE_GAP
+        if (width - TILE_GAP) % cell == 0 and (height - TILE_GAP) % cell == 0:
+            cols, rows = (width - TILE_GAP) // cell, (height - TILE_GAP) // cell
+            return [(TILE_GAP + c * cell + 10, TILE_GAP + r * cell + 10,
+                     TILE_GAP + c * cell + TILE_SIZE - 10, TILE_GAP + r * cell + TILE_SIZE - 10)
+                    for r in range(rows) for c in range(cols)]
+        if max(width, height) <= 2 * TILE_SIZE:
+            return [(0, 0, width, height)]
+        return self._frame_boxes(width, height)
+
+    def handle(self, route, body):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+        if self.slots is not None:
+            self.slots.acquire()
+        try:
+            self._sleep()
+        finally:
+            if self.slots is not None:
+                self.slots.release()
+
+        size = jpeg_size(body)
+        if size is None:
+            return {"success": False, "error": "No valid image file was supplied"}
+        width, height = size
+
+        if route == "vision/face":
+            predictions = [{"confidence": 0.9, "x_min": x0, "y_min": y0, "x_max": x1, "y_max": y1}
+                           for x0, y0, x1, y1 in self._frame_boxes(width, height)]
+        elif route == "vision/face/recognize":
+            predictions = []
+            for x0, y0, x1, y1 in self._crop_boxes(width, height):
+                userid, confidence = self._identity()
+                predictions.append({"confidence": confidence, "userid": userid,
+                                    "x_min": x0, "y_min": y0, "x_max": x1, "y_max": y1})
+        elif route == "vision/face/register":
+            return {"success": True, "message": "face added"}
+        else:
+            return {"success": False, "error": f"Unknown route {route}"}
+        return {"success": True, "predictions": predictions, "count": len(predictions)}
+
+    def stats(self):
+        with self._lock:
+            return dict(self.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock face API server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=32168)
+    parser.add_argument("--latency", type=float, default=0.03, help="mean seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.01, help="standard deviation of the latency")
+    parser.add_argument("--workers", type=int, default=0, help="requests served at once (0 = unlimited)")
+    parser.add_argument("--faces", type=int, default=1, help="faces per detect call")
+    parser.add_argument("--known", type=float, default=0.8, help="share of faces recognized as a user")
+    args = parser.parse_args()
+
+    api = MockFaceApi(args.port, args.host, args.latency, args.jitter, args.workers, args.faces, args.known)
+    print(f"Mock face API on {api.url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
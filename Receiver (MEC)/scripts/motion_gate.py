@@ -0,0 +1,77 @@
+# Motion / scene-change gate.
+# The same file is used by the transmitter (before publishing) and the
+# receiver (before the vision/face call).
+#
+# Frames are compared on a small blurred grayscale copy, either against a
+# running-average background ("diff") or with OpenCV's MOG2 background
+# subtractor ("mog2"). A frame passes when enough pixels changed, for
+# `hold` seconds after the last change, and once every `keyframe_interval`
+# seconds so downstream state (dashboard, trackers) never goes stale.
+import time
+import cv2
+
+
+class MotionGate:
+
+    def __init__(self, method="diff", width=160, pixel_threshold=25, min_changed=0.01,
+                 hold=2.0, keyframe_interval=5.0, learning_rate=0.05):
+        self.method = method
+        self.width = width                      # width of the analysis copy
+        self.pixel_threshold = pixel_threshold  # grey-level change that counts as motion
+        self.min_changed = min_changed          # fraction of changed pixels that opens the gate
+        self.hold = hold
+        self.keyframe_interval = keyframe_interval
+        self.learning_rate = learning_rate
+
+        self._background = None
+        self._subtractor = None
+        if method == "mog2":
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(history=200, varThreshold=pixel_threshold,
+                                                                  detectShadows=False)
+        self._last_motion = 0.0
+        self._last_pass = 0.0
+
+        self.passed = 0
+        self.skipped = 0
+        self.changed = 0.0  # changed fraction of the last frame
+
+    # Fraction of pixels that changed compared with the background
+    def _measure(self, frame):
+        height = max(1, frame.shape[0] * self.width // frame.shape[1])
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
+
+        if self._subtractor is not None:
+            mask = self._subtractor.apply(gray, learningRate=self.learning_rate)
+            return cv2.countNonZero(mask) / mask.size
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype("float32")
+            return 1.0
+        delta = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        _, mask = cv2.threshold(delta, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        return cv2.countNonZero(mask) / mask.size
+
+    # True if the frame should be processed / sent
+    def check(self, frame, now=None):
+        now = time.time() if now is None else now
+        self.changed = self._measure(frame)
+
+        if self.changed >= self.min_changed:
+            self._last_motion = now
+
+        if (now - self._last_motion <= self.hold
+                or (self.keyframe_interval and now - self._last_pass >= self.keyframe_interval)):
+            self._last_pass = now
+            self.passed += 1
+            return True
+
+        self.skipped += 1
+        return False
+
+    def stats(self):
+        total = self.passed + self.skipped
+        return {"passed": self.passed, "skipped": self.skipped,
+                "skip_rate": self.skipped / total if total else 0.0, "changed": self.changed}
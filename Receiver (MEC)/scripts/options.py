@@ -7,6 +7,22 @@ class Options:
     serverUrl     = f"http://{serverHost}:{serverPort}/v1/"
     imageDir      = ""
 
+    # HTTP client settings for the face API
+    connectTimeout = 2.0    # seconds to establish a connection
+    readTimeout    = 10.0   # seconds to wait for a response
+    maxRetries     = 2      # retries on connection errors / 5xx
+    retryBackoff   = 0.2    # backoff factor between retries (seconds)
+    poolSize       = 8      # keep-alive connections per host
+
+    # Face backend: "http" (the face API above) or "local" (local_engine.LocalFaceEngine)
+    faceBackend         = "http"
+    detectorModel       = "models/face_detection_yunet_2023mar.onnx"
+    embeddingModel      = "models/face_recognition_sface_2021dec.onnx"
+    detectorThreshold   = 0.8
+    matchThreshold      = 0.363         # SFace cosine similarity of the same person (OpenCV's calibration)
+    galleryDir          = "gallery"     # embeddings.f32 + labels.txt
+    galleryIvfThreshold = 20000         # approximate search from this many embeddings
+
     # names of directories of interest
     detectedDir = "detected"
 
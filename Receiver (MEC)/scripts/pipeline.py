@@ -0,0 +1,234 @@
+import time
+from collections import deque
+from threading import Condition, Lock, Thread
+
+# What a full queue does with a new item
+DROP_OLDEST = "drop_oldest"   # discard the oldest queued item to make room
+LATEST_ONLY = "latest_only"   # keep only the newest item (queue of one)
+BLOCK = "block"               # wait up to put_timeout, then drop the new item
+
+
+# Bounded queue between two pipeline stages.
+# Consumers sleep on a condition variable instead of polling, every
+# overflow follows an explicit drop policy, and depth / drop counters are
+# kept for monitoring.
+class StageQueue:
+
+    def __init__(self, name, maxsize=4, policy=DROP_OLDEST, put_timeout=1.0, on_drop=None):
+        self.name = name
+        self.policy = policy
+        self.maxsize = 1 if policy == LATEST_ONLY else maxsize
+        self.put_timeout = put_timeout
+        self.on_drop = on_drop  # called with each discarded item
+
+        self._items = deque()
+        self._cond = Condition()
+        self._closed = False
+
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    # Add an item; returns False if it (not an older one) was dropped
+    def put(self, item):
+        dropped = None
+        with self._cond:
+            if self._closed:
+                return False
+
+            if len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    if not self._cond.wait_for(lambda: len(self._items) < self.maxsize or self._closed,
+                                               self.put_timeout) or self._closed:
+                        self.dropped += 1
+                        dropped = item
+                else:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+
+            if dropped is not item:
+                self._items.append(item)
+                self.put_count += 1
+                self.max_depth = max(self.max_depth, len(self._items))
+                self._cond.notify_all()
+
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+        return dropped is not item
+
+    # Wait for the next item; returns None on timeout or once closed and empty
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return None
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self.get_count += 1
+            self._cond.notify_all()
+            return item
+
+    # Stop accepting items and wake up every waiting consumer
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self):
+        return self._closed
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._cond:
+            return {"depth": len(self._items), "max_depth": self.max_depth, "capacity": self.maxsize,
+                    "put": self.put_count, "get": self.get_count, "dropped": self.dropped}
+
+
+# Pipeline stage: a bounded StageQueue of (fn, args) tasks served by worker threads.
+# submit() has the same shape as ThreadPoolExecutor.submit, but never builds an
+# unbounded backlog: overflow is handled by the queue's drop policy.
+class WorkerStage:
+
+    def __init__(self, name, workers=1, maxsize=8, policy=DROP_OLDEST, put_timeout=1.0, on_drop=None):
+        self.name = name
+        self.queue = StageQueue(name, maxsize, policy, put_timeout, on_drop)
+        self.processed = 0
+        self.errors = 0
+        self.busy_time = 0.0
+        self._stats_lock = Lock()
+        self._threads = [Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, *args):
+        return self.queue.put((fn, args))
+
+    def _run(self):
+        while True:
+            task = self.queue.get()
+            if task is None:
+                if self.queue.closed:
+                    return
+                continue
+
+            fn, args = task
+            start = time.perf_counter()
+            failed = False
+            try:
+                fn(*args)
+            except Exception as e:
+                failed = True
+                print(f"Error in {self.name} stage: {e}")
+            with self._stats_lock:
+                self.processed += 1
+                self.errors += failed
+                self.busy_time += time.perf_counter() - start
+
+    # Finish the queued tasks, then stop the workers
+    def close(self, timeout=5.0):
+        self.queue.close()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        stats = self.queue.stats()
+        with self._stats_lock:
+            stats.update({"workers": len(self._threads), "processed": self.processed,
+                          "errors": self.errors, "busy_s": round(self.busy_time, 3)})
+        return stats
+
+
+# Fair scheduler over many producers (e.g. cameras).
+# Each key keeps only its newest item. get() hands out items with smooth
+# weighted round-robin among the keys that have one waiting, so a busy key
+# cannot starve a quiet one. weight(key) may change over time, e.g. to favour
+# cameras with recent activity. A key that has been handed out is not handed
+# out again until done(key) is called, so each key is processed in order by
+# one consumer at a time.
+class FairScheduler:
+
+    def __init__(self, name, weight=None, on_drop=None):
+        self.name = name
+        self.weight = weight or (lambda key: 1)
+        self.on_drop = on_drop  # called with each replaced item
+        self._items = {}
+        self._current = {}
+        self._busy = set()
+        self._cond = Condition()
+        self._closed = False
+
+        self.put_count = 0
+        self.get_count = 0
+        self.dropped = 0  # items replaced before they were taken
+
+    def put(self, key, item):
+        with self._cond:
+            if self._closed:
+                return False
+            replaced = self._items.get(key)
+            if key in self._items:
+                self.dropped += 1
+            self._items[key] = item
+            self._current.setdefault(key, 0)
+            self.put_count += 1
+            self._cond.notify_all()
+        if replaced is not None and self.on_drop is not None:
+            self.on_drop(replaced)
+        return True
+
+    # Take the next (key, item) without waiting; None if nothing is ready
+    def poll(self):
+        with self._cond:
+            return self._take()
+
+    # Wait for the next (key, item); None on timeout or once closed
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._ready() or self._closed, timeout):
+                return None
+            return self._take()
+
+    # The consumer has finished with the item it got for `key`
+    def done(self, key):
+        with self._cond:
+            self._busy.discard(key)
+            self._cond.notify_all()
+
+    def _ready(self):
+        return [key for key in self._items if key not in self._busy]
+
+    def _take(self):
+        ready = self._ready()
+        if not ready:
+            return None
+        total = 0
+        best = None
+        for key in ready:
+            weight = max(1, self.weight(key))
+            self._current[key] += weight
+            total += weight
+            if best is None or self._current[key] > self._current[best]:
+                best = key
+        self._current[best] -= total
+        self._busy.add(best)
+        self.get_count += 1
+        return best, self._items.pop(best)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def stats(self):
+        with self._cond:
+            return {"depth": len(self._items), "busy": len(self._busy), "put": self.put_count,
+                    "get": self.get_count, "dropped": self.dropped}
@@ -1,89 +1,463 @@
 import os
+import sys
 import cv2
 import numpy as np
 import requests
 import datetime
 import time
-import pandas as pd
 from options import Options
-from threading import Thread, Lock, Event
-from concurrent.futures import ThreadPoolExecutor
+from log_writer import LogWriter
+from event_store import EventStore
+from api_client import create_face_client
+from face_batcher import FaceBatcher
+from tracker import FaceTracker
+from motion_gate import MotionGate
+from frame_sampler import FrameSampler
+from cameras import CameraState, CameraRegistry, camera_from_topic
+from actuator import DoorActuator
+from frame_ring import FrameRing
+from frame_pool import FramePool
+from recognition_cache import RecognitionCache, face_hash
+from tracing import Tracer
+from pipeline import WorkerStage, FairScheduler, DROP_OLDEST, BLOCK
+from threading import Thread, Lock, Event, Condition
 import paho.mqtt.client as mqtt
-import base64
-import paramiko
-import send_cmd as send  # Import for LED control
-
-# SSH Configuration for LED control
-raspberry_pi_ip = "172.30.212.124"
-username = "pi"
-password = "raspberry"
-ssh = paramiko.SSHClient()
-ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-ssh.connect(raspberry_pi_ip, username=username, password=password)
-
-# Ensure LED is off at the start
-send.turn_led_off(ssh)
-
-# Paths to files for logging and storing the latest frame
+import json
+import frame_codec
+
+# Door / LED control through the door agent on each Pi (door_agent.py).
+# The door stays unlocked DOOR_HOLD seconds after the last recognition; the
+# agent locks by itself if it hears nothing for DOOR_TTL seconds.
+# Commands are signed with DOOR_KEY, the key the agents are started with;
+# agents ignore commands without a valid signature.
+DOOR_HOLD = 3.0
+DOOR_REFRESH = 10.0
+DOOR_TTL = 30.0
+DOOR_KEY = os.environ.get("DOOR_KEY", "")
+
+# Path to the file for logging
 LOG_FILE_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_logs.csv"
-FRAME_FILE_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\latest_frame.jpg"
+
+# Per-frame latency tracing: Prometheus text on http://<mec>:METRICS_PORT/metrics
+# (0 disables the endpoint), one CSV row per recognition in TRACE_LOG_PATH (None disables)
+METRICS_PORT = 9108
+TRACE_LOG_PATH = None
+tracer = Tracer(TRACE_LOG_PATH)
+
+# Annotated frames go to the dashboard's /stream through shared memory, one ring
+# per camera (FRAME_RING_NAME + "_" + camera ID, shown with /stream?camera=<id>).
+# Received frames are copied there as they are (no decode) while a camera has had
+# no annotated frame for STREAM_RAW_AFTER seconds, so the stream keeps the camera's
+# frame rate when frames are gated or not sampled. Annotated frames only take over
+# again once they come steadily (two within STREAM_RAW_AFTER); a single one is not
+# shown between raw frames, so the stream does not flicker.
+FRAME_RING_NAME = "face_recognition_frames"
+STREAM_QUALITY = 80
+STREAM_RAW_AFTER = 0.5
+frame_rings = {}
+frame_ring_lock = Lock()
+
+# Log rotation (0 disables); rotated files are kept next to the log
+LOG_ROTATE_BYTES = 0
+LOG_ROTATE_SECONDS = 0
+
+# Indexed event history (SQLite, WAL) for the dashboard: camera, track, identity,
+# confidence, latency and frame of every recognition
+EVENT_DB_PATH = r"C:\Users\chean\Downloads\5G-Facial-Recognition-Group3\5G-Facial-Recognition-Group3\recognition_events.db"
+
+# Single background writer for the recognition log, and the event store; both are
+# opened by open_logs() when a receiver starts, not on import (benchmark.py
+# imports this module and logs elsewhere)
+log_writer = None
+event_store = None
+
+# Open the recognition log and the event store (defaults: LOG_FILE_PATH, EVENT_DB_PATH)
+def open_logs(log_path=None, db_path=None):
+    global log_writer, event_store
+    log_writer = LogWriter(log_path or LOG_FILE_PATH, max_bytes=LOG_ROTATE_BYTES, rotate_interval=LOG_ROTATE_SECONDS)
+    event_store = EventStore(db_path or EVENT_DB_PATH)
+
+# Write out queued log rows and events
+def close_logs():
+    if log_writer is not None:
+        log_writer.close()
+    if event_store is not None:
+        event_store.close()
 
 # Create an instance of the Options class
 opts = Options()
 
 # MQTT Configuration
 MQTT_BROKER = "172.30.212.124"
-MQTT_RECEIVE = "home/server"
+MQTT_RECEIVE = "doors/+/frames"      # one topic per camera: doors/<camera id>/frames
+MQTT_LEGACY_RECEIVE = "home/server"  # single-camera transmitters, handled as DEFAULT_CAMERA
+DEFAULT_CAMERA = "default"
+ACCEPT_LEGACY_BASE64 = True  # also accept frames from older base64 senders
+FEEDBACK_INTERVAL = 1.0
+MQTT_FACES_REGISTERED = "faces/registered"  # registration.py / bulk_enroll.py announce new faces here
+# Broker login, if the broker does not take anonymous clients (see the README for the ACL)
+MQTT_USERNAME = os.environ.get("MQTT_USERNAME", "")
+MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
+client = None
+
+# Frame size used for processing; the transmitter encodes at this size
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+
+# Reused frame arrays for resized and annotated frames; the stages share a
+# frame through reference-counted read-only views instead of copying it
+frame_pool = FramePool((FRAME_HEIGHT, FRAME_WIDTH, 3))
 
 # Global variables
-frame = None
-processed_frame = None
-frame_lock = Lock()
-processed_frame_lock = Lock()
+frame_cond = Condition()  # notified when any camera has a new decoded frame
 stop_event = Event()
 
-# ThreadPoolExecutor for face recognition requests
-recognition_executor = ThreadPoolExecutor(max_workers=5)
+# Staged pipeline: receive -> decode -> detect -> recognize -> act/log
+# Every hand-off is a bounded queue. When a stage falls behind, the drop policy
+# decides what is lost: "drop_oldest" keeps the newest items, "latest_only"
+# keeps just one.
+PIPELINE_DROP_POLICY = DROP_OLDEST
+DECODE_QUEUE_SIZE = 4
+RECOGNIZE_QUEUE_SIZE = 16
+ACTION_QUEUE_SIZE = 64
+RECOGNITION_WORKERS = 5
+DETECT_WORKERS = 2  # detection threads shared by all cameras
+
+# Image workers: JPEG decode, resize and the live stream encode run on this many
+# threads (OpenCV releases the GIL, so they use separate cores). Frames of one
+# camera may finish out of order; a frame finishing after a newer one of the
+# same camera is dropped, so each camera's frames still move forward in order.
+IMAGE_WORKERS = os.cpu_count() or 2
+IMAGE_QUEUE_SIZE = 16
+OPENCV_THREADS = 1  # OpenCV's own threads per call; the image workers already fill the cores
+
+# Stages are created by start_pipeline() (threaded mode only)
+decode_stage = None
+detect_scheduler = None
+recognize_stage = None
+action_stage = None
+image_stage = None
+face_batcher = None
+
+# Pooled face API client (one connection per recognition and detection worker),
+# or the local engine when opts.faceBackend is "local"
+api = create_face_client(opts, pool_size=RECOGNITION_WORKERS + DETECT_WORKERS)
+
+# How faces are recognized:
+#   "batch" - detect, then all crops of a frame (or of BATCH_WINDOW seconds) in one recognize call
+#   "frame" - skip detect, send the whole frame to recognize and use its boxes
+#   "single" - detect, then one recognize call per face
+RECOGNITION_MODE = "batch"
+BATCH_WINDOW = 0.0     # seconds to collect crops across frames (0 = per frame)
+BATCH_MAX_FACES = 16
+
+# Track faces across frames and only re-recognize new tracks or expired identities
+# ("batch" and "single" modes; "frame" mode has no separate detect step to track with)
+TRACKING = True
+
+# Skip detection on frames where nothing changed (keyframe every few seconds)
+MOTION_GATING = True
+
+# Reuse the "Not Recognized" result of a nearly identical face crop (perceptual
+# hash within CACHE_THRESHOLD bits, same camera) seen in the last CACHE_TTL
+# seconds; recognized identities always go to the recognizer. Emptied whenever
+# new faces are registered (MQTT_FACES_REGISTERED).
+RECOGNITION_CACHE = True
+CACHE_SIZE = 256
+CACHE_TTL = 10.0
+CACHE_THRESHOLD = 6
+recognition_cache = RecognitionCache(CACHE_SIZE, CACHE_TTL, CACHE_THRESHOLD)
+
+# Adaptive frame sampling: which incoming frames are decoded and sent to
+# detection, based on the detect latency, the queued API requests and whether a
+# new face is in view (see frame_sampler.FrameSampler for the settings).
+# CAMERA_SAMPLING overrides the defaults per camera, e.g.
+#   {"door1": {"max_fps": 10, "latency_budget": 0.3}}
+FRAME_SAMPLING = True
+SAMPLING = {"idle_fps": 2.0, "track_fps": 5.0, "max_fps": 0.0, "latency_budget": 0.5, "max_outstanding": 8}
+CAMERA_SAMPLING = {}
+
+# Detection share of cameras that saw a face in the last ACTIVITY_WINDOW seconds
+ACTIVE_CAMERA_WEIGHT = 3
+ACTIVITY_WINDOW = 10.0
+
+
+# Publish on the receiver's MQTT connection (the asyncio receiver replaces
+# this to hand publishes to its event loop)
+def mqtt_publish(topic, payload, qos=0, retain=False):
+    client.publish(topic, payload, qos=qos, retain=retain)
+
+
+# MQTT client logged in to the broker, for both receivers
+def new_mqtt_client():
+    mqtt_client = mqtt.Client()
+    if MQTT_USERNAME:
+        mqtt_client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+    return mqtt_client
+
+
+# Per-camera state: tracker, motion gate, door actuator and frame sampler
+def new_camera(camera_id):
+    if not DOOR_KEY:
+        print(f"DOOR_KEY is not set: the door agent of {camera_id} will ignore its commands")
+    return CameraState(camera_id,
+                       tracker=FaceTracker(identity_ttl=10.0, unknown_ttl=1.0),
+                       motion_gate=MotionGate(pixel_threshold=25, min_changed=0.01, hold=2.0,
+                                              keyframe_interval=5.0),
+                       actuator=DoorActuator(camera_id, lambda *args, **kwargs: mqtt_publish(*args, **kwargs),
+                                             DOOR_KEY, hold=DOOR_HOLD, refresh=DOOR_REFRESH, ttl=DOOR_TTL),
+                       sampler=FrameSampler(**{**SAMPLING, **CAMERA_SAMPLING.get(camera_id, {})}))
+
+cameras = CameraRegistry(new_camera)
+
+
+# Create the bounded stages of the threaded pipeline
+def start_pipeline():
+    global decode_stage, detect_scheduler, recognize_stage, action_stage, image_stage, face_batcher
+
+    cv2.setNumThreads(OPENCV_THREADS)
+    # MQTT payloads waiting to be decoded (and resized)
+    decode_stage = WorkerStage("decode", workers=IMAGE_WORKERS, maxsize=max(DECODE_QUEUE_SIZE, IMAGE_WORKERS),
+                               policy=PIPELINE_DROP_POLICY)
+    # Newest decoded frame of every camera; cameras take turns, active ones more often
+    detect_scheduler = FairScheduler("detect", weight=lambda camera_id: cameras.get(camera_id).weight(
+        boost=ACTIVE_CAMERA_WEIGHT, window=ACTIVITY_WINDOW), on_drop=release_item)
+    # Face recognition requests (replaces the unbounded ThreadPoolExecutor backlog)
+    recognize_stage = WorkerStage("recognize", workers=RECOGNITION_WORKERS,
+                                  maxsize=RECOGNIZE_QUEUE_SIZE, policy=PIPELINE_DROP_POLICY, on_drop=fail_recognition)
+    # LED / log / frame file updates; blocks briefly rather than losing log rows
+    action_stage = WorkerStage("action", workers=1, maxsize=ACTION_QUEUE_SIZE, policy=BLOCK, on_drop=release_task)
+    # Live stream JPEG encoding
+    image_stage = WorkerStage("image", workers=IMAGE_WORKERS, maxsize=IMAGE_QUEUE_SIZE, policy=PIPELINE_DROP_POLICY,
+                              on_drop=release_task)
+
+    # Groups the face crops of a frame into a single recognize request
+    face_batcher = FaceBatcher(recognize_face_async, recognize_stage,
+                               window=BATCH_WINDOW, max_batch=BATCH_MAX_FACES)
+
+
+# Finish queued work and stop the stage threads
+def stop_pipeline():
+    detect_scheduler.close()
+    for stage in (decode_stage, recognize_stage, action_stage, image_stage):
+        stage.close()
+
+
+# Queue depth and drop counters of every stage
+def pipeline_stats():
+    return {"decode": decode_stage.stats(), "detect": detect_scheduler.stats(),
+            "recognize": recognize_stage.stats(), "action": action_stage.stats(), "image": image_stage.stats(),
+            "cameras": cameras.stats()}
 
 # MQTT Callbacks
 def on_connect(client, userdata, flags, rc):
     print("Connected with result code " + str(rc))
-    client.subscribe(MQTT_RECEIVE)
+    client.subscribe([(MQTT_RECEIVE, 0), (MQTT_LEGACY_RECEIVE, 0), (MQTT_FACES_REGISTERED, 1)])
+
+# New faces were registered: cached "Not Recognized" results may now be wrong
+def faces_registered(payload):
+    recognition_cache.invalidate()
+    print(f"Faces registered ({payload.decode('utf-8', 'replace')}), recognition cache cleared")
+
+# API requests waiting or in flight, for the frame samplers
+def outstanding_requests():
+    return decode_stage.queue.depth + recognize_stage.queue.depth
 
 def on_message(client, userdata, msg):
-    global frame
+    if msg.topic == MQTT_FACES_REGISTERED:
+        faces_registered(msg.payload)
+        return
+    # Only hand the payload over; decoding happens in the decode stage
+    camera_id = camera_from_topic(msg.topic, DEFAULT_CAMERA)
+    camera = cameras.get(camera_id)
+    stream_received(camera, msg.payload)
+    keyframe = frame_codec.frame_flags(msg.payload) & frame_codec.FLAG_KEYFRAME  # edge display frame
+    if FRAME_SAMPLING and not keyframe and not camera.sampler.admit(outstanding_requests()):
+        return  # not sampled: not even decoded
+    camera.received_seq += 1  # only this (network) thread stamps frames
+    decode_stage.submit(decode_frame, camera_id, msg.payload, time.time(), camera.received_seq)
+
+# Turn an MQTT payload into (frame header or None, BGR frame at the processing size, edge faces).
+# Face crops from an edge camera have no frame: edge faces is then a list of
+# (prediction, crop rectangle, crop image) with the box and the rectangle
+# (x, y, w, h) at the processing size; it is None for whole frames.
+# With a FramePool the frame is a FrameBuffer, which keeps (a view of) the
+# received JPEG when no resize was needed.
+def decode_message(payload, pool=None):
+    # Binary frames are decoded straight from the payload, without a copy
+    header, jpeg = frame_codec.unpack_frame(payload, allow_legacy=ACCEPT_LEGACY_BASE64)
+    if header is not None and header.flags & frame_codec.FLAG_CROPS:
+        return header, None, decode_crops(header, jpeg)
+    npimg = np.frombuffer(jpeg, dtype=np.uint8)
+    decoded_frame = cv2.imdecode(npimg, 1)
+    if pool is not None:
+        return header, pool.from_image(decoded_frame, jpeg), None
+
+    # Resize the frame for faster processing
+    if decoded_frame.shape[1] == FRAME_WIDTH and decoded_frame.shape[0] == FRAME_HEIGHT:
+        return header, decoded_frame, None
+    return header, cv2.resize(decoded_frame, (FRAME_WIDTH, FRAME_HEIGHT)), None
+
+def decode_payload(payload):
+    return decode_message(payload)[1]
+
+# Face crops of an edge payload; crops keep their size, boxes are scaled to the processing size
+def decode_crops(header, body):
+    sx, sy = FRAME_WIDTH / header.width, FRAME_HEIGHT / header.height
+    faces = []
+    for crop in frame_codec.unpack_crops(body):
+        image = cv2.imdecode(np.frombuffer(crop.image, dtype=np.uint8), 1)
+        if image is None:
+            continue
+        x_min, y_min, x_max, y_max = crop.box
+        prediction = {"x_min": int(x_min * sx), "y_min": int(y_min * sy),
+                      "x_max": int(x_max * sx), "y_max": int(y_max * sy)}
+        rect = (int(crop.x * sx), int(crop.y * sy), int(image.shape[1] * sx), int(image.shape[0] * sy))
+        faces.append((prediction, rect, image))
+    return faces
+
+# Picture for an edge crop payload: the camera's last keyframe with the new crops pasted in
+# (a FrameBuffer of `pool` if given, otherwise an array)
+def edge_canvas(camera, faces, pool=None):
+    buffer = pool.acquire() if pool is not None else None
+    with frame_cond:
+        if buffer is None:
+            canvas = camera.frame.copy() if camera.frame is not None else np.zeros((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8)
+        elif camera.frame is not None:
+            canvas = buffer.array
+            np.copyto(canvas, camera.frame)
+        else:
+            canvas = buffer.array
+            canvas[:] = 0
+    for _, (x, y, w, h), image in faces:
+        w, h = min(w, FRAME_WIDTH - x), min(h, FRAME_HEIGHT - y)
+        if w > 0 and h > 0:
+            canvas[y:y + h, x:x + w] = cv2.resize(image, (w, h))
+    return buffer if buffer is not None else canvas
+
+# Make `buffer` the camera's latest frame (frame_cond held); returns the buffer it replaces
+def set_camera_frame(camera, buffer):
+    replaced, camera.frame_buffer = camera.frame_buffer, buffer.retain()
+    camera.frame = buffer.view()
+    return replaced
+
+# Make `buffer` the camera's annotated frame for display
+def set_processed_frame(camera, buffer):
+    with camera.lock:
+        replaced, camera.processed_buffer = camera.processed_buffer, buffer.retain()
+        camera.processed_frame = buffer.view()
+    if replaced is not None:
+        replaced.release()
+
+# Detect item replaced by a newer frame of the same camera before it was taken
+def release_item(item):
+    if item[0] is not None:
+        item[0].release()
+
+# Run fn(*args), then release the frame buffer it draws on
+def release_after(buffer, fn, *args):
     try:
-        img = base64.b64decode(msg.payload)
-        npimg = np.frombuffer(img, dtype=np.uint8)
-        decoded_frame = cv2.imdecode(npimg, 1)
-
-        # Resize the frame for faster processing
-        resized_frame = cv2.resize(decoded_frame, (640, 480))
-        with frame_lock:
-            frame = resized_frame
+        return fn(*args)
+    finally:
+        buffer.release()
+
+# A release_after task dropped by a full stage
+def release_task(task):
+    fn, args = task
+    if fn is release_after:
+        args[0].release()
+
+# `seq` is the camera's receive order; with several decode workers a frame
+# that finishes after a newer one of the same camera is dropped
+def decode_frame(camera_id, payload, received=None, seq=None):
+    camera = cameras.get(camera_id)
+    try:
+        header, buffer, faces = decode_message(payload, frame_pool)
+        trace = tracer.start(camera_id, header)
+        trace.mark("receive", received)
+        trace.mark("decode")
+        keyframe = header is not None and header.flags & frame_codec.FLAG_KEYFRAME
+        replaced = None
+        with frame_cond:
+            stale = seq is not None and seq < camera.decoded_seq
+            if stale:
+                camera.frames_stale += 1
+            else:
+                camera.decoded_seq = seq if seq is not None else camera.decoded_seq
+                if buffer is not None:
+                    replaced = set_camera_frame(camera, buffer)
+                camera.frame_seq += 1
+                camera.frames_received += 1
+                frame_cond.notify_all()
+        if replaced is not None:
+            replaced.release()
+        if stale:
+            if buffer is not None:
+                buffer.release()
+            return
+        if keyframe:
+            # Display-only frame of an edge camera; its faces arrive as crops
+            set_processed_frame(camera, buffer)
+            stream_frame(camera, buffer)
+            buffer.release()
+            return
+        # The detect scheduler takes over this reference
+        if not detect_scheduler.put(camera_id, (buffer, trace, faces)) and buffer is not None:
+            buffer.release()
     except Exception as e:
-        print(f"Error decoding frame: {e}")
+        print(f"Error decoding frame from {camera_id}: {e}")
 
 # MQTT Client Setup
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(MQTT_BROKER)
-client.loop_start()
-
-# Asynchronous Face Recognition Request (using ThreadPoolExecutor)
+def connect_mqtt():
+    global client
+    client = new_mqtt_client()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(MQTT_BROKER)
+    client.loop_start()
+    return client
+
+# Rate-control feedback topic of a camera
+def feedback_topic(camera_id):
+    if camera_id == DEFAULT_CAMERA:
+        return MQTT_LEGACY_RECEIVE + "/feedback"
+    return f"doors/{camera_id}/feedback"
+
+# Frames per second a camera could get through detection: each detect worker
+# handles 1 / (smoothed detect latency) frames per second, shared by all cameras.
+# This is capacity, not the processed rate, which motion gating and frame
+# sampling keep low while nobody is in view. None before the first detect call.
+def detect_capacity(camera, workers):
+    latency = camera.sampler.latency
+    if not latency:
+        return None
+    return round(workers / latency / max(1, len(cameras.all())), 2)
+
+# Publish processing rate, capacity and backlog so each transmitter can adapt its bitrate
+def publish_feedback(backlog=lambda: recognize_stage.queue.depth, workers=lambda: DETECT_WORKERS):
+    last = {}
+    while not stop_event.wait(FEEDBACK_INTERVAL):
+        now = time.time()
+        for camera in cameras.all():
+            last_count, last_time = last.get(camera.id, (0, now - FEEDBACK_INTERVAL))
+            fps = (camera.frames_processed - last_count) / max(now - last_time, 1e-6)
+            last[camera.id] = (camera.frames_processed, now)
+            feedback = {"width": FRAME_WIDTH, "height": FRAME_HEIGHT, "fps": round(fps, 2),
+                        "capacity": detect_capacity(camera, workers()),
+                        "backlog": backlog()}  # queued recognize calls
+            client.publish(feedback_topic(camera.id), json.dumps(feedback))
+
+# Asynchronous Face Recognition Request (run by the recognize stage)
 def recognize_face_async(face_data, callback):
     try:
-        response = requests.post(opts.endpoint("vision/face/recognize"),
-                                 files={"image": face_data},
-                                 data={"min_confidence": 0.6}).json()
+        response = api.recognize(face_data, min_confidence=0.6)
         callback(response)
     except requests.exceptions.RequestException as e:
         print(f"Error during recognition: {e}")
         callback({})  # Handle failure with an empty response
 
-# Callback function to handle face recognition results
-def handle_recognition_result(result, current_frame, x_min, y_min):
+# Extract (recognized_ID, status) from a recognize response
+def parse_recognition_result(result):
     recognized_ID = "Not Recognized"
     status = "Not Recognized"
 
@@ -94,123 +468,363 @@ def handle_recognition_result(result, current_frame, x_min, y_min):
             if recognized_ID != "unknown" and recognized_ID != "Not Recognized":
                 print(f"Recognized as: {recognized_ID}")  # Print to console
                 status = "Recognized"
-                send.turn_led_on(ssh)  # Turn LED on when face is recognized
             else:
                 print("No recognized face detected.")  # Print if not recognized
                 recognized_ID = "Not Recognized"
                 status = "Not Recognized"
-                send.turn_led_off(ssh)  # Turn LED off when face is not recognized
 
-    # Add the recognized name near the bounding box
-    cv2.putText(current_frame, recognized_ID, (x_min, y_min - 10),
-                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+    return recognized_ID, status
+
+# Turn a camera's LED on for a recognized face and off otherwise
+# (only state changes reach the door agent, see actuator.DoorActuator)
+def set_led(camera, status):
+    camera.actuator.set(status)
+
+# Turn every LED off (shutdown)
+def all_leds_off():
+    for camera in cameras.all():
+        camera.actuator.lock()
 
-    # Log the recognition result and update CSV
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+# Best confidence of a recognize response, None without predictions
+def result_confidence(result):
+    return max((p.get("confidence", 0.0) for p in result.get("predictions", [])), default=None)
+
+# Log the recognition result to the CSV and the event store
+def log_recognition(recognized_ID, status, camera=None, track=None, confidence=None, trace=None):
+    now = time.time()
+    timestamp = datetime.datetime.fromtimestamp(now).strftime("%Y-%m-%d %H:%M:%S")
     log_entry = {"Timestamp": timestamp, "Name": recognized_ID, "Status": status}
     log_to_csv(log_entry)
-
-    # Save the latest frame with face recognition (without console message)
+    event_store.record({"ts": now, "camera": camera.id if camera is not None else None,
+                        "track": track.id if track is not None else None,
+                        "name": recognized_ID, "status": status, "confidence": confidence,
+                        "latency_ms": round((now - trace.times["receive"]) * 1000, 1) if trace is not None else None,
+                        "frame_seq": trace.seq if trace is not None else None})
+
+def frame_ring_name(camera_id):
+    return f"{FRAME_RING_NAME}_{camera_id}"
+
+# Shared-memory ring for a camera's live stream, created on first use
+def get_frame_ring(camera_id):
+    with frame_ring_lock:
+        ring = frame_rings.get(camera_id)
+        if ring is None:
+            ring = frame_rings[camera_id] = FrameRing(frame_ring_name(camera_id), create=True)
+        return ring
+
+def close_frame_ring():
+    with frame_ring_lock:
+        for ring in frame_rings.values():
+            ring.close()
+        frame_rings.clear()
+
+# Whether an annotated frame of `camera` goes to the live stream (call with camera.lock
+# held): not while raw frames are being streamed, unless annotated frames come
+# steadily again (edge keyframes, with no raw frames in between, always do)
+def take_annotated(camera, now):
+    steady = now - camera.annotated_at < STREAM_RAW_AFTER
+    camera.annotated_at = now
+    return steady or now - camera.raw_at >= STREAM_RAW_AFTER
+
+# Publish the latest annotated frame to the live stream;
+# the asyncio receiver calls this on its image threads, the threaded one uses stream_frame
+def save_latest_frame(current_frame, camera):
+    with camera.lock:
+        if not take_annotated(camera, time.time()):
+            return
     try:
-        cv2.imwrite(FRAME_FILE_PATH, current_frame)
+        _, encoded = cv2.imencode('.jpg', current_frame, [cv2.IMWRITE_JPEG_QUALITY, STREAM_QUALITY])
+        get_frame_ring(camera.id).write(encoded.tobytes())
+        camera.streamed_at = time.time()
     except Exception as e:
-        pass  # No print statement, just silently pass if an error occurs
-
-
-# Log the recognition results to CSV (without console message)
-def log_to_csv(log_entry):
+        print(f"Error streaming frame of {camera.id}: {e}")
+
+# Copy a received JPEG frame to the live stream unless the camera's annotated frames
+# are being shown (called for every message, before sampling)
+def stream_received(camera, payload):
+    if frame_codec.frame_flags(payload) & (frame_codec.FLAG_CROPS | frame_codec.FLAG_KEYFRAME):
+        return  # edge crops are no picture; keyframes are streamed once decoded
+    if time.time() - camera.streamed_at < STREAM_RAW_AFTER:
+        return
     try:
-        if os.path.exists(LOG_FILE_PATH):
-            # Check if the file is empty
-            if os.stat(LOG_FILE_PATH).st_size == 0:
-                logs_df = pd.DataFrame(columns=["Timestamp", "Name", "Status"])
-            else:
-                logs_df = pd.read_csv(LOG_FILE_PATH)
-        else:
-            logs_df = pd.DataFrame(columns=["Timestamp", "Name", "Status"])
+        header, jpeg = frame_codec.unpack_frame(payload, allow_legacy=ACCEPT_LEGACY_BASE64)
+    except Exception:
+        return
+    if header is not None and header.codec != frame_codec.CODEC_JPEG:
+        return
+    with camera.lock:
+        camera.stream_seq += 1  # annotated frames queued before this one are not written
+        camera.streamed_seq = camera.stream_seq
+        get_frame_ring(camera.id).write(jpeg)
+        camera.raw_at = time.time()
+
+# Publish an annotated frame (FrameBuffer) to the live stream from the image
+# workers. Frames are numbered per camera when queued; one that is encoded
+# after a newer frame of the same camera is not written.
+def stream_frame(camera, buffer):
+    with camera.lock:
+        if not take_annotated(camera, time.time()):
+            return
+        camera.stream_seq += 1
+        seq = camera.stream_seq
+    image_stage.submit(release_after, buffer.retain(), encode_stream_frame, camera, buffer, seq)
+
+def encode_stream_frame(camera, buffer, seq):
+    _, encoded = cv2.imencode('.jpg', buffer.array, [cv2.IMWRITE_JPEG_QUALITY, STREAM_QUALITY])
+    with camera.lock:
+        if seq < camera.streamed_seq:
+            return
+        camera.streamed_seq = seq
+        get_frame_ring(camera.id).write(encoded.tobytes())
+        camera.streamed_at = time.time()
 
-        # Append the new log entry
-        log_df = pd.DataFrame([log_entry])
-        logs_df = pd.concat([logs_df, log_df], ignore_index=True)
+# Callback function to handle face recognition results
+# (frame: FrameBuffer to draw on; trace / recognized_at: the frame's FrameTrace and
+# when the recognize response arrived)
+def handle_recognition_result(result, camera, frame, x_min, y_min, trace=None, recognized_at=None,
+                              track=None):
+    recognized_ID, status = parse_recognition_result(result)
+    if result.get("predictions"):
+        set_led(camera, status)
+    tracer.result_done(trace, recognize_response=recognized_at, actuation=time.time())
+    camera.recognitions += 1
 
-        # Write the updated DataFrame back to the CSV file
-        logs_df.to_csv(LOG_FILE_PATH, index=False)
+    # Add the recognized name near the bounding box
+    cv2.putText(frame.array, recognized_ID, (x_min, y_min - 10),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
 
-    except Exception as e:
-        print(f"Error logging to CSV: {e}")
+    log_recognition(recognized_ID, status, camera, track, result_confidence(result), trace)
+    stream_frame(camera, frame)
+    return recognized_ID, status
+
+
+# Handle a recognition result for a tracked face and cache it on the track.
+# result None: the request was shed by the full recognize stage before it was sent;
+# nothing is logged or shown, the track just retries on the next frame.
+def handle_track_result(result, camera, track, frame, x_min, y_min, trace=None, recognized_at=None):
+    if result is None:
+        if track is not None:
+            camera.tracker.clear_pending(track.id)
+        return
+    recognized_ID, status = handle_recognition_result(result, camera, frame, x_min, y_min,
+                                                      trace, recognized_at, track)
+    if track is None:
+        return
+    if result.get("success"):
+        camera.tracker.set_identity(track.id, recognized_ID, status)
+    else:
+        camera.tracker.clear_pending(track.id)  # request failed ({} or "success": false), retry on the next frame
+
+
+# A recognize request dropped by the full recognize stage: its callback gets None
+# (no answer, not a failed one), so the track retries without a log row and the
+# frame buffer it holds is released
+def fail_recognition(task):
+    fn, args = task
+    if fn is recognize_face_async:
+        args[1](None)
+
+# Wrap a recognize callback so the result is also cached under the crop hash `key`
+def caching(key, scope, callback):
+    generation = recognition_cache.generation
+    def store(result):
+        recognition_cache.put(key, result, scope, generation)
+        callback(result)
+    return store
+
+
+# Log the recognition results to CSV (queued, written by the log writer thread)
+def log_to_csv(log_entry):
+    log_writer.log(log_entry)
 
 
+# Detection worker: takes the next camera's newest frame from the fair scheduler
 def process_frames():
-    global frame, processed_frame
-
     while not stop_event.is_set():
-        with frame_lock:
-            if frame is None:
-                time.sleep(0.01)
-                continue
-            current_frame = frame.copy()
-
-        # Encode the frame for face detection
-        _, encoded_frame = cv2.imencode('.jpg', current_frame)
-
+        item = detect_scheduler.get(timeout=0.5)
+        if item is None:
+            continue
+        camera_id, (buffer, trace, faces) = item
         try:
+            if faces is not None:
+                process_edge_faces(cameras.get(camera_id), faces, trace)
+            else:
+                process_frame(cameras.get(camera_id), buffer, trace)
+        finally:
+            if buffer is not None:
+                buffer.release()
+            detect_scheduler.done(camera_id)
+
+# `frame` is a FrameBuffer shared with the display; it is only read, the boxes
+# and names are drawn on a pooled copy
+def process_frame(camera, frame, trace=None):
+    current_frame = frame.view()
+    # Nothing moved in the doorway: no detection call
+    if MOTION_GATING and not camera.motion_gate.check(current_frame):
+        return
+
+    # The received JPEG goes to face detection as is; only resized frames are encoded again
+    # (copied out of the MQTT payload only now, for the frames that do get detected)
+    encoded_frame = bytes(frame.jpeg) if frame.jpeg is not None else cv2.imencode('.jpg', current_frame)[1].tobytes()
+
+    try:
+        if trace is not None:
+            trace.mark("detect_request")
+        detect_start = time.perf_counter()
+        if RECOGNITION_MODE == "frame":
+            # Recognize returns its own boxes, so no separate detect call
+            response = api.recognize(encoded_frame, min_confidence=0.6)
+        else:
             # Send the frame to the server for face detection
-            response = requests.post(opts.endpoint("vision/face"),
-                                     files={"image": encoded_frame.tobytes()}).json()
-
-            predictions = response.get("predictions", [])
-            if not predictions:
-                send.turn_led_off(ssh)  # Turn LED off when no face is detected
-                with processed_frame_lock:
-                    processed_frame = current_frame.copy()
-                    cv2.putText(processed_frame, "Not Recognized", (10, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                continue
+            response = api.detect(encoded_frame)
+        camera.sampler.observe(time.perf_counter() - detect_start, outstanding_requests())
+        camera.frames_processed += 1
+        if trace is not None:
+            trace.mark("detect_response")
+            tracer.frame_done(trace)
+
+        predictions = response.get("predictions", [])
+        if not predictions:
+            camera.sampler.faces(0)
+            action_stage.submit(set_led, camera, "Not Recognized")  # Turn LED off when no face is detected
+            annotated = frame_pool.copy_of(current_frame)
+            cv2.putText(annotated.array, "Not Recognized", (10, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            set_processed_frame(camera, annotated)
+            stream_frame(camera, annotated)
+            annotated.release()
+            return
+
+        handle_faces(camera, current_frame, frame_pool.copy_of(current_frame), predictions, trace)
 
-            # Process detected faces
-            for pred in predictions:
-                x_min, y_min, x_max, y_max = pred["x_min"], pred["y_min"], pred["x_max"], pred["y_max"]
-                cv2.rectangle(current_frame, (x_min, y_min), (x_max, y_max), (0, 255, 0), 2)
+    except Exception as e:
+        print(f"Error processing frame from {camera.id}: {e}")
 
-                # Extract and encode the face region for recognition
-                face_region = current_frame[y_min:y_max, x_min:x_max]
-                _, face_encoded = cv2.imencode('.jpg', face_region)
+# Face crops detected on an edge camera: no motion gate and no detect call
+def process_edge_faces(camera, faces, trace=None):
+    try:
+        if trace is not None:
+            trace.mark("detect_request")
+            trace.mark("detect_response")
+            tracer.frame_done(trace)
+        camera.frames_processed += 1
+        handle_faces(camera, None, edge_canvas(camera, faces, frame_pool), [prediction for prediction, _, _ in faces],
+                     trace, crops=[image for _, _, image in faces])
+    except Exception as e:
+        print(f"Error processing edge faces from {camera.id}: {e}")
+
+# Track, recognize and draw the detected faces of a frame.
+# Faces are cut from `source` (read-only frame) or, for an edge camera, given as `crops`.
+# Boxes and names are drawn on `annotated`, a FrameBuffer handed over by the caller;
+# every pending recognition result holds a reference to it until it is drawn.
+def handle_faces(camera, source, annotated, predictions, trace=None, crops=None):
+    current_frame = annotated.array
+    # Edge crops carry no identity, so "frame" mode recognizes them like "batch"
+    mode = RECOGNITION_MODE if crops is None or RECOGNITION_MODE != "frame" else "batch"
+    camera.faces_detected += len(predictions)
+    camera.last_activity = time.time()
+
+    # Give every face a track ID so standing people are not re-recognized
+    if TRACKING and mode != "frame":
+        tracks = camera.tracker.update([(p["x_min"], p["y_min"], p["x_max"], p["y_max"])
+                                        for p in predictions])
+    else:
+        tracks = [None] * len(predictions)
+    # Full rate until every tracked face has an identity
+    camera.sampler.faces(len(predictions), new=any(t is not None and t.name is None for t in tracks))
+
+    # Process detected faces
+    for i, (pred, track) in enumerate(zip(predictions, tracks)):
+        x_min, y_min, x_max, y_max = pred["x_min"], pred["y_min"], pred["x_max"], pred["y_max"]
+
+        if mode == "frame":
+            # Each prediction already carries the identity for its box
+            action_stage.submit(release_after, annotated.retain(), handle_recognition_result, {"predictions": [pred]},
+                                camera, annotated, x_min, y_min, trace, time.time())
+            continue
+
+        if track is not None and not camera.tracker.needs_recognition(track):
+            # Known track: reuse the cached identity instead of calling recognize
+            if track.name is not None:
+                cv2.putText(current_frame, track.name, (x_min, y_min - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+            if track.status is not None:
+                # Keeps the door unlocked while the recognized person is still in view
+                action_stage.submit(set_led, camera, track.status)
+            continue
+
+        # Extract the face region for recognition
+        # (a view of the read-only source; copied only when it waits for other frames' crops)
+        if crops is not None:
+            face_region = crops[i]
+        elif mode == "batch" and BATCH_WINDOW > 0:
+            face_region = source[y_min:y_max, x_min:x_max].copy()
+        else:
+            face_region = source[y_min:y_max, x_min:x_max]
+        annotated.retain()
+        callback = lambda result, t=track, x=x_min, y=y_min: action_stage.submit(
+            release_after, annotated, handle_track_result, result, camera, t, annotated, x, y, trace, time.time())
+
+        if RECOGNITION_CACHE and face_region.size:
+            # A standing person sends nearly the same crop again: no recognize call
+            key = face_hash(face_region)
+            cached = recognition_cache.get(key, camera.id)
+            if cached is not None:
+                callback(cached)
+                continue
+            callback = caching(key, camera.id, callback)
 
-                # Recognize face asynchronously using ThreadPoolExecutor
-                recognition_executor.submit(recognize_face_async, face_encoded.tobytes(),
-                                            lambda result: handle_recognition_result(result, current_frame, x_min, y_min))
+        if mode == "batch":
+            face_batcher.add(face_region, callback)
+        else:
+            # Recognize face asynchronously in the recognize stage
+            _, face_encoded = cv2.imencode('.jpg', face_region)
+            recognize_stage.submit(recognize_face_async, face_encoded.tobytes(), callback)
 
-            # Update the processed frame with bounding boxes drawn
-            with processed_frame_lock:
-                processed_frame = current_frame.copy()
+    if mode == "batch":
+        face_batcher.end_frame()
 
-        except Exception as e:
-            pass  # No print statement, just silently pass if an error occurs
+    # Draw the bounding boxes once the crops have been taken
+    for pred in predictions:
+        cv2.rectangle(current_frame, (pred["x_min"], pred["y_min"]),
+                      (pred["x_max"], pred["y_max"]), (0, 255, 0), 2)
 
-        time.sleep(0.01)
+    # Update the processed frame with bounding boxes drawn
+    set_processed_frame(camera, annotated)
+    stream_frame(camera, annotated)
+    annotated.release()
 
-# Display Live Stream
+# Display Live Stream (one window per camera)
 def display_frames():
-    global frame, processed_frame
+    shown = {}
+    windows = {}  # one reused image per window
 
     while not stop_event.is_set():
-        with frame_lock:
-            if frame is None:
-                time.sleep(0.01)
-                continue
-            current_frame = frame.copy()
-
-        # Add timestamp to the frame
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        cv2.putText(current_frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-        # Display processed frame if available
-        with processed_frame_lock:
-            if processed_frame is not None:
-                current_frame = processed_frame.copy()
+        with frame_cond:
+            # Wake up on a new frame (short timeout keeps the windows responsive)
+            frame_cond.wait_for(lambda: any(c.frame_seq != shown.get(c.id, 0) for c in cameras.all()),
+                                timeout=0.05)
+            updated = [c for c in cameras.all() if c.frame is not None and c.frame_seq != shown.get(c.id, 0)]
+            frames = {}
+            for camera in updated:
+                shown[camera.id] = camera.frame_seq
+                frames[camera.id] = camera.frame_buffer.retain()
+
+        for camera in updated:
+            # Display processed frame if available, otherwise the live frame with a timestamp
+            with camera.lock:
+                processed = camera.processed_buffer.retain() if camera.processed_buffer is not None else None
+            current_frame = windows.setdefault(camera.id, np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), np.uint8))
+            np.copyto(current_frame, (processed or frames[camera.id]).view())
+            frames[camera.id].release()
+            if processed is not None:
+                processed.release()
+            else:
+                timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                cv2.putText(current_frame, timestamp, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
 
-        # Display the frame
-        cv2.imshow("Live Stream", current_frame)
+            # Display the frame
+            cv2.imshow(f"Live Stream - {camera.id}", current_frame)
 
         # Exit on 'q' key
         if cv2.waitKey(1) & 0xFF == ord('q'):
@@ -219,21 +833,61 @@ def display_frames():
 
     cv2.destroyAllWindows()
 
-# Main Function
-if __name__ == "__main__":
-    # Start the face detection and recognition thread
-    detection_thread = Thread(target=process_frames, daemon=True)
-    detection_thread.start()
+# Threaded receiver: paho network thread + pipeline stages + OpenCV windows
+# Queue depths and drops next to the latency histograms on /metrics
+def register_metrics():
+    tracer.gauges["pipeline_queue_depth"] = lambda: {name: s["depth"] for name, s in pipeline_stats().items()
+                                                     if name != "cameras"}
+    tracer.gauges["pipeline_dropped"] = lambda: {name: s["dropped"] for name, s in pipeline_stats().items()
+                                                 if name != "cameras"}
+    tracer.gauges["frame_pool"] = frame_pool.stats
+    tracer.gauges["recognition_cache"] = recognition_cache.stats
+    tracer.gauges["face_api_avg_ms"] = lambda: {route: round(s["avg_ms"], 2) for route, s in api.stats().items()
+                                                if isinstance(s, dict) and "avg_ms" in s}
+    if METRICS_PORT:
+        tracer.serve(METRICS_PORT)
+
+def main():
+    open_logs()
+    start_pipeline()
+    register_metrics()
+    connect_mqtt()
+
+    # Start the face detection and recognition threads (shared by all cameras)
+    detection_threads = [Thread(target=process_frames, daemon=True) for _ in range(DETECT_WORKERS)]
+    for thread in detection_threads:
+        thread.start()
+
+    # Start the rate-control feedback thread
+    Thread(target=publish_feedback, daemon=True).start()
 
     # Start the live stream thread
     display_frames()
 
     try:
-        detection_thread.join()
+        for thread in detection_threads:
+            thread.join()
     except KeyboardInterrupt:
         pass  # No print statement, just pass if interrupted
     finally:
-        client.loop_stop()
         stop_event.set()
-        send.turn_led_off(ssh)  # Turn LED off when the program ends
-        cv2.destroyAllWindows()
\ No newline at end of file
+        stop_pipeline()
+        all_leds_off()  # Turn LEDs off when the program ends
+        client.disconnect()  # after the lock commands have been queued
+        client.loop_stop()
+        close_logs()  # Write out any queued log rows
+        tracer.close()
+        close_frame_ring()
+        api.close()
+        cv2.destroyAllWindows()
+
+# Main Function
+if __name__ == "__main__":
+    if "--async" in sys.argv:
+        # Single event loop for MQTT, face API and LED control.
+        # async_receiver imports this module by name, so register it instead of loading a second copy
+        sys.modules["recognition"] = sys.modules[__name__]
+        import async_receiver
+        async_receiver.main()
+    else:
+        main()
@@ -0,0 +1,121 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+import cv2
+import numpy as np
+
+
+# 64-bit perceptual hash (DCT) of a face crop. The crop is normalized first
+# (grayscale, 32x32, equalized histogram), so the same face a few frames later,
+# slightly shifted or under a flickering light, hashes to nearly the same bits.
+def face_hash(image):
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.equalizeHist(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA))
+    low = cv2.dct(np.float32(small))[:8, :8].flatten()[1:]  # lowest frequencies without the DC term
+    bits = np.append(low > np.median(low), False)
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# Only "nobody known" answers are reused: a similar crop may be another person,
+# and a cached identity would open the door for them
+def cacheable(result):
+    if not result or result.get("success", True) is False:
+        return False  # failed request
+    return all(p.get("userid", "unknown") in ("unknown", "Not Recognized") for p in result.get("predictions", []))
+
+
+class _Entry:
+
+    __slots__ = ("key", "scope", "result", "expires")
+
+    def __init__(self, key, scope, result, expires):
+        self.key = key
+        self.scope = scope
+        self.result = result
+        self.expires = expires
+
+
+# Recent "Not Recognized" results by face hash (LRU, entries expire after `ttl`
+# seconds). get() returns the result of the closest cached crop within
+# `threshold` bits of the same scope (camera); recognized identities are never
+# stored, they always come from the recognizer. invalidate() empties the cache,
+# e.g. after new faces were registered; results of requests sent before that
+# are not stored.
+class RecognitionCache:
+
+    def __init__(self, max_entries=256, ttl=10.0, threshold=6):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold    # Hamming distance in bits
+        self.generation = 0           # bumped by invalidate()
+
+        self._entries = OrderedDict()  # least recently used first
+        self._next_id = 0
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0     # least recently used entries dropped for space
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _find(self, key, scope, now):
+        best, best_distance = None, self.threshold + 1
+        for entry_id, entry in list(self._entries.items()):
+            if entry.expires <= now:
+                del self._entries[entry_id]
+                self.expirations += 1
+                continue
+            if entry.scope != scope:
+                continue
+            distance = hamming(entry.key, key)
+            if distance < best_distance:
+                best, best_distance = entry_id, distance
+        return best
+
+    # Cached result for a crop hash, or None
+    def get(self, key, scope=None, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            entry_id = self._find(key, scope, now)
+            if entry_id is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(entry_id)
+            return self._entries[entry_id].result
+
+    # Store a result; `generation` is self.generation when the request was sent
+    def put(self, key, result, scope=None, generation=None, now=None):
+        if not cacheable(result):
+            return  # failed request, or a recognized identity
+        now = time.time() if now is None else now
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return  # faces were registered in the meantime
+            entry_id = self._find(key, scope, now)
+            if entry_id is not None:
+                del self._entries[entry_id]  # a newer result for the same face
+            self._next_id += 1
+            self._entries[self._next_id] = _Entry(key, scope, result, now + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                    "evictions": self.evictions, "expirations": self.expirations,
+                    "invalidations": self.invalidations}
@@ -1,22 +1,33 @@
 # Import necessary modules and packages
 import os
+import json
 import cv2
 import numpy as np
 import requests
 import datetime
 from options import Options
+from api_client import create_face_client
 from imutils.video import VideoStream
 import paho.mqtt.client as mqtt
-import base64
+import frame_codec
 
 # Create an instance of the Options class
 opts = Options()
 
+# Keep-alive client shared by detection and registration requests
+# (registers into the local gallery when opts.faceBackend is "local")
+api = create_face_client(opts)
+
 # Put your name
 name = "May"
 
 MQTT_BROKER = "172.30.212.124"
-MQTT_RECEIVE = "home/server"
+# Camera to register at (CAMERA_ID=door2 in the environment); frames of any camera if unset
+CAMERA_ID = os.environ.get("CAMERA_ID", "")
+MQTT_RECEIVE = f"doors/{CAMERA_ID or '+'}/frames"
+MQTT_LEGACY_RECEIVE = "home/server"  # single-camera transmitters
+MQTT_FACES_REGISTERED = "faces/registered"  # tells the receiver to drop its cached recognition results
+ACCEPT_LEGACY_BASE64 = True  # also accept frames from older base64 senders
 
 # The callback for when the client receives a CONNACK response from the server.
 def on_connect(client, userdata, flags, rc):
@@ -24,19 +35,23 @@ def on_connect(client, userdata, flags, rc):
 
     # Subscribing in on_connect() means that if we lose the connection and
     # reconnect then subscriptions will be renewed.
-    client.subscribe(MQTT_RECEIVE)
+    client.subscribe([(MQTT_RECEIVE, 0), (MQTT_LEGACY_RECEIVE, 0)])
 
 frame = np.zeros((240, 320, 3), np.uint8)
 
 # The callback for when a PUBLISH message is received from the server.
 def on_message(client, userdata, msg):
     global frame
-    # Decoding the message
-    img = base64.b64decode(msg.payload)
+    # Splitting the message into header and JPEG bytes (no copy for binary frames)
+    header, img = frame_codec.unpack_frame(msg.payload, allow_legacy=ACCEPT_LEGACY_BASE64)
+    if header is not None and header.flags & frame_codec.FLAG_CROPS:
+        return  # face crops of an edge camera, not a whole frame
     # converting into numpy array from buffer
     npimg = np.frombuffer(img, dtype=np.uint8)
     # Decode to Original Frame
-    frame = cv2.imdecode(npimg, 1)
+    decoded = cv2.imdecode(npimg, 1)
+    if decoded is not None:
+        frame = decoded
 
 
 client = mqtt.Client()
@@ -60,11 +75,11 @@ def register_face(img_path, user_id):
 
     try:
         # Send the image & user_id to the server to register !!!
-        response = requests.post(opts.endpoint("vision/face/register"),
-                                files={"image": image_data},
-                                data={"userid": user_id}).json()
+        response = api.register(image_data, user_id)
         # Print the response received from the server !!!
         print(f"Registration response: {response}")
+        if response.get("success", True):
+            client.publish(MQTT_FACES_REGISTERED, json.dumps({"users": [user_id]}), qos=1)
     except requests.exceptions.RequestException as e:
         raise SystemExit(e)
 
@@ -119,8 +134,7 @@ def main():
 
         try:
             # Send the frame to the server to detect the face(s) in the frame
-            response = requests.post(opts.endpoint("vision/face"),
-                                    files={"image": new_frame}).json()
+            response = api.detect(new_frame.tobytes())
         except requests.exceptions.RequestException as e:
             raise SystemExit(e)
         
@@ -154,6 +168,7 @@ def main():
     # Release the camera and close all windows
     cv2.destroyAllWindows()
     client.loop_stop()
+    api.close()
 
     
 # Call the main function if this script is being run directly
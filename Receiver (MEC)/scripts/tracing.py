@@ -0,0 +1,198 @@
+import time
+import json
+import bisect
+from collections import deque
+from threading import Lock, Thread
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from log_writer import LogWriter
+
+# Latency buckets in seconds (Prometheus histogram "le" bounds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+# Points recorded for each frame, in pipeline order
+STAGES = ("capture", "receive", "decode", "detect_request", "detect_response",
+          "recognize_response", "actuation")
+
+# Intervals exported as histograms: name -> (from point, to point)
+#   network   capture on the Pi -> MQTT receive on the MEC (needs synced clocks)
+#   queue     decoded -> detect request sent (waiting for a detect worker)
+#   recognize detect response -> recognize response (queueing + recognize call)
+INTERVALS = {
+    "network": ("capture", "receive"),
+    "decode": ("receive", "decode"),
+    "queue": ("decode", "detect_request"),
+    "detect": ("detect_request", "detect_response"),
+    "recognize": ("detect_response", "recognize_response"),
+    "actuation": ("recognize_response", "actuation"),
+    "receive_to_actuation": ("receive", "actuation"),
+    "end_to_end": ("capture", "actuation"),
+}
+
+# Recorded once per frame (after detect); the rest once per recognition result
+FRAME_INTERVALS = ("network", "decode", "queue", "detect")
+
+# Columns of the per-recognition trace log
+TRACE_FIELDS = ["camera", "seq"] + [f"{name}_ms" for name in INTERVALS]
+
+
+# Timestamps (wall clock, seconds) of one frame on its way through the receiver
+class FrameTrace:
+
+    __slots__ = ("camera", "seq", "times")
+
+    def __init__(self, camera, seq=None, capture=None, receive=None):
+        self.camera = camera
+        self.seq = seq
+        self.times = {"capture": capture, "receive": receive if receive is not None else time.time()}
+
+    def mark(self, point, t=None):
+        self.times[point] = time.time() if t is None else t
+
+
+# Seconds between the two points of an interval, None if one is missing
+def interval(times, name):
+    start, end = INTERVALS[name]
+    t0, t1 = times.get(start), times.get(end)
+    if t0 is None or t1 is None:
+        return None
+    return t1 - t0
+
+
+# Latency histogram: cumulative buckets for Prometheus, plus the most recent
+# samples for p50 / p95 / p99
+class Histogram:
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=2048):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.total += value
+            self.recent.append(value)
+
+    def percentiles(self, points=(50, 95, 99)):
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return {f"p{p}": None for p in points}
+        return {f"p{p}": samples[min(len(samples) - 1, int(len(samples) * p / 100))] for p in points}
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.total
+
+
+# Per-interval latency histograms of traced frames, a structured trace log
+# and a Prometheus-style text export.
+# Frame-level intervals (network, decode, queue, detect) are recorded once per
+# frame; recognize / actuation / end-to-end once per recognition result.
+class Tracer:
+
+    def __init__(self, log_path=None):
+        self.histograms = {name: Histogram() for name in INTERVALS}
+        self.log = LogWriter(log_path, fields=TRACE_FIELDS) if log_path else None
+        self.frames = 0
+        self.results = 0
+        self.gauges = {}     # name -> callable returning {label: value} for the export
+
+    def start(self, camera, header=None):
+        if header is None:
+            return FrameTrace(camera)
+        return FrameTrace(camera, header.seq, header.timestamp)
+
+    # Intervals of `times` in ms; the ones in `record` also go to the histograms
+    def _observe(self, times, record):
+        values = {}
+        for name in INTERVALS:
+            value = interval(times, name)
+            if value is None or value < 0:
+                continue
+            if name in record:
+                self.histograms[name].observe(value)
+            values[f"{name}_ms"] = round(value * 1000, 2)
+        return values
+
+    # Detect finished: record the per-frame intervals
+    def frame_done(self, trace):
+        self.frames += 1
+        self._observe(trace.times, FRAME_INTERVALS)
+
+    # A recognition result was acted on: record the per-result intervals and log
+    # the trace. A frame can have several faces, so the recognize_response /
+    # actuation points of this result are passed in rather than marked on the trace.
+    def result_done(self, trace, **points):
+        if trace is None:
+            return
+        self.results += 1
+        values = self._observe({**trace.times, **points},
+                               [name for name in INTERVALS if name not in FRAME_INTERVALS])
+        if self.log is not None:
+            values.update({"camera": trace.camera, "seq": trace.seq})
+            self.log.log(values)
+
+    def percentiles(self):
+        return {name: {k: round(v * 1000, 2) if v is not None else None for k, v in h.percentiles().items()}
+                for name, h in self.histograms.items()}
+
+    # Prometheus text exposition format
+    def render(self):
+        lines = ["# HELP frame_stage_seconds Latency of each receiver stage per traced frame",
+                 "# TYPE frame_stage_seconds histogram"]
+        for name, histogram in self.histograms.items():
+            counts, count, total = histogram.snapshot()
+            cumulative = 0
+            for bound, bucket in zip(histogram.buckets, counts):
+                cumulative += bucket
+                lines.append(f'frame_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'frame_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'frame_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'frame_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines += ["# TYPE frames_traced_total counter", f"frames_traced_total {self.frames}",
+                  "# TYPE recognitions_traced_total counter", f"recognitions_traced_total {self.results}"]
+        for name, read in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            try:
+                values = read()
+            except Exception:
+                continue
+            for label, value in values.items():
+                lines.append(f'{name}{{name="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    # Serve /metrics (Prometheus) and /latency (JSON percentiles) in a daemon thread
+    def serve(self, port, host="0.0.0.0"):
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics"):
+                    body, content_type = tracer.render().encode(), "text/plain; version=0.0.4"
+                elif self.path.startswith("/latency"):
+                    body, content_type = json.dumps(tracer.percentiles()).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # no console line per scrape
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
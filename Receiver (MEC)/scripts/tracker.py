@@ -0,0 +1,149 @@
+import time
+import itertools
+from threading import Lock
+
+
+# Intersection over union of two (x_min, y_min, x_max, y_max) boxes
+def iou(a, b):
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+# Centre distance of two boxes, relative to the size of the first one
+def centroid_distance(a, b):
+    ax, ay = (a[0] + a[2]) / 2, (a[1] + a[3]) / 2
+    bx, by = (b[0] + b[2]) / 2, (b[1] + b[3]) / 2
+    size = max(a[2] - a[0], a[3] - a[1], 1)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / size
+
+
+class Track:
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+
+        # Cached recognition result
+        self.name = None
+        self.status = None
+        self.expires = 0.0
+        self.pending = False  # a recognize request is in flight
+        self.pending_since = 0.0
+
+
+# Lightweight multi-face tracker.
+# Boxes from vision/face are associated with existing tracks by IoU (falling
+# back to centroid distance for fast movement), so each person keeps a track
+# ID across frames. Recognition results are cached per track with a TTL and
+# needs_recognition() only asks for a new recognize call when a track is new
+# or its cached identity has expired.
+class FaceTracker:
+
+    def __init__(self, iou_threshold=0.3, max_centroid_distance=0.5, max_missing=1.0,
+                 identity_ttl=10.0, unknown_ttl=1.0, pending_timeout=5.0):
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_missing = max_missing        # seconds before an unseen track is dropped
+        self.identity_ttl = identity_ttl      # seconds a recognized identity is trusted
+        self.unknown_ttl = unknown_ttl        # retry unrecognized faces sooner
+        self.pending_timeout = pending_timeout  # give up on requests that were dropped or lost
+
+        self.tracks = {}
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+
+        self.recognitions = 0
+        self.cache_hits = 0
+
+    # Associate this frame's boxes with tracks; returns one Track per box, in order
+    def update(self, boxes, now=None):
+        now = time.time() if now is None else now
+
+        with self._lock:
+            # Forget tracks that have not been seen for a while
+            for track_id in [t.id for t in self.tracks.values() if now - t.last_seen > self.max_missing]:
+                del self.tracks[track_id]
+
+            # Greedy matching, best overlap first
+            candidates = []
+            for i, box in enumerate(boxes):
+                for track in self.tracks.values():
+                    overlap = iou(track.box, box)
+                    if overlap >= self.iou_threshold:
+                        candidates.append((1.0 + overlap, i, track.id))
+                    else:
+                        distance = centroid_distance(track.box, box)
+                        if distance <= self.max_centroid_distance:
+                            candidates.append((1.0 - distance, i, track.id))
+            candidates.sort(reverse=True)
+
+            assigned = [None] * len(boxes)
+            used = set()
+            for _, i, track_id in candidates:
+                if assigned[i] is not None or track_id in used:
+                    continue
+                assigned[i] = self.tracks[track_id]
+                used.add(track_id)
+
+            for i, box in enumerate(boxes):
+                track = assigned[i]
+                if track is None:
+                    track = Track(next(self._ids), box, now)
+                    self.tracks[track.id] = track
+                    assigned[i] = track
+                else:
+                    track.box = box
+                    track.last_seen = now
+                    track.hits += 1
+            return assigned
+
+    # True if the track has no valid cached identity and no request in flight.
+    # Marks the track as pending so the caller can submit exactly one request.
+    def needs_recognition(self, track, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            pending = track.pending and now - track.pending_since < self.pending_timeout
+            if pending or (track.name is not None and now < track.expires):
+                self.cache_hits += 1
+                return False
+            track.pending = True
+            track.pending_since = now
+            self.recognitions += 1
+            return True
+
+    # Store the result of a recognize call for a track
+    def set_identity(self, track_id, name, status, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is None:
+                return
+            track.pending = False
+            track.name = name
+            track.status = status
+            ttl = self.identity_ttl if status == "Recognized" else self.unknown_ttl
+            track.expires = now + ttl
+
+    # The request failed; allow a retry on the next frame
+    def clear_pending(self, track_id):
+        with self._lock:
+            track = self.tracks.get(track_id)
+            if track is not None:
+                track.pending = False
+
+    def stats(self):
+        with self._lock:
+            total = self.recognitions + self.cache_hits
+            return {"tracks": len(self.tracks),
+                    "recognitions": self.recognitions,
+                    "cache_hits": self.cache_hits,
+                    "hit_rate": self.cache_hits / total if total else 0.0}
@@ -0,0 +1,81 @@
+import json
+import time
+from actuator import DoorActuator, actuator_topic, command_signature, LOCKED, UNLOCKED
+
+KEY = "door-secret"
+
+
+# Records the published commands without their timestamp and signature (checked on the way)
+class Recorder:
+
+    def __init__(self):
+        self.messages = []
+
+    def __call__(self, topic, payload, **kwargs):
+        command = json.loads(payload)
+        assert command.pop("sig") == command_signature(command, KEY)
+        assert abs(command.pop("ts") - time.time()) < 5.0
+        self.messages.append((topic, command))
+
+    @property
+    def states(self):
+        return [payload["state"] for _, payload in self.messages]
+
+
+def test_first_result_locks_the_door():
+    publish = Recorder()
+    door = DoorActuator("door1", publish, KEY)
+    door.set("Not Recognized", now=0.0)
+    door.set("Not Recognized", now=1.0)
+    assert publish.messages == [(actuator_topic("door1"), {"state": LOCKED})]
+
+
+def test_recognition_unlocks_once_with_ttl():
+    publish = Recorder()
+    door = DoorActuator("door1", publish, KEY, hold=60.0, refresh=10.0, ttl=30.0)
+    door.set("Recognized", now=0.0)
+    door.set("Recognized", now=1.0)
+    door.set("Not Recognized", now=2.0)
+    assert publish.messages == [(actuator_topic("door1"), {"state": UNLOCKED, "ttl": 30.0})]
+    door.lock()
+
+
+def test_unlock_is_refreshed_while_in_use():
+    publish = Recorder()
+    door = DoorActuator("door1", publish, KEY, hold=60.0, refresh=10.0)
+    door.set("Recognized", now=0.0)
+    door.set("Recognized", now=5.0)
+    door.set("Recognized", now=11.0)
+    assert publish.states == [UNLOCKED, UNLOCKED]
+    door.lock()
+    assert publish.states == [UNLOCKED, UNLOCKED, LOCKED]
+
+
+def test_door_locks_when_the_hold_runs_out():
+    publish = Recorder()
+    door = DoorActuator("door1", publish, KEY, hold=0.05)
+    door.set("Recognized")
+    door.set("Not Recognized")
+    assert publish.states == [UNLOCKED]
+    deadline = time.monotonic() + 2.0
+    while door.state != LOCKED and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert publish.states == [UNLOCKED, LOCKED]
+
+
+def test_publish_errors_do_not_change_state():
+    def publish(topic, payload, **kwargs):
+        raise ConnectionError("broker down")
+
+    door = DoorActuator("door1", publish, KEY)
+    door.set("Not Recognized", now=0.0)
+    assert door.state is None and door.sent == 0
+
+
+def test_signature_matches_the_door_agent():
+    # The same vector is checked in the Pi's test_door_agent.py
+    command = {"state": UNLOCKED, "ttl": 30.0, "ts": 1700000000.5}
+    expected = "e773f94ba41b0b519dc0d94ccebea3343f8fb16a95279db0020f1f202348820c"
+    assert command_signature(command, KEY) == expected
+    assert command_signature({**command, "sig": "ignored"}, KEY) == expected
+    assert command_signature(command, "other key") != expected
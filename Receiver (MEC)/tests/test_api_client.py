@@ -0,0 +1,66 @@
+import asyncio
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from api_client import AsyncFaceApiClient, FaceApiClient
+from options import Options
+
+
+# Face API stand-in that is busy (503) on the first call of every route
+@pytest.fixture
+def server():
+    calls = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            calls[self.path] += 1
+            status = 503 if calls[self.path] == 1 else 200
+            body = json.dumps({"success": status == 200}).encode()
+            self.send_response(status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    opts = Options()
+    opts.serverUrl = f"http://127.0.0.1:{httpd.server_address[1]}/v1/"
+    opts.retryBackoff = 0
+    yield opts, calls
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_register_is_sent_once(server):
+    opts, calls = server
+    client = FaceApiClient(opts)
+    try:
+        assert client.recognize(b"jpeg")["success"]
+        assert not client.register(b"jpeg", "alice")["success"]
+    finally:
+        client.close()
+    assert calls == {"/v1/vision/face/recognize": 2, "/v1/vision/face/register": 1}
+    assert client.session.get_adapter(opts.endpoint("vision/face/register")).max_retries.connect == opts.maxRetries
+
+
+def test_async_register_is_sent_once(server):
+    opts, calls = server
+    opts.faceBackend = "http"
+
+    async def run():
+        client = AsyncFaceApiClient(opts)
+        try:
+            return await client.recognize(b"jpeg"), await client.register(b"jpeg", "alice")
+        finally:
+            await client.close()
+
+    recognized, registered = asyncio.run(run())
+    assert recognized["success"] and not registered["success"]
+    assert calls == {"/v1/vision/face/recognize": 2, "/v1/vision/face/register": 1}
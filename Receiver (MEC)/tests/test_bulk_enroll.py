@@ -0,0 +1,171 @@
+import zipfile
+import cv2
+import numpy as np
+from bulk_enroll import BulkEnroller, EnrollState, dhash, hamming, list_images, parse_args
+
+
+# Face API stand-in: every bright blob of the photo is a face
+class FakeApi:
+
+    def __init__(self):
+        self.registered = []
+
+    def detect(self, image_bytes):
+        gray = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_GRAYSCALE)
+        count, _, boxes, _ = cv2.connectedComponentsWithStats((gray > 40).astype(np.uint8))
+        return {"success": True, "predictions": [
+            {"x_min": int(x), "y_min": int(y), "x_max": int(x + w), "y_max": int(y + h), "confidence": 0.9}
+            for x, y, w, h, _ in boxes[1:count]]}
+
+    def register(self, image_bytes, userid):
+        self.registered.append(userid)
+        return {"success": True}
+
+    def stats(self):
+        return {}
+
+
+# Black photo with a textured square "face" per (x, y, size) entry
+def photo(*faces, seed=0, blur=False):
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((400, 400, 3), np.uint8)
+    for x, y, size in faces:
+        texture = rng.integers(100, 256, (size, size, 1), dtype=np.uint8).repeat(3, axis=2)
+        if blur:
+            texture = cv2.GaussianBlur(texture, (0, 0), 8)
+        frame[y:y + size, x:x + size] = texture
+    return cv2.imencode(".png", frame)[1].tobytes()
+
+
+def enroller(api, *argv):
+    return BulkEnroller(api, parse_args(["people", "--workers", "2", *argv]))
+
+
+def test_list_images_from_a_directory_and_a_zip(tmp_path):
+    for path in ("alice/1.jpg", "alice/2.png", "alice/notes.txt", "bob/a.jpg", "readme.jpg"):
+        (tmp_path / "people" / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "people" / path).write_bytes(path.encode())
+    images = list_images(str(tmp_path / "people"))
+    assert sorted(images) == ["alice", "bob"]
+    assert [name for name, _ in images["alice"]] == ["alice/1.jpg", "alice/2.png"]
+    assert images["bob"][0][1]() == b"bob/a.jpg"
+
+    with zipfile.ZipFile(tmp_path / "people.zip", "w") as archive:
+        archive.writestr("people/alice/1.jpg", b"one")
+        archive.writestr("people/bob/", b"")
+        archive.writestr("people/bob/a.jpg", b"a")
+        archive.writestr("people/group.jpg", b"next to the user folders")
+        archive.writestr("cover.jpg", b"top of the archive")
+    images = list_images(str(tmp_path / "people.zip"))
+    assert sorted(images) == ["alice", "bob"]
+    assert images["alice"][0][1]() == b"one"
+
+
+def test_user_folders_at_the_top_of_a_zip(tmp_path):
+    with zipfile.ZipFile(tmp_path / "people.zip", "w") as archive:
+        archive.writestr("alice/1.jpg", b"one")
+        archive.writestr("bob/a.jpg", b"a")
+    assert sorted(list_images(str(tmp_path / "people.zip"))) == ["alice", "bob"]
+
+
+def test_dhash_of_near_duplicates_is_close():
+    rng = np.random.default_rng(1)
+    gray = cv2.resize(rng.integers(0, 256, (8, 9), dtype=np.uint8), (90, 80), interpolation=cv2.INTER_CUBIC)
+    other = rng.integers(0, 256, (80, 90), dtype=np.uint8)
+    assert hamming(dhash(gray), dhash(np.clip(gray.astype(int) + 3, 0, 255).astype(np.uint8))) <= 6
+    assert hamming(dhash(gray), dhash(other)) > 6
+    assert hamming(0b1011, 0b0001) == 2
+
+
+def test_analyze_rejects_unusable_photos():
+    bulk = enroller(FakeApi())
+
+    def check(data):
+        return bulk.analyze("alice", "photo.png", lambda: data)
+
+    assert check(b"not an image") == "unreadable"
+    assert check(photo()) == "no_face"
+    assert check(photo((20, 20, 100), (250, 250, 100))) == "several_faces"
+    assert check(photo((20, 20, 40))) == "too_small"
+    assert check(photo((20, 20, 150), blur=True)) == "blurry"
+
+    candidate = check(photo((100, 100, 150)))
+    assert (candidate.user, candidate.name) == ("alice", "photo.png")
+    assert candidate.score > 0
+    assert candidate.box == (63, 63, 287, 287)  # the face with a 25 % margin on each side
+    crop = cv2.imdecode(np.frombuffer(candidate.crop(), np.uint8), cv2.IMREAD_COLOR)
+    assert crop.shape[:2] == (224, 224)
+
+
+def test_photo_gone_before_registration_is_an_error(tmp_path):
+    path = tmp_path / "1.png"
+    path.write_bytes(photo((100, 100, 150)))
+    api = FakeApi()
+    bulk = enroller(api)
+    candidate = bulk.analyze("alice", "1.png", path.read_bytes)
+    path.unlink()
+    assert not bulk.register(candidate, EnrollState(str(tmp_path / "state.jsonl")))
+    assert bulk.errors == {"unreadable": 1} and not api.registered
+
+
+def test_select_skips_near_duplicates():
+    bulk = enroller(FakeApi())
+    same = [bulk.analyze("alice", name, lambda: photo((100, 100, 150), seed=1)) for name in ("a", "b")]
+    other = bulk.analyze("alice", "c", lambda: photo((100, 100, 150), seed=2))
+    chosen = bulk.select(same + [other], wanted=3)
+    assert len(chosen) == 2 and other in chosen
+    assert bulk.rejected["duplicate"] == 1
+    assert len(bulk.select(same + [other], wanted=1)) == 1
+
+
+def test_run_registers_the_best_photos_and_resumes(tmp_path):
+    for user in ("alice", "bob"):
+        (tmp_path / "people" / user).mkdir(parents=True)
+        for seed in range(3):
+            (tmp_path / "people" / user / f"{seed}.png").write_bytes(photo((100, 100, 150), seed=seed))
+    (tmp_path / "people" / "bob" / "blurry.png").write_bytes(photo((100, 100, 150), blur=True))
+    images = list_images(str(tmp_path / "people"))
+
+    api = FakeApi()
+    state = EnrollState(str(tmp_path / "state.jsonl"))
+    report = enroller(api, "--best", "2").run(images, state)
+    assert sorted(api.registered) == ["alice", "alice", "bob", "bob"]
+    assert report["users_enrolled"] == 2 and report["registered"] == 4
+    assert report["rejected"] == {"blurry": 1}
+
+    # A second run with the saved state has nothing left to do
+    api = FakeApi()
+    report = enroller(api, "--best", "2").run(images, EnrollState(str(tmp_path / "state.jsonl")))
+    assert report["photos_checked"] == 0 and not api.registered
+
+
+def test_resumed_run_skips_near_duplicates_of_registered_photos(tmp_path):
+    (tmp_path / "people" / "alice").mkdir(parents=True)
+    (tmp_path / "people" / "alice" / "1.png").write_bytes(photo((100, 100, 150), seed=1))
+    state = EnrollState(str(tmp_path / "state.jsonl"))
+    enroller(FakeApi(), "--best", "3").run(list_images(str(tmp_path / "people")), state)
+
+    # The same face again under a new name, and a new photo
+    (tmp_path / "people" / "alice" / "copy.png").write_bytes(photo((100, 100, 150), seed=1))
+    (tmp_path / "people" / "alice" / "2.png").write_bytes(photo((100, 100, 150), seed=2))
+    api = FakeApi()
+    report = enroller(api, "--best", "3").run(list_images(str(tmp_path / "people")),
+                                              EnrollState(str(tmp_path / "state.jsonl")))
+    assert report["photos_checked"] == 2
+    assert api.registered == ["alice"] and report["rejected"] == {"duplicate": 1}
+
+
+def test_state_ignores_a_cut_off_line(tmp_path):
+    path = tmp_path / "state.jsonl"
+    EnrollState(str(path)).record("alice", "alice/1.jpg")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"user": "bob", "ima')
+    state = EnrollState(str(path))
+    assert state.done["alice"] == {"alice/1.jpg"} and not state.done["bob"]
+    assert state.hashes["alice"] == [] and not state.hashes["bob"]
+
+
+def test_state_keeps_the_face_hashes(tmp_path):
+    path = str(tmp_path / "state.jsonl")
+    EnrollState(path).record("alice", "alice/1.jpg", phash=12345)
+    assert EnrollState(path).hashes["alice"] == [12345]
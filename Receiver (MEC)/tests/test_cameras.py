@@ -0,0 +1,22 @@
+from cameras import CameraRegistry, camera_from_topic
+
+
+def test_camera_from_topic():
+    assert camera_from_topic("doors/front/frames") == "front"
+    assert camera_from_topic("home/server", "legacy") == "legacy"
+    assert camera_from_topic("doors/front/actuator") == "default"
+
+
+def test_registry_creates_each_camera_once():
+    created = []
+
+    def factory(camera_id):
+        created.append(camera_id)
+        return camera_id.upper()
+
+    cameras = CameraRegistry(factory)
+    assert cameras.get("front") == "FRONT"
+    assert cameras.get("front") == "FRONT"
+    assert cameras.get("back") == "BACK"
+    assert created == ["front", "back"]
+    assert sorted(cameras.all()) == ["BACK", "FRONT"]
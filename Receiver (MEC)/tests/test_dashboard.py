@@ -0,0 +1,73 @@
+import csv
+import gzip
+import io
+import time
+import uuid
+import pytest
+import dashboard
+from event_store import EventStore
+from frame_ring import FrameRing
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05)
+    for i, name in enumerate(["alice", "bob", "alice"]):
+        store.record({"ts": 1000.0 + i, "camera": "door1", "name": name, "status": "Recognized", "frame_seq": i})
+    deadline = time.monotonic() + 5.0
+    while store.stats()["written"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    monkeypatch.setattr(dashboard, "event_store", store)
+    monkeypatch.setattr(dashboard, "EXPORT_CHUNK_ROWS", 1)
+    yield dashboard.app.server.test_client()
+    store.close()
+
+
+def rows(data):
+    return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+
+def test_download_streams_filtered_csv(client):
+    response = client.get("/download?name=alice")
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    exported = rows(response.get_data())
+    assert [(row["Name"], row["FrameSeq"]) for row in exported] == [("alice", "0"), ("alice", "2")]
+    assert list(exported[0]) == dashboard.EXPORT_FIELDS
+
+
+def test_download_gzip_stream(client):
+    response = client.get("/download?gzip=1&start=1001")
+    assert response.mimetype == "application/gzip"
+    assert 'filename="recognition_logs.csv.gz"' in response.headers["Content-Disposition"]
+    assert [row["Name"] for row in rows(gzip.decompress(response.get_data()))] == ["bob", "alice"]
+
+
+def test_gzip_chunks_are_compressed_as_they_come():
+    chunks = [b"Timestamp,Name\n", b"x" * 100000, b"end\n"]
+    assert gzip.decompress(b"".join(dashboard.gzip_chunks(iter(chunks)))) == b"".join(chunks)
+
+
+def test_bad_time_is_rejected(client):
+    response = client.get("/download?start=yesterday")
+    assert response.status_code == 400
+
+
+def test_stream_shows_the_chosen_camera_only(monkeypatch):
+    monkeypatch.setattr(dashboard, "FRAME_RING_NAME", f"test_ring_{uuid.uuid4().hex[:12]}")
+    door1 = FrameRing(f"{dashboard.FRAME_RING_NAME}_door1", slots=2, slot_size=256, create=True)
+    door2 = FrameRing(f"{dashboard.FRAME_RING_NAME}_door2", slots=2, slot_size=256, create=True)
+    try:
+        door1.write(b"door one")
+        door2.write(b"door two")
+        response = dashboard.app.server.test_client().get("/stream?camera=door2")
+        first = next(iter(response.response))
+        response.close()
+        assert first.endswith(b"\r\n\r\ndoor two\r\n")
+    finally:
+        door1.close()
+        door2.close()
+
+
+def test_stream_rejects_a_path_as_camera():
+    assert dashboard.app.server.test_client().get("/stream?camera=../x").status_code == 400
@@ -0,0 +1,100 @@
+import time
+import numpy as np
+import pytest
+from embedding_index import EmbeddingGallery, IvfIndex, normalize
+
+
+def clusters(users, per_user, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.normal(size=(users, dim)))
+    vectors = np.repeat(centres, per_user, axis=0) + 0.05 * rng.normal(size=(users * per_user, dim))
+    return centres, normalize(vectors)
+
+
+def test_normalize():
+    vectors = normalize([[3.0, 4.0], [0.0, 0.0]])
+    assert np.allclose(vectors[0], [0.6, 0.8])
+    assert np.allclose(vectors[1], [0.0, 0.0])
+
+
+def test_empty_gallery(tmp_path):
+    gallery = EmbeddingGallery(str(tmp_path), dim=4)
+    assert len(gallery) == 0
+    assert gallery.search(np.eye(4)[:2]) == [(None, 0.0), (None, 0.0)]
+
+
+def test_exact_search(tmp_path):
+    gallery = EmbeddingGallery(str(tmp_path), dim=4)
+    gallery.add("alice", [[1, 0, 0, 0], [1, 1, 0, 0]])
+    gallery.add("bob", [[0, 0, 1, 0]])
+    (alice, alice_score), (bob, bob_score) = gallery.search([[1, 0.1, 0, 0], [0, 0, 2, 0]])
+    assert (alice, bob) == ("alice", "bob")
+    assert alice_score == pytest.approx(1 / np.sqrt(1.01)) and bob_score == pytest.approx(1.0)
+    assert gallery.users() == ["alice", "bob"]
+
+
+def test_wrong_dimension(tmp_path):
+    with pytest.raises(ValueError):
+        EmbeddingGallery(str(tmp_path), dim=4).add("alice", [[1, 0, 0]])
+
+
+def test_gallery_is_persisted(tmp_path):
+    EmbeddingGallery(str(tmp_path), dim=4).add("alice", [[0, 1, 0, 0]])
+    gallery = EmbeddingGallery(str(tmp_path), dim=4)
+    assert len(gallery) == 1
+    assert gallery.search([[0, 1, 0, 0]]) == [("alice", pytest.approx(1.0))]
+
+
+
+def test_rows_added_by_another_process_are_picked_up(tmp_path):
+    receiver = EmbeddingGallery(str(tmp_path), dim=4)
+    assert receiver.search([[0, 0, 1, 0]]) == [(None, 0.0)]
+    EmbeddingGallery(str(tmp_path), dim=4).add("bob", [[0, 0, 1, 0]])
+    assert receiver.search([[0, 0, 1, 0]]) == [("bob", pytest.approx(1.0))]
+    receiver.add("alice", [[1, 0, 0, 0]])
+    assert (tmp_path / "labels.txt").read_text(encoding="utf-8") == "bob\nalice\n"
+    assert len(receiver) == 2
+
+def test_interrupted_registration_keeps_common_rows(tmp_path):
+    EmbeddingGallery(str(tmp_path), dim=4).add("alice", [[0, 1, 0, 0], [1, 0, 0, 0]])
+    with open(tmp_path / "labels.txt", "a", encoding="utf-8") as f:
+        f.write("bob\n")  # label written, embedding lost
+    gallery = EmbeddingGallery(str(tmp_path), dim=4)
+    assert len(gallery) == 2
+    assert (tmp_path / "labels.txt").read_text(encoding="utf-8") == "alice\nalice\n"
+
+
+def test_ivf_index_finds_the_right_cluster():
+    centres, vectors = clusters(users=20, per_user=50)
+    index = IvfIndex(vectors, nprobe=4)
+    rows, scores = index.search(vectors, centres)
+    assert list(rows // 50) == list(range(20))
+    assert np.all(scores > 0.9)
+
+
+# The index is built in the background
+def wait_for_index(gallery, rows):
+    deadline = time.monotonic() + 5.0
+    while gallery.stats()["indexed"] != rows and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert gallery.stats()["indexed"] == rows
+
+
+def test_approximate_search_with_rows_added_after_the_index(tmp_path):
+    centres, vectors = clusters(users=20, per_user=10)
+    gallery = EmbeddingGallery(str(tmp_path), dim=32, ivf_threshold=100)
+    for user in range(20):
+        gallery.add(f"user{user}", vectors[user * 10:(user + 1) * 10])
+    assert [user for user, _ in gallery.search(centres)] == [f"user{i}" for i in range(20)]
+    wait_for_index(gallery, 200)
+    assert [user for user, _ in gallery.search(centres)] == [f"user{i}" for i in range(20)]
+
+    newcomer = normalize(np.random.default_rng(1).normal(size=(1, 32)))
+    gallery.add("newcomer", newcomer)
+    assert gallery.search(newcomer)[0][0] == "newcomer"
+    assert gallery.stats()["indexed"] == 200  # not rebuilt for one row
+
+    # Rebuilt once the rows after the index make up more than rebuild_fraction
+    gallery.add("late", normalize(np.random.default_rng(2).normal(size=(30, 32))))
+    gallery.search(newcomer)
+    wait_for_index(gallery, 231)
@@ -0,0 +1,86 @@
+import time
+import pytest
+from event_store import EventStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+def flush(store, count):
+    deadline = time.monotonic() + 5.0
+    while store.stats()["written"] < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert store.stats()["written"] == count
+
+
+def test_events_are_written_and_filtered(store):
+    store.record({"ts": 100.0, "camera": "door1", "name": "alice", "status": "Recognized", "confidence": 0.9})
+    store.record({"ts": 200.0, "camera": "door2", "name": "Not Recognized", "status": "Not Recognized"})
+    store.record({"ts": 300.0, "camera": "door1", "name": "bob", "status": "Recognized"})
+    flush(store, 3)
+    assert [e["name"] for e in store.events()] == ["bob", "Not Recognized", "alice"]
+    assert [e["name"] for e in store.events(start=150.0, camera="door1")] == ["bob"]
+    assert [e["name"] for e in store.events(limit=1, offset=1)] == ["Not Recognized"]
+    assert store.count(end=250.0) == 2
+    assert store.status_counts() == (2, 1)
+    assert store.events(name="alice")[0]["confidence"] == 0.9
+
+
+def test_record_defaults_to_now(store):
+    before = time.time()
+    store.record({"name": "alice", "status": "Recognized"})
+    flush(store, 1)
+    assert store.events()[0]["ts"] >= before
+
+
+def test_name_counts(store):
+    for name in ["alice", "bob", "alice"]:
+        store.record({"ts": 100.0, "name": name, "status": "Recognized"})
+    store.record({"ts": 100.0, "name": "Not Recognized", "status": "Not Recognized"})
+    flush(store, 4)
+    assert store.name_counts() == [("alice", 2), ("bob", 1)]
+    assert store.name_counts(limit=1) == [("alice", 2)]
+
+
+def test_unrecognized_bursts(store):
+    for ts in [0.0, 10.0, 20.0, 30.0, 40.0, 500.0]:
+        store.record({"ts": ts, "camera": "door1", "name": "Not Recognized", "status": "Not Recognized"})
+    flush(store, 6)
+    assert store.unrecognized_bursts(gap=30.0, min_count=5) == [
+        {"camera": "door1", "start": 0.0, "end": 40.0, "count": 5}]
+
+
+def test_since_and_export(store):
+    for ts in [1.0, 2.0, 3.0]:
+        store.record({"ts": ts, "name": "alice", "status": "Recognized"})
+    flush(store, 3)
+    first = store.since(0)[0][0]
+    assert [row[1] for row in store.since(first)] == [2.0, 3.0]
+    assert store.last_id() == first + 2
+    assert [row[0] for row in store.export_rows(start=2.0, batch=1)] == [2.0, 3.0]
+
+
+def test_readonly_store_reads_events(store, tmp_path):
+    store.record({"ts": 1.0, "name": "alice", "status": "Recognized"})
+    flush(store, 1)
+    reader = EventStore(str(tmp_path / "events.db"), readonly=True)
+    try:
+        assert reader.count() == 1
+    finally:
+        reader.close()
+
+
+def test_import_csv(tmp_path):
+    csv_path = tmp_path / "recognition_logs.csv"
+    csv_path.write_text("Timestamp,Name,Status\n2024-05-01 10:00:00,alice,Recognized\n"
+                        "bad date,bob,Recognized\n2024-05-01 10:01:00,,Recognized\n", encoding="utf-8")
+    store = EventStore(str(tmp_path / "imported.db"), readonly=True)
+    try:
+        assert store.import_csv(str(csv_path)) == 1
+        assert store.events()[0]["name"] == "alice"
+    finally:
+        store.close()
@@ -0,0 +1,131 @@
+import time
+import cv2
+import numpy as np
+from face_batcher import FaceBatcher, build_mosaic, split_result
+
+
+# Runs submitted work right away
+class InlineExecutor:
+
+    def submit(self, fn, *args):
+        fn(*args)
+
+
+# recognize_async stand-in: records the mosaic and answers with fixed predictions
+class FakeRecognizer:
+
+    def __init__(self, result):
+        self.result = result
+        self.mosaics = []
+
+    def __call__(self, image_bytes, callback):
+        self.mosaics.append(cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR))
+        callback(self.result)
+
+
+def crop(width, height):
+    return np.full((height, width, 3), 200, np.uint8)
+
+
+def box(x_min, y_min, x_max, y_max, userid, confidence):
+    return {"x_min": x_min, "y_min": y_min, "x_max": x_max, "y_max": y_max,
+            "userid": userid, "confidence": confidence}
+
+
+def test_one_request_per_frame_mapped_back_to_crops():
+    # Two crops: tiles of 160 px with a 16 px gap at x = 16 and x = 192
+    recognizer = FakeRecognizer({"success": True, "predictions": [
+        box(20, 20, 100, 100, "alice", 0.9),
+        box(30, 30, 60, 60, "bob", 0.4),           # weaker second face in the first tile
+        box(202, 21, 282, 61, "carol", 0.8),
+    ]})
+    batcher = FaceBatcher(recognizer, InlineExecutor())
+    results = []
+    batcher.add(crop(80, 80), results.append)
+    batcher.add(crop(100, 50), results.append)
+    assert not recognizer.mosaics
+    batcher.end_frame()
+
+    assert len(recognizer.mosaics) == 1
+    assert recognizer.mosaics[0].shape == (16 + 176, 16 + 2 * 176, 3)
+    assert batcher.batches == 1 and batcher.faces == 2
+    first, second = results
+    assert [p["userid"] for p in first["predictions"]] == ["alice"]
+    assert first["predictions"][0]["x_min"] == 2  # (20 - 16) / 2.0
+    assert second["predictions"] == [box(6, 3, 56, 28, "carol", 0.8)]  # scale 1.6
+
+
+def test_failed_request_fails_every_crop():
+    batcher = FaceBatcher(FakeRecognizer({}), InlineExecutor())
+    results = []
+    batcher.add(crop(80, 80), results.append)
+    batcher.add(crop(80, 80), results.append)
+    batcher.end_frame()
+    assert results == [{}, {}]
+
+
+def test_dropped_request_is_passed_on_as_none():
+    batcher = FaceBatcher(FakeRecognizer(None), InlineExecutor())
+    results = []
+    batcher.add(crop(80, 80), results.append)
+    batcher.add(crop(80, 80), results.append)
+    batcher.end_frame()
+    assert results == [None, None]
+
+
+def test_crop_without_a_face_gets_an_empty_result():
+    recognizer = FakeRecognizer({"success": True, "predictions": []})
+    batcher = FaceBatcher(recognizer, InlineExecutor())
+    results = []
+    batcher.add(crop(80, 80), results.append)
+    batcher.end_frame()
+    assert results == [{"success": True, "predictions": []}]
+
+
+def test_empty_crop_is_answered_without_a_request():
+    recognizer = FakeRecognizer({"success": True, "predictions": []})
+    batcher = FaceBatcher(recognizer, InlineExecutor())
+    results = []
+    batcher.add(np.zeros((0, 0, 3), np.uint8), results.append)
+    batcher.end_frame()
+    assert results == [{}]
+    assert not recognizer.mosaics
+
+
+def test_full_batch_is_sent_at_once():
+    recognizer = FakeRecognizer({"success": True, "predictions": []})
+    batcher = FaceBatcher(recognizer, InlineExecutor(), window=60.0, max_batch=2)
+    batcher.add(crop(80, 80), lambda result: None)
+    batcher.add(crop(80, 80), lambda result: None)
+    assert len(recognizer.mosaics) == 1
+
+
+def test_window_collects_crops_of_several_frames():
+    recognizer = FakeRecognizer({"success": True, "predictions": []})
+    batcher = FaceBatcher(recognizer, InlineExecutor(), window=0.05)
+    results = []
+    batcher.add(crop(80, 80), results.append)
+    batcher.end_frame()
+    batcher.add(crop(80, 80), results.append)
+    batcher.end_frame()
+    assert not recognizer.mosaics
+    deadline = time.monotonic() + 2.0
+    while len(results) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(recognizer.mosaics) == 1 and len(results) == 2
+
+
+def test_mosaic_layout():
+    mosaic, layout = build_mosaic([crop(80, 80), crop(100, 50), crop(40, 160)], tile_size=100, gap=10)
+    assert mosaic.shape == (10 + 2 * 110, 10 + 2 * 110, 3)
+    assert layout == [(10, 10, 100, 100, 1.25), (120, 10, 100, 50, 1.0), (10, 120, 25, 100, 0.625)]
+    assert mosaic[10:110, 10:110].min() == 200 and mosaic[60:110, 120:220].max() == 0
+
+
+def test_split_result_by_tile_centre():
+    _, layout = build_mosaic([crop(80, 80), crop(80, 80)])
+    results = split_result({"success": True, "predictions": [box(200, 20, 340, 160, "bob", 0.7)]}, layout)
+    assert results == [{"success": True, "predictions": []},
+                       {"success": True, "predictions": [box(4, 2, 74, 72, "bob", 0.7)]}]
+    assert split_result(None, layout) == [{}, {}]
+    assert split_result({"success": False, "error": "timeout"}, layout) == [{}, {}]
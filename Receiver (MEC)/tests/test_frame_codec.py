@@ -0,0 +1,53 @@
+import base64
+import pytest
+import frame_codec
+
+
+def test_pack_unpack_round_trip():
+    payload = frame_codec.pack_frame(b"\xff\xd8jpeg", seq=7, width=640, height=480, timestamp=1700000000.25)
+    header, body = frame_codec.unpack_frame(payload)
+    assert header == frame_codec.FrameHeader(frame_codec.VERSION, frame_codec.CODEC_JPEG, 0, 7,
+                                             1700000000.25, 640, 480)
+    assert bytes(body) == b"\xff\xd8jpeg"
+    assert isinstance(body, memoryview)
+
+
+def test_seq_wraps_at_32_bits():
+    header, _ = frame_codec.unpack_frame(frame_codec.pack_frame(b"x", 2 ** 32 + 5, 1, 1))
+    assert header.seq == 5
+
+
+def test_legacy_base64_payload():
+    header, body = frame_codec.unpack_frame(base64.b64encode(b"\xff\xd8legacy"))
+    assert header is None
+    assert bytes(body) == b"\xff\xd8legacy"
+
+
+def test_legacy_payload_rejected_when_not_allowed():
+    with pytest.raises(ValueError):
+        frame_codec.unpack_frame(base64.b64encode(b"\xff\xd8legacy"), allow_legacy=False)
+
+
+def test_frame_flags():
+    keyframe = frame_codec.pack_frame(b"x", 1, 1, 1, flags=frame_codec.FLAG_KEYFRAME)
+    assert frame_codec.frame_flags(keyframe) == frame_codec.FLAG_KEYFRAME
+    assert frame_codec.frame_flags(frame_codec.pack_frame(b"x", 1, 1, 1)) == 0
+    assert frame_codec.frame_flags(base64.b64encode(b"\xff\xd8")) == 0
+
+
+def test_crops_round_trip():
+    crops = [((10, 20), (12, 22, 50, 60), b"crop-one"), ((100, 5), (101, 6, 140, 44), b"crop-two!")]
+    payload = frame_codec.pack_crops(crops, seq=3, width=1280, height=720)
+    header, body = frame_codec.unpack_frame(payload)
+    assert header.flags == frame_codec.FLAG_CROPS
+    assert (header.width, header.height) == (1280, 720)
+    unpacked = frame_codec.unpack_crops(body)
+    assert [(c.x, c.y, c.box, bytes(c.image)) for c in unpacked] == [
+        (10, 20, (12, 22, 50, 60), b"crop-one"), (100, 5, (101, 6, 140, 44), b"crop-two!")]
+
+
+def test_truncated_crops_rejected():
+    payload = frame_codec.pack_crops([((0, 0), (0, 0, 1, 1), b"abcdef")], 1, 10, 10)
+    _, body = frame_codec.unpack_frame(payload[:-2])
+    with pytest.raises(ValueError):
+        frame_codec.unpack_crops(body)
@@ -0,0 +1,55 @@
+import numpy as np
+from frame_pool import FramePool
+
+
+def test_array_returns_to_the_pool_after_the_last_release():
+    pool = FramePool((4, 4, 3), preallocate=1)
+    buffer = pool.acquire()
+    array = buffer.array
+    assert pool.stats()["free"] == 0
+
+    buffer.retain()
+    buffer.release()
+    assert buffer.refs == 1 and pool.stats()["free"] == 0  # still held by the owner
+    buffer.release()
+    assert pool.stats()["free"] == 1
+
+    again = pool.acquire()
+    assert again.array is array
+    assert pool.stats()["reused"] == 2
+
+
+def test_pool_grows_and_keeps_at_most_max_free():
+    pool = FramePool((2, 2), preallocate=0, max_free=1)
+    buffers = [pool.acquire() for _ in range(3)]
+    assert pool.stats()["allocated"] == 3
+    for buffer in buffers:
+        buffer.release()
+    assert pool.stats()["free"] == 1
+
+
+def test_image_of_the_pool_size_is_wrapped_without_a_copy():
+    pool = FramePool((4, 4, 3), preallocate=1)
+    image = np.ones((4, 4, 3), np.uint8)
+    buffer = pool.from_image(image, jpeg=b"jpeg")
+    assert buffer.array is image and buffer.jpeg == b"jpeg"
+    buffer.release()
+    assert pool.stats() == {"allocated": 1, "free": 1, "reused": 0, "wrapped": 1}
+
+
+def test_other_sizes_are_resized_into_a_pooled_array():
+    pool = FramePool((4, 4, 3), preallocate=1)
+    buffer = pool.from_image(np.full((8, 8, 3), 7, np.uint8), jpeg=b"jpeg")
+    assert buffer.array.shape == (4, 4, 3) and (buffer.array == 7).all()
+    assert buffer.jpeg is None and buffer.pool is pool
+
+
+def test_copy_and_read_only_view():
+    pool = FramePool((2, 2), preallocate=1)
+    image = np.arange(4, dtype=np.uint8).reshape(2, 2)
+    buffer = pool.copy_of(image)
+    assert buffer.array is not image and (buffer.array == image).all()
+    view = buffer.view()
+    assert not view.flags.writeable and view is buffer.view()
+    buffer.array[0, 0] = 9
+    assert view[0, 0] == 9
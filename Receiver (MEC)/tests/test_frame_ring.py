@@ -0,0 +1,67 @@
+import uuid
+import pytest
+from multiprocessing import shared_memory
+from frame_ring import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(f"test_ring_{uuid.uuid4().hex[:12]}", slots=4, slot_size=1024, create=True)
+    yield ring
+    ring.close()
+
+
+def test_newest_frame_after_a_seq(ring):
+    assert ring.read_latest() is None
+    assert ring.write(b"one", timestamp=1.0) == 1
+    assert ring.write(b"two", timestamp=2.0) == 2
+    assert ring.read_latest() == (2, 2.0, b"two")
+    assert ring.read_latest(after=2) is None
+
+
+def test_reader_in_another_attachment(ring):
+    reader = FrameRing(ring.name)
+    try:
+        assert (reader.slots, reader.slot_size) == (4, 1024)
+        for i in range(10):  # laps the ring
+            ring.write(b"frame %d" % i)
+        assert reader.latest == 10
+        assert reader.read_latest(after=3)[2] == b"frame 9"
+    finally:
+        reader.close()
+
+
+def test_frame_larger_than_a_slot_is_dropped(ring):
+    assert ring.write(b"x" * 2048) == 0
+    assert ring.stats()["dropped"] == 1
+    assert ring.read_latest() is None
+
+
+def test_wait_times_out(ring):
+    assert ring.wait(after=0, timeout=0.05) is None
+    ring.write(b"frame")
+    assert ring.wait(after=0, timeout=0.05)[2] == b"frame"
+
+
+def test_attach_to_missing_or_foreign_segment():
+    with pytest.raises(FileNotFoundError):
+        FrameRing(f"test_ring_{uuid.uuid4().hex[:12]}")
+    other = shared_memory.SharedMemory(f"test_shm_{uuid.uuid4().hex[:12]}", create=True, size=64)
+    try:
+        with pytest.raises(ValueError):
+            FrameRing(other.name)
+    finally:
+        other.close()
+        other.unlink()
+
+
+def test_stale_segment_is_replaced():
+    name = f"test_ring_{uuid.uuid4().hex[:12]}"
+    stale = shared_memory.SharedMemory(name, create=True, size=64)
+    ring = FrameRing(name, slots=2, slot_size=256, create=True)
+    try:
+        ring.write(b"fresh")
+        assert ring.read_latest()[2] == b"fresh"
+    finally:
+        stale.close()
+        ring.close()
@@ -0,0 +1,44 @@
+from frame_sampler import FrameSampler, IDLE, NEW_FACE, TRACKING
+
+
+def admitted(sampler, start, seconds, fps=30, outstanding=0):
+    frames = int(seconds * fps)
+    return sum(sampler.admit(outstanding, now=start + i / fps) for i in range(frames))
+
+
+def test_idle_rate():
+    sampler = FrameSampler(idle_fps=2.0)
+    assert sampler.state(now=100.0) == IDLE
+    assert admitted(sampler, 100.0, 2.0) == 4
+
+
+def test_new_face_takes_every_frame():
+    sampler = FrameSampler(max_fps=0.0, new_face_hold=2.0)
+    sampler.faces(1, new=True, now=100.0)
+    assert sampler.state(now=100.5) == NEW_FACE
+    assert admitted(sampler, 100.0, 1.0) == 30
+
+
+def test_known_faces_use_track_rate():
+    sampler = FrameSampler(track_fps=5.0, new_face_hold=2.0, face_hold=3.0)
+    sampler.faces(1, new=True, now=100.0)
+    sampler.faces(1, now=102.0)
+    assert sampler.state(now=102.5) == TRACKING
+    assert admitted(sampler, 102.0, 1.0) == 5
+    assert sampler.state(now=106.0) == IDLE
+
+
+def test_slow_detection_backs_off_and_recovers():
+    sampler = FrameSampler(idle_fps=2.0, track_fps=4.0, latency_budget=0.5, recovery=0.25, smoothing=1.0)
+    sampler.observe(1.0)
+    assert sampler.factor == 0.5 and sampler.backoffs == 1
+    sampler.faces(1, new=True, now=100.0)
+    assert admitted(sampler, 100.0, 1.0) == 2  # every frame backs off from the track rate
+    for _ in range(2):
+        sampler.observe(0.1)
+    assert sampler.factor == 1.0
+
+
+def test_queue_backlog_backs_off_immediately():
+    sampler = FrameSampler(idle_fps=4.0, min_fps=1.0, max_outstanding=8)
+    assert admitted(sampler, 100.0, 1.0, outstanding=20) == 2
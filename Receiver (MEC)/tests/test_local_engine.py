@@ -0,0 +1,135 @@
+import cv2
+import numpy as np
+from options import Options
+import pytest
+from local_engine import LocalFaceEngine, similarity_to_confidence
+
+# Gray level of the face pixels -> user in the stand-in recognizer
+ALICE, BOB = 40, 90
+
+
+# Stand-ins for OpenCV's YuNet / SFace models (the ONNX files are not shipped)
+class FakeDetector:
+
+    def __init__(self, faces):
+        self.faces = faces
+
+    def setInputSize(self, size):
+        self.size = size
+
+    def detect(self, frame):
+        if not self.faces:
+            return 1, None
+        return 1, np.array([[x, y, w, h] + [0] * 10 + [0.95] for x, y, w, h in self.faces], np.float32)
+
+
+# Finds the bright area of the frame, but like YuNet not when it fills the frame
+class BorderDetector(FakeDetector):
+
+    def __init__(self):
+        super().__init__([])
+
+    def detect(self, frame):
+        ys, xs = np.nonzero(frame.max(axis=2))
+        if not len(xs) or xs.min() == 0 or ys.min() == 0:
+            return 1, None
+        x, y, w, h = xs.min(), ys.min(), xs.max() + 1 - xs.min(), ys.max() + 1 - ys.min()
+        landmarks = [x + w / 3, y + h / 3, x + 2 * w / 3, y + h / 3, x + w / 2, y + h / 2,
+                     x + w / 3, y + 2 * h / 3, x + 2 * w / 3, y + 2 * h / 3]
+        return 1, np.array([[x, y, w, h] + landmarks + [0.95]], np.float32)
+
+
+class FakeRecognizer:
+
+    def __init__(self):
+        self.aligned = 0
+
+    def alignCrop(self, frame, face):
+        self.aligned += 1
+        self.landmarks = face[4:14]
+        x, y, w, h = [int(v) for v in face[:4]]
+        return cv2.resize(frame[y:y + h, x:x + w], (112, 112))
+
+    # One-hot on the crop's mean gray level
+    def feature(self, crop):
+        embedding = np.zeros((1, 128), np.float32)
+        embedding[0, int(round(crop.mean())) % 128] = 1.0
+        return embedding
+
+
+def engine(tmp_path, faces=()):
+    opts = Options()
+    opts.galleryDir = str(tmp_path / "gallery")
+    engine = LocalFaceEngine(opts)
+    engine._models.detector = FakeDetector(list(faces))
+    engine._models.recognizer = FakeRecognizer()
+    return engine
+
+
+def picture(*faces):
+    frame = np.zeros((240, 320, 3), np.uint8)
+    for (x, y, w, h), level in faces:
+        frame[y:y + h, x:x + w] = level
+    return frame
+
+
+def encode(frame):
+    return cv2.imencode(".png", frame)[1].tobytes()
+
+
+def test_detect(tmp_path):
+    local = engine(tmp_path, faces=[(10, 20, 60, 80)])
+    result = local.detect(encode(picture()))
+    assert result["success"] and result["count"] == 1
+    assert result["predictions"][0]["x_min"] == 10 and result["predictions"][0]["y_max"] == 100
+    assert local.stats()["vision/face"]["requests"] == 1
+
+
+def test_undecodable_image(tmp_path):
+    assert engine(tmp_path).recognize(b"not an image")["success"] is False
+
+
+def test_register_and_recognize(tmp_path):
+    local = engine(tmp_path, faces=[(10, 20, 60, 80)])
+    assert local.register(encode(picture(((10, 20, 60, 80), ALICE))), "alice")["success"]
+    local._models.detector.faces = [(0, 0, 20, 20), (200, 100, 60, 80)]  # largest face is registered
+    local.register(encode(picture(((200, 100, 60, 80), BOB))), "bob")
+    assert local.gallery.users() == ["alice", "bob"]
+
+    local._models.detector.faces = [(10, 20, 60, 80), (200, 100, 60, 80)]
+    result = local.recognize(encode(picture(((10, 20, 60, 80), BOB), ((200, 100, 60, 80), 15))))
+    assert [(p["userid"], p["x_min"]) for p in result["predictions"]] == [("bob", 10), ("unknown", 200)]
+    assert result["predictions"][0]["confidence"] == 1.0
+
+
+def test_register_without_a_face(tmp_path):
+    result = engine(tmp_path).register(encode(picture()), "alice")
+    assert result == {"success": False, "error": "No face detected"}
+
+
+def test_tight_crop_is_aligned_after_adding_a_border(tmp_path):
+    local = engine(tmp_path, faces=[(10, 20, 100, 100)])
+    local.register(encode(picture(((10, 20, 100, 100), ALICE))), "alice")
+    local._models.detector = BorderDetector()
+    result = local.recognize(encode(np.full((100, 100, 3), ALICE, np.uint8)))
+    assert [(p["userid"], p["x_min"], p["y_max"]) for p in result["predictions"]] == [("alice", 0, 100)]
+    assert local._models.recognizer.aligned == 2
+    assert local._models.recognizer.landmarks[:2].tolist() == pytest.approx([50 + 100 / 3] * 2)  # in the padded frame
+    assert local.recognize(encode(picture()))["predictions"] == []  # too large to be a crop
+
+
+def test_similarity_on_the_face_api_confidence_scale():
+    assert similarity_to_confidence(0.363, 0.363) == pytest.approx(0.6)
+    assert similarity_to_confidence(1.0, 0.363) == pytest.approx(1.0)
+    assert similarity_to_confidence(0.1815, 0.363) == pytest.approx(0.3)
+    assert similarity_to_confidence(-0.2, 0.363) == 0.0
+
+
+def test_match_above_the_calibrated_threshold_is_recognized(tmp_path):
+    local = engine(tmp_path, faces=[(10, 20, 60, 80)])
+    embedding = np.zeros(128, np.float32)
+    embedding[ALICE], embedding[ALICE + 1] = 0.5, np.sqrt(0.75)  # cosine similarity 0.5
+    local.gallery.add("alice", [embedding])
+    prediction = local.recognize(encode(picture(((10, 20, 60, 80), ALICE))), min_confidence=0.6)["predictions"][0]
+    assert prediction["userid"] == "alice"
+    assert prediction["confidence"] == pytest.approx(0.6 + 0.4 * (0.5 - 0.363) / (1 - 0.363))
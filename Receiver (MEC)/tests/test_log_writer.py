@@ -0,0 +1,48 @@
+import csv
+import os
+import time
+from log_writer import LogWriter
+
+
+def rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_rows_are_written_with_one_header(tmp_path):
+    path = str(tmp_path / "logs" / "recognition_logs.csv")
+    writer = LogWriter(path)
+    writer.log({"Timestamp": "2024-05-01 10:00:00", "Name": "alice", "Status": "Recognized"})
+    writer.log({"Timestamp": "2024-05-01 10:00:01", "Name": "bob", "Status": "Recognized", "Extra": 1})
+    writer.close()
+
+    writer = LogWriter(path)
+    writer.log({"Timestamp": "2024-05-01 10:00:02", "Name": "carol", "Status": "Not Recognized"})
+    writer.close()
+    assert [row["Name"] for row in rows(path)] == ["alice", "bob", "carol"]
+    assert writer.stats()["written"] == 1
+
+
+def test_full_queue_drops_rows(tmp_path):
+    writer = LogWriter(str(tmp_path / "log.csv"), queue_size=1)
+    for _ in range(50):
+        writer.log({"Name": "x"}, timeout=0.0)
+    writer.close()
+    stats = writer.stats()
+    assert stats["dropped"] + stats["written"] == 50
+
+
+def test_rotation_by_size_keeps_backups(tmp_path):
+    path = str(tmp_path / "log.csv")
+    # More than the header, less than the header and one row
+    writer = LogWriter(path, flush_interval=0.01, max_bytes=30, backup_count=2)
+    for i in range(4):
+        writer.log({"Timestamp": str(i), "Name": "alice", "Status": "Recognized"})
+        deadline = time.monotonic() + 5.0
+        while writer.stats()["rotations"] <= i and time.monotonic() < deadline:
+            time.sleep(0.01)
+    writer.close()
+    assert writer.stats()["rotations"] == 4
+    backups = [f for f in os.listdir(tmp_path) if f != "log.csv"]
+    assert len(backups) == 2
+    assert sum(len(rows(os.path.join(tmp_path, f))) for f in backups) == 2
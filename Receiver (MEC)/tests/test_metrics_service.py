@@ -0,0 +1,24 @@
+import time
+import datetime
+from event_store import EventStore
+from metrics_service import EventMetrics
+
+
+def test_event_metrics_fetch_only_new_events(tmp_path):
+    store = EventStore(str(tmp_path / "events.db"), flush_interval=0.05)
+    try:
+        for ts, name, status in [(100.0, "alice", "Recognized"), (200.0, "Not Recognized", "Not Recognized")]:
+            store.record({"ts": ts, "camera": "door1", "name": name, "status": status})
+        deadline = time.monotonic() + 5.0
+        while store.stats()["written"] < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        metrics = EventMetrics(store)
+        assert metrics.refresh() == 2 and metrics.refresh() == 0
+        assert metrics.counts() == (1, 1) and metrics.top_names() == [("alice", 1)]
+        assert (metrics.version, metrics.names_version) == (1, 1)
+        assert metrics.page_count(page_size=1) == 2
+        stamp = datetime.datetime.fromtimestamp(200.0).strftime("%Y-%m-%d %H:%M:%S")
+        assert metrics.page(page_size=1) == [
+            {"Timestamp": stamp, "Name": "Not Recognized", "Status": "Not Recognized", "Camera": "door1"}]
+    finally:
+        store.close()
@@ -0,0 +1,52 @@
+import numpy as np
+from motion_gate import MotionGate
+
+
+def scene(square_at=None):
+    frame = np.full((240, 320, 3), 90, np.uint8)
+    if square_at is not None:
+        x, y = square_at
+        frame[y:y + 80, x:x + 80] = 250
+    return frame
+
+
+def test_static_scene_is_skipped_after_the_hold():
+    gate = MotionGate(hold=2.0, keyframe_interval=0)
+    assert gate.check(scene(), now=0.0)           # first frame sets the background
+    assert gate.check(scene(), now=1.0)           # still within the hold
+    assert not gate.check(scene(), now=3.0)
+    assert gate.changed == 0.0
+    assert gate.stats()["skipped"] == 1
+
+
+def test_motion_opens_the_gate():
+    gate = MotionGate(hold=2.0, keyframe_interval=0)
+    gate.check(scene(), now=0.0)
+    assert not gate.check(scene(), now=10.0)
+    assert gate.check(scene((100, 80)), now=11.0)
+    assert gate.changed >= gate.min_changed
+    assert gate.check(scene((100, 80)), now=12.0)  # hold after the change
+
+
+def test_keyframes_pass_without_motion():
+    gate = MotionGate(hold=1.0, keyframe_interval=5.0)
+    gate.check(scene(), now=0.0)
+    assert not gate.check(scene(), now=2.0)
+    assert gate.check(scene(), now=5.0)
+    assert not gate.check(scene(), now=6.0)
+
+
+def test_small_changes_stay_below_the_threshold():
+    gate = MotionGate(hold=0.0, keyframe_interval=0, pixel_threshold=25)
+    gate.check(scene(), now=0.0)
+    noisy = scene()
+    noisy[::2, ::2] += 10
+    assert not gate.check(noisy, now=1.0)
+
+
+def test_mog2_background_subtraction():
+    gate = MotionGate(method="mog2", hold=0.0, keyframe_interval=0, learning_rate=0.5)
+    for i in range(20):
+        gate.check(scene(), now=float(i))
+    assert not gate.check(scene(), now=20.0)
+    assert gate.check(scene((100, 80)), now=21.0)
@@ -0,0 +1,126 @@
+import threading
+import time
+from pipeline import StageQueue, WorkerStage, FairScheduler, DROP_OLDEST, LATEST_ONLY, BLOCK
+
+
+def test_drop_oldest_keeps_newest_items():
+    dropped = []
+    q = StageQueue("test", maxsize=2, policy=DROP_OLDEST, on_drop=dropped.append)
+    assert q.put(1) and q.put(2) and q.put(3)
+    assert dropped == [1]
+    assert [q.get(0), q.get(0)] == [2, 3]
+    assert q.get(timeout=0.01) is None
+    assert q.stats()["dropped"] == 1
+
+
+def test_latest_only_is_a_queue_of_one():
+    q = StageQueue("test", maxsize=10, policy=LATEST_ONLY)
+    for item in range(5):
+        q.put(item)
+    assert q.depth == 1
+    assert q.get(0) == 4
+
+
+def test_block_drops_new_item_after_timeout():
+    dropped = []
+    q = StageQueue("test", maxsize=1, policy=BLOCK, put_timeout=0.01, on_drop=dropped.append)
+    assert q.put("a")
+    assert not q.put("b")
+    assert dropped == ["b"]
+    assert q.get(0) == "a"
+
+
+def test_block_waits_for_room():
+    q = StageQueue("test", maxsize=1, policy=BLOCK, put_timeout=2.0)
+    q.put("a")
+    threading.Timer(0.05, q.get).start()
+    assert q.put("b")
+    assert q.get(0) == "b"
+
+
+def test_close_wakes_consumers_and_refuses_items():
+    q = StageQueue("test")
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(q.get()))
+    consumer.start()
+    q.close()
+    consumer.join(1.0)
+    assert result == [None]
+    assert not q.put(1)
+
+
+def test_worker_stage_runs_tasks_and_counts_errors():
+    done = []
+
+    def fail():
+        raise RuntimeError("boom")
+
+    stage = WorkerStage("test", workers=2)
+    for i in range(5):
+        stage.submit(done.append, i)
+    stage.submit(fail)
+    stage.close()
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    stats = stage.stats()
+    assert stats["processed"] == 6 and stats["errors"] == 1
+
+
+def test_worker_stage_hands_dropped_tasks_to_on_drop():
+    started, release, done, dropped = threading.Event(), threading.Event(), [], []
+
+    def block():
+        started.set()
+        release.wait(5.0)
+
+    stage = WorkerStage("test", workers=1, maxsize=1, on_drop=dropped.append)
+    stage.submit(block)
+    assert started.wait(5.0)
+    stage.submit(done.append, "old")
+    stage.submit(done.append, "new")
+    release.set()
+    stage.close()
+    assert done == ["new"]
+    assert dropped == [(done.append, ("old",))]
+
+
+def test_scheduler_keeps_newest_item_per_key():
+    dropped = []
+    scheduler = FairScheduler("test", on_drop=dropped.append)
+    scheduler.put("cam1", 1)
+    scheduler.put("cam1", 2)
+    assert scheduler.stats()["dropped"] == 1
+    assert dropped == [1]
+    assert scheduler.poll() == ("cam1", 2)
+    assert scheduler.poll() is None
+
+
+def test_scheduler_hands_out_a_key_once_until_done():
+    scheduler = FairScheduler("test")
+    scheduler.put("cam1", 1)
+    assert scheduler.poll() == ("cam1", 1)
+    scheduler.put("cam1", 2)
+    assert scheduler.poll() is None
+    scheduler.done("cam1")
+    assert scheduler.poll() == ("cam1", 2)
+
+
+def test_scheduler_is_weighted_round_robin():
+    scheduler = FairScheduler("test", weight=lambda key: 3 if key == "busy" else 1)
+    taken = []
+    for _ in range(8):
+        scheduler.put("busy", 1)
+        scheduler.put("quiet", 1)
+        key, _ = scheduler.poll()
+        taken.append(key)
+        scheduler.done(key)
+    assert taken.count("busy") == 6 and taken.count("quiet") == 2
+
+
+def test_scheduler_get_times_out_and_closes():
+    scheduler = FairScheduler("test")
+    start = time.monotonic()
+    assert scheduler.get(timeout=0.05) is None
+    assert time.monotonic() - start >= 0.04
+    scheduler.close()
+    assert scheduler.get() is None
+    assert not scheduler.put("cam1", 1)
@@ -0,0 +1,87 @@
+import time
+import uuid
+import numpy as np
+import pytest
+import frame_codec
+import recognition
+from cameras import CameraState
+from frame_pool import FramePool
+from frame_ring import FrameRing
+from tracker import FaceTracker
+
+
+def camera(camera_id="door1"):
+    return CameraState(camera_id, tracker=FaceTracker(), motion_gate=None, actuator=None, sampler=None)
+
+
+@pytest.fixture
+def rings(monkeypatch):
+    monkeypatch.setattr(recognition, "FRAME_RING_NAME", f"test_ring_{uuid.uuid4().hex[:12]}")
+    monkeypatch.setattr(recognition, "frame_rings", {})
+    yield
+    recognition.close_frame_ring()
+
+
+def test_lone_annotated_frame_is_not_shown_between_raw_frames():
+    door = camera()
+    door.raw_at = 10.0
+    assert not recognition.take_annotated(door, 10.1)      # sampled once among raw frames
+    assert recognition.take_annotated(door, 10.3)          # steady again
+    assert recognition.take_annotated(door, 12.0)          # no raw frames in between (edge keyframes)
+
+
+def test_received_frames_go_to_their_camera_ring(rings):
+    door1, door2 = camera("door1"), camera("door2")
+    recognition.stream_received(door1, frame_codec.pack_frame(b"one", 1, 640, 480))
+    recognition.stream_received(door2, frame_codec.pack_frame(b"two", 1, 640, 480))
+    door2.streamed_at = time.time()  # annotated frames are being shown
+    recognition.stream_received(door2, frame_codec.pack_frame(b"raw", 2, 640, 480))
+
+    for door, expected in ((door1, b"one"), (door2, b"two")):
+        reader = FrameRing(recognition.frame_ring_name(door.id))
+        try:
+            assert reader.read_latest()[2] == expected and reader.latest == 1
+        finally:
+            reader.close()
+
+
+def test_shed_request_retries_the_track_without_a_log_row(monkeypatch):
+    logged = []
+    monkeypatch.setattr(recognition, "log_recognition", lambda *args: logged.append(args))
+    door = camera()
+    track = door.tracker.update([(0, 0, 50, 50)], now=0.0)[0]
+    assert door.tracker.needs_recognition(track, now=0.0)
+    assert not door.tracker.needs_recognition(track, now=0.1)  # pending
+
+    answers = []
+    recognition.fail_recognition((recognition.recognize_face_async, (b"jpeg", answers.append)))
+    recognition.fail_recognition((lambda: None, ()))  # other tasks have no callback
+    assert answers == [None]
+    recognition.handle_track_result(None, door, track, frame=None, x_min=0, y_min=0)
+    assert door.tracker.needs_recognition(track, now=0.2)
+    assert not logged and door.recognitions == 0
+
+
+def test_error_response_is_retried_not_cached_on_the_track(monkeypatch):
+    monkeypatch.setattr(recognition, "log_recognition", lambda *args: None)
+    monkeypatch.setattr(recognition, "stream_frame", lambda *args: None)
+    monkeypatch.setattr(recognition, "set_led", lambda *args: None)
+    door = camera()
+    frame = FramePool((120, 160, 3), preallocate=1).acquire()
+    track = door.tracker.update([(0, 0, 50, 50)], now=0.0)[0]
+    door.tracker.needs_recognition(track, now=0.0)
+
+    recognition.handle_track_result({"success": False, "error": "timeout"}, door, track, frame, 0, 20)
+    assert track.name is None and door.tracker.needs_recognition(track, now=0.1)
+
+    recognition.handle_track_result({"success": True, "predictions": [{"userid": "unknown"}]},
+                                    door, track, frame, 0, 20)
+    assert track.status == "Not Recognized" and not door.tracker.needs_recognition(track, now=0.2)
+
+
+def test_frame_errors_are_reported(rings, capsys):
+    door = camera()
+    recognition.save_latest_frame(np.zeros((0, 0, 3), np.uint8), door)
+    recognition.process_edge_faces(door, [None])
+    out = capsys.readouterr().out
+    assert "Error streaming frame of door1" in out and "Error processing edge faces from door1" in out
@@ -0,0 +1,74 @@
+import numpy as np
+from recognition_cache import RecognitionCache, cacheable, face_hash, hamming
+
+UNKNOWN = {"success": True, "predictions": [{"userid": "unknown", "confidence": 0.0}]}
+ALICE = {"success": True, "predictions": [{"userid": "alice", "confidence": 0.9}]}
+
+
+def test_cacheable():
+    assert cacheable(UNKNOWN)
+    assert cacheable({"success": True, "predictions": []})
+    assert not cacheable(ALICE)
+    assert not cacheable({})
+    assert not cacheable({"success": False, "error": "timeout"})
+
+
+def test_similar_crops_hash_close():
+    rng = np.random.default_rng(0)
+    face = rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    brighter = np.clip(face.astype(np.int16) + 10, 0, 255).astype(np.uint8)
+    other = rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    assert hamming(face_hash(face), face_hash(brighter)) <= 6
+    assert hamming(face_hash(face), face_hash(other)) > 6
+
+
+def test_hit_within_threshold_and_scope():
+    cache = RecognitionCache(threshold=2)
+    cache.put(0b1111, UNKNOWN, scope="door1", now=0.0)
+    assert cache.get(0b1110, scope="door1", now=1.0) == UNKNOWN
+    assert cache.get(0b1110, scope="door2", now=1.0) is None
+    assert cache.get(0b1111 ^ 0b111000, scope="door1", now=1.0) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_failed_requests_are_not_cached():
+    cache = RecognitionCache()
+    cache.put(1, {}, now=0.0)
+    assert cache.get(1, now=0.0) is None
+
+
+def test_identities_are_never_cached():
+    cache = RecognitionCache()
+    cache.put(1, ALICE, now=0.0)
+    assert cache.get(1, now=0.0) is None
+
+
+def test_entries_expire():
+    cache = RecognitionCache(ttl=10.0)
+    cache.put(1, UNKNOWN, now=0.0)
+    assert cache.get(1, now=9.0) is not None
+    assert cache.get(1, now=11.0) is None
+    assert cache.expirations == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecognitionCache(max_entries=2, threshold=0)
+    cache.put(1, UNKNOWN, now=0.0)
+    cache.put(2, UNKNOWN, now=0.0)
+    cache.get(1, now=0.0)
+    cache.put(4, UNKNOWN, now=0.0)
+    assert cache.get(2, now=0.0) is None
+    assert cache.get(1, now=0.0) is not None
+    assert cache.evictions == 1
+
+
+def test_invalidate_drops_results_of_older_requests():
+    cache = RecognitionCache()
+    cache.put(1, UNKNOWN, now=0.0)
+    generation = cache.generation
+    cache.invalidate()
+    assert cache.get(1, now=0.0) is None
+    cache.put(1, UNKNOWN, generation=generation, now=0.0)
+    assert cache.get(1, now=0.0) is None
+    cache.put(1, UNKNOWN, generation=cache.generation, now=0.0)
+    assert cache.get(1, now=0.0) is not None
@@ -0,0 +1,71 @@
+import csv
+import json
+import urllib.request
+from types import SimpleNamespace
+from tracing import FrameTrace, Histogram, Tracer, interval
+
+
+def test_interval_needs_both_points():
+    times = {"capture": 10.0, "receive": 10.25}
+    assert interval(times, "network") == 0.25
+    assert interval(times, "decode") is None
+
+
+def test_histogram_buckets_and_percentiles():
+    histogram = Histogram(buckets=(0.1, 1.0), window=4)
+    for value in (0.05, 0.1, 0.5, 2.0, 3.0):
+        histogram.observe(value)
+    assert histogram.snapshot() == ([2, 1, 2], 5, 5.65)
+    assert histogram.percentiles((50, 99)) == {"p50": 2.0, "p99": 3.0}  # the window keeps the last 4
+    assert Histogram().percentiles((50,)) == {"p50": None}
+
+
+def test_frame_and_result_intervals_are_recorded_once(tmp_path):
+    tracer = Tracer(str(tmp_path / "trace.csv"))
+    trace = tracer.start("door1", SimpleNamespace(seq=7, timestamp=100.0))
+    assert (trace.seq, trace.times["capture"]) == (7, 100.0)
+    trace.mark("receive", 100.02)
+    trace.mark("decode", 100.03)
+    trace.mark("detect_request", 100.03)
+    trace.mark("detect_response", 100.08)
+    tracer.frame_done(trace)
+
+    # Two faces of the same frame
+    tracer.result_done(trace, recognize_response=100.2, actuation=100.21)
+    tracer.result_done(trace, recognize_response=100.3, actuation=100.31)
+    tracer.result_done(None)
+    tracer.close()
+
+    assert tracer.frames == 1 and tracer.results == 2
+    assert tracer.histograms["detect"].count == 1
+    assert tracer.histograms["end_to_end"].count == 2
+    with open(tmp_path / "trace.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert [(row["camera"], row["seq"], row["end_to_end_ms"]) for row in rows] == \
+        [("door1", "7", "210.0"), ("door1", "7", "310.0")]
+
+
+def test_negative_intervals_are_ignored():
+    tracer = Tracer()
+    trace = FrameTrace("door1", capture=200.0, receive=100.0)  # Pi clock ahead of the MEC
+    tracer.frame_done(trace)
+    assert tracer.histograms["network"].count == 0
+
+
+def test_prometheus_export_over_http():
+    tracer = Tracer()
+    tracer.histograms["decode"].observe(0.02)
+    tracer.gauges["queue_depth"] = lambda: {"detect": 3}
+    tracer.gauges["broken"] = lambda: 1 / 0
+    server = tracer.serve(0, host="127.0.0.1")
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        text = urllib.request.urlopen(base + "/metrics").read().decode()
+        latency = json.loads(urllib.request.urlopen(base + "/latency").read())
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'frame_stage_seconds_bucket{stage="decode",le="0.025"} 1' in text
+    assert 'frame_stage_seconds_count{stage="decode"} 1' in text
+    assert 'queue_depth{name="detect"} 3' in text
+    assert latency["decode"]["p50"] == 20.0 and latency["network"]["p50"] is None
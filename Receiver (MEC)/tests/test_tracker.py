@@ -0,0 +1,62 @@
+from tracker import FaceTracker, iou, centroid_distance
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 15, 10)) == 50 / 150
+
+
+def test_centroid_distance_is_relative_to_box_size():
+    assert centroid_distance((0, 0, 10, 10), (5, 0, 15, 10)) == 0.5
+
+
+def test_boxes_keep_their_track_across_frames():
+    tracker = FaceTracker()
+    first = tracker.update([(0, 0, 100, 100), (300, 0, 400, 100)], now=0.0)
+    second = tracker.update([(305, 5, 405, 105), (10, 0, 110, 100)], now=0.1)
+    assert [t.id for t in second] == [first[1].id, first[0].id]
+    assert second[0].hits == 2
+
+
+def test_fast_movement_matches_by_centroid():
+    tracker = FaceTracker()
+    (track,) = tracker.update([(0, 0, 100, 100)], now=0.0)
+    (moved,) = tracker.update([(40, 0, 140, 100)], now=0.1)  # IoU below the threshold
+    assert moved.id == track.id
+
+
+def test_unseen_tracks_are_dropped():
+    tracker = FaceTracker(max_missing=1.0)
+    (track,) = tracker.update([(0, 0, 100, 100)], now=0.0)
+    (again,) = tracker.update([(0, 0, 100, 100)], now=2.0)
+    assert again.id != track.id
+
+
+def test_one_request_per_track_until_result():
+    tracker = FaceTracker(pending_timeout=5.0)
+    (track,) = tracker.update([(0, 0, 100, 100)], now=0.0)
+    assert tracker.needs_recognition(track, now=0.0)
+    assert not tracker.needs_recognition(track, now=1.0)
+    assert tracker.needs_recognition(track, now=6.0)  # request lost
+
+
+def test_identity_is_cached_for_its_ttl():
+    tracker = FaceTracker(identity_ttl=10.0, unknown_ttl=1.0)
+    known, unknown = tracker.update([(0, 0, 100, 100), (300, 0, 400, 100)], now=0.0)
+    for track in (known, unknown):
+        tracker.needs_recognition(track, now=0.0)
+    tracker.set_identity(known.id, "alice", "Recognized", now=0.0)
+    tracker.set_identity(unknown.id, "Not Recognized", "Not Recognized", now=0.0)
+    assert not tracker.needs_recognition(known, now=5.0)
+    assert tracker.needs_recognition(unknown, now=5.0)
+    assert tracker.needs_recognition(known, now=11.0)
+
+
+def test_failed_request_allows_retry():
+    tracker = FaceTracker()
+    (track,) = tracker.update([(0, 0, 100, 100)], now=0.0)
+    tracker.needs_recognition(track, now=0.0)
+    tracker.clear_pending(track.id)
+    assert tracker.needs_recognition(track, now=0.1)
+    assert tracker.stats()["recognitions"] == 2
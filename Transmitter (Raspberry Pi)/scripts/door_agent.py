@@ -0,0 +1,234 @@
+# Resident door / LED actuator for the Raspberry Pi.
+# Keeps GPIO set up and one MQTT connection open, and switches the door
+# output when the MEC publishes a command, instead of the MEC starting a new
+# Python interpreter over SSH for every recognition result.
+#
+#   doors/<CAMERA_ID>/actuator        commands: {"state": "unlocked" | "locked", "ttl": seconds,
+#                                               "ts": unix time, "sig": HMAC-SHA256 with DOOR_KEY}
+#   doors/<CAMERA_ID>/actuator/state  retained state reported back: "unlocked" / "locked" / "offline"
+#
+# Commands that are not signed with the key shared with the MEC, are older
+# than MAX_COMMAND_AGE or are not newer than the last one are ignored.
+#
+# Run on the Pi next to send_frames_mqtt.py (same DOOR_KEY as the MEC):
+#   CAMERA_ID=door1 DOOR_KEY=... python3 door_agent.py
+# Without the hardware (prints instead of driving GPIO):
+#   GPIO_BACKEND=fake DOOR_KEY=... python3 door_agent.py
+import os
+import hmac
+import json
+import time
+import hashlib
+import threading
+import paho.mqtt.client as mqtt
+
+# Raspberry PI IP address
+MQTT_BROKER = "127.0.0.1"
+# Door / camera name, the same as the frame sender's
+CAMERA_ID = os.environ.get("CAMERA_ID", "door1")
+MQTT_COMMAND = f"doors/{CAMERA_ID}/actuator"
+MQTT_STATE = f"doors/{CAMERA_ID}/actuator/state"
+# BCM pin of the LED / door relay
+LED_PIN = 22
+# "rpi": RPi.GPIO, "fake": print only, "auto": RPi.GPIO if it can be imported
+GPIO_BACKEND = os.environ.get("GPIO_BACKEND", "auto")
+# Lock again if the MEC goes quiet for this long while unlocked (0 = never)
+FAILSAFE_TTL = 30.0
+# Secret shared with the MEC (DOOR_KEY there too) that signs the commands
+DOOR_KEY = os.environ.get("DOOR_KEY", "")
+# Commands older than this many seconds (MEC clock, keep both in NTP sync) are replays
+MAX_COMMAND_AGE = 10.0
+# Broker login, if the broker does not take anonymous clients (see the README for the ACL)
+MQTT_USERNAME = os.environ.get("MQTT_USERNAME", "")
+MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
+
+
+# HMAC-SHA256 over every field of a command but "sig", the same as the MEC's actuator.command_signature
+def command_signature(command, key):
+    body = json.dumps({k: v for k, v in command.items() if k != "sig"}, sort_keys=True, separators=(",", ":"))
+    return hmac.new(key.encode(), body.encode(), hashlib.sha256).hexdigest()
+
+
+# RPi.GPIO output, set up once when the agent starts
+class RpiGpio:
+
+    def __init__(self, pin):
+        import RPi.GPIO as GPIO
+        self.GPIO = GPIO
+        self.pin = pin
+        GPIO.setmode(GPIO.BCM)  # choose BCM mode
+        GPIO.setwarnings(False)
+        GPIO.setup(pin, GPIO.OUT)
+
+    def write(self, value):
+        self.GPIO.output(self.pin, 1 if value else 0)
+
+    def close(self):
+        self.GPIO.cleanup(self.pin)
+
+
+# Stand-in for testing the agent without the hardware; remembers every write
+class FakeGpio:
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.value = 0
+        self.writes = []
+
+    def write(self, value):
+        self.value = 1 if value else 0
+        self.writes.append(self.value)
+        print(f"GPIO {self.pin} -> {self.value}")
+
+    def close(self):
+        pass
+
+
+def make_gpio(backend=GPIO_BACKEND, pin=LED_PIN):
+    if backend == "fake":
+        return FakeGpio(pin)
+    if backend == "rpi":
+        return RpiGpio(pin)
+    try:
+        return RpiGpio(pin)
+    except (ImportError, RuntimeError):
+        print("RPi.GPIO not available, using fake GPIO")
+        return FakeGpio(pin)
+
+
+# Door state machine on top of a GPIO output.
+# Commands only touch the pin on a change; an unlock carries a ttl and the
+# door locks itself when it runs out without a refresh from the MEC.
+# MQTT commands go through handle(), which only applies signed, fresh ones.
+class DoorAgent:
+
+    def __init__(self, gpio, key, on_state=None, failsafe_ttl=FAILSAFE_TTL, max_age=MAX_COMMAND_AGE):
+        if not key:
+            raise ValueError("a DOOR_KEY shared with the MEC is required")
+        self.gpio = gpio
+        self.key = key
+        self.on_state = on_state    # called with the new state after each change
+        self.failsafe_ttl = failsafe_ttl
+        self.max_age = max_age
+        self.last_ts = 0.0          # timestamp of the last accepted command
+        self.state = None
+        self.expires = None
+        self.commands = 0
+        self.changes = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._timer = None
+        self.apply("locked")    # Ensure LED is off at the start
+
+    def apply(self, state, ttl=None):
+        with self._lock:
+            self.commands += 1
+            if state == "unlocked":
+                ttl = ttl or self.failsafe_ttl
+                self.expires = time.monotonic() + ttl if ttl else None
+                self._arm_failsafe(ttl)
+            else:
+                state = "locked"
+                self.expires = None
+            changed = self._set(state)
+        if changed:
+            self._notify(state)
+        return changed
+
+    # Drive the pin if the state changes; called with the lock held
+    def _set(self, state):
+        if state == self.state:
+            return False
+        self.gpio.write(state == "unlocked")
+        self.state = state
+        self.changes += 1
+        return True
+
+    def _notify(self, state):
+        print(f"Door {state}")
+        if self.on_state is not None:
+            self.on_state(state)
+
+    def handle(self, payload, now=None):
+        try:
+            command = json.loads(payload)
+        except ValueError:
+            print(f"Bad actuator command: {payload!r}")
+            return
+        if not isinstance(command, dict) or not self.verify(command, now):
+            self.rejected += 1
+            print(f"Rejected actuator command: {payload!r}")
+            return
+        self.apply(command.get("state"), command.get("ttl"))
+
+    # Signed with the shared key, recent, and newer than the last accepted command
+    def verify(self, command, now=None):
+        now = time.time() if now is None else now
+        ts, sig = command.get("ts"), command.get("sig")
+        if not isinstance(ts, (int, float)) or not isinstance(sig, str):
+            return False
+        if not hmac.compare_digest(sig, command_signature(command, self.key)):
+            return False
+        if abs(now - ts) > self.max_age or ts <= self.last_ts:
+            return False
+        self.last_ts = ts
+        return True
+
+    def _arm_failsafe(self, ttl):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if ttl:
+            self._timer = threading.Timer(ttl, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _expire(self):
+        with self._lock:
+            if self.expires is None or time.monotonic() < self.expires:
+                return  # refreshed in the meantime
+            self.expires = None
+            changed = self._set("locked")
+        if changed:
+            print("No refresh from the MEC")
+            self._notify("locked")
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self.apply("locked")
+        self.gpio.close()
+
+
+def main():
+    if not DOOR_KEY:
+        print("Set DOOR_KEY to the key the MEC signs door commands with")
+        return
+    client = mqtt.Client()
+    if MQTT_USERNAME:
+        client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
+    # The broker marks the agent offline if the connection drops
+    client.will_set(MQTT_STATE, "offline", qos=1, retain=True)
+    agent = DoorAgent(make_gpio(), DOOR_KEY,
+                      on_state=lambda state: client.publish(MQTT_STATE, state, qos=1, retain=True))
+
+    def on_connect(client, userdata, flags, rc):
+        print(f"Connected to MQTT broker with result code {rc}")
+        client.subscribe(MQTT_COMMAND, qos=1)
+        client.publish(MQTT_STATE, agent.state, qos=1, retain=True)
+
+    client.on_connect = on_connect
+    client.on_message = lambda client, userdata, msg: agent.handle(msg.payload)
+    client.connect(MQTT_BROKER)
+    try:
+        client.loop_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        agent.close()
+        client.publish(MQTT_STATE, "offline", qos=1, retain=True)
+        client.disconnect()
+
+
+if __name__ == "__main__":
+    main()
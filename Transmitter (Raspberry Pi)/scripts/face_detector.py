@@ -0,0 +1,69 @@
+# Cheap face detection on the Pi for edge mode.
+# Faces are found with OpenCV's Haar cascade on a downscaled grayscale copy
+# of the frame (a few ms per frame on a Pi 4), or with the OpenCV DNN
+# res10 SSD when `model` / `config` are given. Boxes are returned in frame
+# coordinates; crop() cuts a padded face region so the recognition server
+# still sees some context around a tight or slightly misplaced box.
+import cv2
+
+
+class EdgeFaceDetector:
+
+    def __init__(self, width=320, scale_factor=1.1, min_neighbors=5, min_size=24,
+                 cascade=None, model=None, config=None, confidence=0.6):
+        self.width = width                  # width of the detection copy
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size            # smallest face, pixels of the detection copy
+        self.confidence = confidence        # DNN score threshold
+
+        self.net = None
+        self.cascade = None
+        if model:
+            self.net = cv2.dnn.readNet(model, config or "")
+        else:
+            self.cascade = cv2.CascadeClassifier(cascade or cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+            if self.cascade.empty():
+                raise RuntimeError("Could not load the Haar cascade")
+
+        self.frames = 0
+        self.faces = 0
+
+    # [(x_min, y_min, x_max, y_max), ...] in the coordinates of `frame`
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else frame
+
+        if self.net is not None:
+            blob = cv2.dnn.blobFromImage(small, 1.0, (300, 300), (104.0, 177.0, 123.0))
+            self.net.setInput(blob)
+            detections = self.net.forward()[0, 0]
+            boxes = [(int(d[3] * width), int(d[4] * height), int(d[5] * width), int(d[6] * height))
+                     for d in detections if d[2] >= self.confidence]
+        else:
+            gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+            found = self.cascade.detectMultiScale(gray, scaleFactor=self.scale_factor, minNeighbors=self.min_neighbors,
+                                                  minSize=(self.min_size, self.min_size))
+            boxes = [(int(x / scale), int(y / scale), int((x + w) / scale), int((y + h) / scale))
+                     for x, y, w, h in found]
+
+        boxes = [(max(0, x0), max(0, y0), min(width, x1), min(height, y1))
+                 for x0, y0, x1, y1 in boxes if x1 > x0 and y1 > y0]
+        self.frames += 1
+        self.faces += len(boxes)
+        return boxes
+
+    # Face region with `padding` (fraction of the box size) on every side;
+    # returns (crop origin (x, y), crop image)
+    @staticmethod
+    def crop(frame, box, padding=0.25):
+        height, width = frame.shape[:2]
+        x_min, y_min, x_max, y_max = box
+        pad_x, pad_y = int((x_max - x_min) * padding), int((y_max - y_min) * padding)
+        x0, y0 = max(0, x_min - pad_x), max(0, y_min - pad_y)
+        x1, y1 = min(width, x_max + pad_x), min(height, y_max + pad_y)
+        return (x0, y0), frame[y0:y1, x0:x1]
+
+    def stats(self):
+        return {"frames": self.frames, "faces": self.faces}
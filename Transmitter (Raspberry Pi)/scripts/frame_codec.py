@@ -0,0 +1,103 @@
+# Binary wire format for camera frames sent over MQTT.
+# The same file is used by the transmitter (Raspberry Pi) and the receiver (MEC).
+#
+# Payload = 24-byte little-endian header + raw encoded image bytes
+#
+#   magic     4s  b"FRM1"
+#   version   B
+#   codec     B   CODEC_JPEG / CODEC_PNG
+#   flags     H   FLAG_CROPS / FLAG_KEYFRAME, 0 for a plain frame
+#   seq       I   frame sequence number (wraps at 2**32)
+#   timestamp Q   capture time, microseconds since the epoch
+#   width     H
+#   height    H
+#
+# Edge mode (the Pi detects faces itself) publishes two more kinds of payload:
+#
+#   FLAG_CROPS     the body is the face crops of one frame instead of an image:
+#                  count H, then per crop a CROP_ENTRY (crop origin x, y and the
+#                  face box x_min, y_min, x_max, y_max in frame coordinates,
+#                  image length) followed by the encoded crop. width / height
+#                  are the size of the frame the boxes refer to.
+#   FLAG_KEYFRAME  a full frame for display; faces come in crop payloads, so
+#                  the receiver does not run detection on it.
+#
+# Legacy senders publish base64 text. A base64 JPEG always starts with "/9j/",
+# so it can never be mistaken for the magic above.
+import time
+import base64
+import struct
+from collections import namedtuple
+
+MAGIC = b"FRM1"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHIQHH")
+HEADER_SIZE = HEADER.size
+
+CODEC_JPEG = 1
+CODEC_PNG = 2
+
+FLAG_CROPS = 0x0001
+FLAG_KEYFRAME = 0x0002
+
+CROP_COUNT = struct.Struct("<H")
+CROP_ENTRY = struct.Struct("<HHHHHHI")
+
+FrameHeader = namedtuple("FrameHeader", ["version", "codec", "flags", "seq", "timestamp", "width", "height"])
+FaceCrop = namedtuple("FaceCrop", ["x", "y", "box", "image"])
+
+
+# Build a payload from already-encoded image bytes
+def pack_frame(image_bytes, seq, width, height, codec=CODEC_JPEG, timestamp=None, flags=0) -> bytes:
+    if timestamp is None:
+        timestamp = time.time()
+    header = HEADER.pack(MAGIC, VERSION, codec, flags, seq & 0xFFFFFFFF,
+                         int(timestamp * 1_000_000), width, height)
+    return b"".join((header, image_bytes))
+
+
+# Split a payload into (FrameHeader, image bytes as a memoryview).
+# No copy is made for binary payloads; legacy base64 payloads are decoded
+# and returned with header None when allow_legacy is set.
+def unpack_frame(payload, allow_legacy=True):
+    view = memoryview(payload)
+    if len(view) >= HEADER_SIZE and view[:4] == MAGIC:
+        magic, version, codec, flags, seq, timestamp_us, width, height = HEADER.unpack_from(view)
+        header = FrameHeader(version, codec, flags, seq, timestamp_us / 1_000_000, width, height)
+        return header, view[HEADER_SIZE:]
+
+    if not allow_legacy:
+        raise ValueError("Not a binary frame payload")
+    return None, memoryview(base64.b64decode(payload))
+
+
+# Header flags of a payload without unpacking it (0 for legacy payloads)
+def frame_flags(payload):
+    if len(payload) >= HEADER_SIZE and payload[:4] == MAGIC:
+        return HEADER.unpack_from(payload)[3]
+    return 0
+
+
+# Build a FLAG_CROPS payload from [((x, y), (x_min, y_min, x_max, y_max), encoded crop), ...]
+def pack_crops(crops, seq, width, height, codec=CODEC_JPEG, timestamp=None) -> bytes:
+    parts = [CROP_COUNT.pack(len(crops))]
+    for (x, y), box, image in crops:
+        parts.append(CROP_ENTRY.pack(x, y, *box, memoryview(image).nbytes))
+        parts.append(image)
+    return pack_frame(b"".join(parts), seq, width, height, codec, timestamp, flags=FLAG_CROPS)
+
+
+# FaceCrops of a FLAG_CROPS body; the images are memoryviews into the payload
+def unpack_crops(body):
+    view = memoryview(body)
+    (count,) = CROP_COUNT.unpack_from(view)
+    offset = CROP_COUNT.size
+    crops = []
+    for _ in range(count):
+        x, y, x_min, y_min, x_max, y_max, length = CROP_ENTRY.unpack_from(view, offset)
+        offset += CROP_ENTRY.size
+        if offset + length > len(view):
+            raise ValueError("Truncated crop payload")
+        crops.append(FaceCrop(x, y, (x_min, y_min, x_max, y_max), view[offset:offset + length]))
+        offset += length
+    return crops
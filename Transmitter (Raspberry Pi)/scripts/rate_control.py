@@ -0,0 +1,128 @@
+import time
+from threading import Lock
+
+# Quality ladder, best first: (scale of the receiver's frame size, JPEG quality, max FPS)
+LEVELS = [
+    (1.0, 80, 15),
+    (1.0, 65, 12),
+    (0.75, 60, 10),
+    (0.5, 50, 8),
+    (0.5, 40, 5),
+]
+
+
+# Adaptive resolution / JPEG quality / frame rate for the transmitter.
+# Two signals are used:
+#  - uplink: bytes written to the socket per second (paho on_publish), how
+#    long frames wait to be written, and how many are still queued in paho
+#  - receiver feedback published by the MEC on the feedback topic
+#    ({"width", "height", "fps", "capacity", "backlog"}); "fps" is the rate the
+#    receiver actually processed (low while it idles), "capacity" the rate it
+#    could process
+# Any sign of congestion drops one level at once; the level only goes back up
+# after `upgrade_after` consecutive healthy intervals.
+class RateController:
+
+    def __init__(self, width=640, height=480, interval=1.0, max_inflight=2,
+                 max_backlog=5, upgrade_after=5, levels=LEVELS):
+        self.target_width = width      # frame size the receiver works on
+        self.target_height = height
+        self.interval = interval
+        self.max_inflight = max_inflight
+        self.max_backlog = max_backlog
+        self.upgrade_after = upgrade_after
+        self.levels = levels
+        self.level = 0
+
+        self.receiver_fps = None
+        self.receiver_capacity = None
+        self.receiver_backlog = 0
+
+        self._lock = Lock()
+        self._sent = {}            # mid -> (bytes, time handed to paho)
+        self._acked_bytes = 0
+        self._busy_time = 0.0
+        self._good_intervals = 0
+        self._last_adjust = time.time()
+        self.uplink_bps = 0.0
+
+    @property
+    def width(self):
+        return int(self.target_width * self.levels[self.level][0]) // 2 * 2
+
+    @property
+    def height(self):
+        return int(self.target_height * self.levels[self.level][0]) // 2 * 2
+
+    @property
+    def quality(self):
+        return self.levels[self.level][1]
+
+    @property
+    def fps(self):
+        fps = self.levels[self.level][2]
+        # Never send faster than the receiver says it can process. Receivers
+        # without a capacity estimate only cap at their processed rate while
+        # they have a backlog (an idle receiver processes few frames by design).
+        if self.receiver_capacity:
+            fps = min(fps, max(1.0, self.receiver_capacity))
+        elif self.receiver_fps and self.receiver_backlog:
+            fps = min(fps, max(1.0, self.receiver_fps * 1.2))
+        return fps
+
+    # A frame of `size` bytes was passed to client.publish()
+    def on_sent(self, mid, size):
+        with self._lock:
+            self._sent[mid] = (size, time.time())
+
+    # paho on_publish: the frame has been written to the socket
+    def on_published(self, mid):
+        with self._lock:
+            sent = self._sent.pop(mid, None)
+            if sent is not None:
+                self._acked_bytes += sent[0]
+                self._busy_time += time.time() - sent[1]
+
+    # Receiver feedback message (already parsed from JSON)
+    def on_feedback(self, feedback):
+        with self._lock:
+            if feedback.get("width") and feedback.get("height"):
+                self.target_width = int(feedback["width"])
+                self.target_height = int(feedback["height"])
+            self.receiver_fps = feedback.get("fps") or None
+            self.receiver_capacity = feedback.get("capacity") or None
+            self.receiver_backlog = feedback.get("backlog", 0)
+
+    # Call once per frame; re-evaluates the level every `interval` seconds
+    def update(self):
+        now = time.time()
+        if now - self._last_adjust < self.interval:
+            return
+
+        with self._lock:
+            elapsed = now - self._last_adjust
+            self.uplink_bps = self._acked_bytes / elapsed
+            inflight = len(self._sent)
+            # Share of the interval frames spent waiting to get onto the socket
+            busy = self._busy_time / elapsed
+            # Drop entries that were never confirmed (e.g. after a reconnect)
+            for mid in [m for m, (_, t) in self._sent.items() if now - t > 10]:
+                del self._sent[mid]
+            self._acked_bytes = 0
+            self._busy_time = 0.0
+            self._last_adjust = now
+
+            congested = (inflight > self.max_inflight or busy > 0.8
+                         or self.receiver_backlog > self.max_backlog)
+            if congested:
+                self._good_intervals = 0
+                self.level = min(self.level + 1, len(self.levels) - 1)
+            else:
+                self._good_intervals += 1
+                if self._good_intervals >= self.upgrade_after and self.level > 0:
+                    self._good_intervals = 0
+                    self.level -= 1
+
+    def stats(self):
+        return {"level": self.level, "width": self.width, "height": self.height,
+                "quality": self.quality, "fps": self.fps, "uplink_kbps": self.uplink_bps * 8 / 1000}
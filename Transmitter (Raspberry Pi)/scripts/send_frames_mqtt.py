@@ -2,33 +2,133 @@
 import cv2 as cv
 import paho.mqtt.client as mqtt
 import base64
+import json
+import os
 import time
+import frame_codec
+from rate_control import RateController
+from motion_gate import MotionGate
+from face_detector import EdgeFaceDetector
 # Raspberry PI IP address
 MQTT_BROKER = "127.0.0.1"
+# Door / camera name, one per Raspberry Pi (e.g. CAMERA_ID=door2)
+CAMERA_ID = os.environ.get("CAMERA_ID", "door1")
 # Topic on which frame will be published
-MQTT_SEND = "home/server"
+MQTT_SEND = f"doors/{CAMERA_ID}/frames"
+# Topic on which the receiver reports its frame size, processing FPS and backlog
+MQTT_FEEDBACK = f"doors/{CAMERA_ID}/feedback"
+# "binary": raw JPEG + frame_codec header, "base64": legacy text payload for old receivers
+WIRE_FORMAT = "binary"
+# Adapt resolution, JPEG quality and frame rate to the uplink and the receiver
+ADAPTIVE = True
+# Only publish frames with motion (plus a keyframe every KEYFRAME_INTERVAL seconds)
+MOTION_GATING = True
+KEYFRAME_INTERVAL = 5.0
+# Edge mode: detect faces on the Pi and publish only the padded face crops with
+# their boxes, plus a full keyframe every EDGE_KEYFRAME_INTERVAL seconds for the
+# dashboard (binary wire format only; EDGE_MODE=1 in the environment also turns it on)
+EDGE_MODE = os.environ.get("EDGE_MODE", "0") == "1"
+EDGE_KEYFRAME_INTERVAL = 5.0
+CROP_PADDING = 0.25
+CROP_QUALITY = 90
+# Frame size the receiver processes (updated from feedback)
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
 # Object to capture the frames
 cap = cv.VideoCapture(0)
+# Capture at the receiver's resolution instead of the camera maximum
+cap.set(cv.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+cap.set(cv.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+# Resolution / quality / FPS controller
+controller = RateController(FRAME_WIDTH, FRAME_HEIGHT)
+# Scene-change gate
+gate = MotionGate(pixel_threshold=25, min_changed=0.01, hold=2.0, keyframe_interval=KEYFRAME_INTERVAL)
+# Pi-side face detector (edge mode only)
+detector = EdgeFaceDetector() if EDGE_MODE else None
+# Receiver feedback
+def on_message(client, userdata, msg):
+ try:
+  controller.on_feedback(json.loads(msg.payload))
+ except ValueError:
+  pass
+# Subscribing in on_connect so the subscription survives reconnects
+def on_connect(client, userdata, flags, rc):
+ client.subscribe(MQTT_FEEDBACK)
+# Frame written to the socket
+def on_publish(client, userdata, mid):
+ controller.on_published(mid)
 # Phao-MQTT Clinet
 client = mqtt.Client()
+client.on_connect = on_connect
+client.on_message = on_message
+client.on_publish = on_publish
 # Establishing Connection with the Broker
 client.connect(MQTT_BROKER)
+# Network thread for feedback and publish confirmations
+client.loop_start()
+# Frame sequence number
+seq = 0
+# Capture time of the last edge keyframe
+last_keyframe = 0.0
 try:
  while True:
   start = time.time()
   # Read Frame
   _, frame = cap.read()
-  # Encoding the Frame
-  _, buffer = cv.imencode('.jpg', frame)
-  # Converting into encoded bytes
-  jpg_as_text = base64.b64encode(buffer)
-  # Publishig the Frame on the Topic home/server
-  client.publish(MQTT_SEND, jpg_as_text)
+  capture_time = time.time()
+  # Skipping frames where nothing changed
+  if MOTION_GATING and not gate.check(frame, capture_time):
+   delay = 1 / controller.fps - (time.time() - start)
+   if delay > 0:
+    time.sleep(delay)
+   continue
+  # Scaling to the current level (no-op at full resolution)
+  width, height = (controller.width, controller.height) if ADAPTIVE else (FRAME_WIDTH, FRAME_HEIGHT)
+  if frame.shape[1] != width or frame.shape[0] != height:
+   frame = cv.resize(frame, (width, height), interpolation=cv.INTER_AREA)
+  quality = controller.quality if ADAPTIVE else 80
+  payloads = []
+  if EDGE_MODE:
+   # Face crops and boxes of this frame, nothing if there is no face
+   boxes = detector.detect(frame)
+   if boxes:
+    crops = []
+    for box in boxes:
+     origin, crop = detector.crop(frame, box, CROP_PADDING)
+     _, encoded = cv.imencode('.jpg', crop, [cv.IMWRITE_JPEG_QUALITY, CROP_QUALITY])
+     crops.append((origin, box, encoded))
+    payloads.append(frame_codec.pack_crops(crops, seq, width, height, timestamp=capture_time))
+   # Occasional full frame so the dashboard still has a picture
+   if capture_time - last_keyframe >= EDGE_KEYFRAME_INTERVAL:
+    _, buffer = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, quality])
+    payloads.append(frame_codec.pack_frame(buffer, seq, width, height, timestamp=capture_time,
+                                           flags=frame_codec.FLAG_KEYFRAME))
+    last_keyframe = capture_time
+  else:
+   # Encoding the Frame
+   _, buffer = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, quality])
+   # Adding the header (sequence number, capture time, size, codec)
+   if WIRE_FORMAT == "binary":
+    payloads.append(frame_codec.pack_frame(buffer, seq, width, height, timestamp=capture_time))
+   else:
+    payloads.append(base64.b64encode(buffer))
+  seq += 1
+  # Publishig the Frame on the Topic doors/<camera>/frames
+  for payload in payloads:
+   info = client.publish(MQTT_SEND, payload)
+   controller.on_sent(info.mid, len(payload))
+  if ADAPTIVE:
+   controller.update()
+   # Pacing to the current frame rate
+   delay = 1 / controller.fps - (time.time() - start)
+   if delay > 0:
+    time.sleep(delay)
   end = time.time()
   t = end - start
   fps = 1/t
   print(fps)
 except:
  cap.release()
+ client.loop_stop()
  client.disconnect()
- print("\nNow you can restart fresh")
\ No newline at end of file
+ print("\nNow you can restart fresh")
@@ -0,0 +1,122 @@
+import json
+import time
+import pytest
+from door_agent import DoorAgent, FakeGpio, command_signature, make_gpio
+
+KEY = "door-secret"
+
+
+def agent(**kwargs):
+    states = []
+    door = DoorAgent(FakeGpio(22), KEY, on_state=states.append, **kwargs)
+    return door, states
+
+
+# A command as the MEC's actuator publishes it
+def signed(ts=None, key=KEY, **command):
+    command["ts"] = time.time() if ts is None else ts
+    command["sig"] = command_signature(command, key)
+    return json.dumps(command)
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_fake_gpio_records_writes():
+    gpio = FakeGpio(22)
+    gpio.write(True)
+    gpio.write(0)
+    assert gpio.writes == [1, 0] and gpio.value == 0
+
+
+def test_fallback_to_fake_gpio():
+    assert isinstance(make_gpio("fake", 5), FakeGpio)
+    assert isinstance(make_gpio("auto", 5), FakeGpio)  # no RPi.GPIO off the Pi
+
+
+def test_starts_locked():
+    door, states = agent()
+    assert door.state == "locked"
+    assert door.gpio.writes == [0]
+    assert states == ["locked"]
+
+
+def test_pin_only_changes_on_a_new_state():
+    door, states = agent(failsafe_ttl=0)
+    assert door.apply("unlocked")
+    assert not door.apply("unlocked")
+    assert door.apply("locked")
+    assert door.gpio.writes == [0, 1, 0]
+    assert states == ["locked", "unlocked", "locked"]
+    assert (door.commands, door.changes) == (4, 3)
+
+
+def test_json_commands():
+    door, _ = agent(failsafe_ttl=0)
+    door.handle(signed(state="unlocked"))
+    assert door.state == "unlocked"
+    door.handle(b"not json")
+    assert door.state == "unlocked"
+    door.handle(signed(state="anything else"))
+    assert door.state == "locked"
+
+
+def test_unsigned_forged_and_stale_commands_are_ignored():
+    door, _ = agent(failsafe_ttl=0)
+    command = signed(ts=1000.0, state="unlocked")
+    for payload in (json.dumps({"state": "unlocked"}),                          # unsigned
+                    signed(ts=1000.0, key="guessed", state="unlocked"),          # wrong key
+                    command.replace('"unlocked"', '"unlocked", "ttl": 3600'),   # altered after signing
+                    json.dumps(["unlocked"])):
+        door.handle(payload, now=1000.0)
+    assert door.state == "locked" and door.rejected == 4
+
+    door.handle(command, now=1020.0)  # too old
+    assert door.state == "locked"
+    door.handle(command, now=1001.0)
+    assert door.state == "unlocked"
+
+    door.apply("locked")
+    door.handle(command, now=1002.0)  # replayed
+    assert door.state == "locked" and door.rejected == 6
+
+
+def test_agent_needs_a_key():
+    with pytest.raises(ValueError):
+        DoorAgent(FakeGpio(22), "")
+
+
+def test_signature_matches_the_mec():
+    # The same vector is checked in the MEC's test_actuator.py
+    command = {"state": "unlocked", "ttl": 30.0, "ts": 1700000000.5}
+    assert command_signature(command, KEY) == "e773f94ba41b0b519dc0d94ccebea3343f8fb16a95279db0020f1f202348820c"
+
+
+def test_failsafe_ttl_locks_without_refresh():
+    door, states = agent()
+    door.handle(signed(state="unlocked", ttl=0.05))
+    assert door.state == "unlocked"
+    assert wait_for(lambda: door.state == "locked")
+    assert states == ["locked", "unlocked", "locked"]
+    assert door.gpio.value == 0
+
+
+def test_refresh_keeps_the_door_unlocked():
+    door, _ = agent()
+    door.apply("unlocked", ttl=0.2)
+    for _ in range(3):
+        time.sleep(0.1)
+        door.apply("unlocked", ttl=0.2)
+    assert door.state == "unlocked"
+    assert wait_for(lambda: door.state == "locked")
+
+
+def test_close_locks():
+    door, _ = agent()
+    door.apply("unlocked", ttl=60)
+    door.close()
+    assert door.state == "locked" and door.gpio.value == 0
@@ -0,0 +1,72 @@
+from rate_control import RateController, LEVELS
+
+
+# interval=0: every update() re-evaluates the level
+def controller(**kwargs):
+    kwargs.setdefault("interval", 0.0)
+    return RateController(**kwargs)
+
+
+def test_best_level_at_start():
+    rate = controller(width=640, height=480)
+    assert (rate.width, rate.height, rate.quality, rate.fps) == (640, 480, LEVELS[0][1], LEVELS[0][2])
+
+
+def test_frame_size_follows_the_receiver():
+    rate = controller()
+    rate.on_feedback({"width": 1280, "height": 720})
+    assert (rate.width, rate.height) == (1280, 720)
+
+
+def test_receiver_backlog_drops_one_level_per_interval():
+    rate = controller(max_backlog=5)
+    rate.on_feedback({"backlog": 10})
+    rate.update()
+    assert rate.level == 1
+    rate.update()
+    assert rate.level == 2
+    assert (rate.width, rate.height) == (480, 360)
+
+
+def test_level_bottoms_out():
+    rate = controller()
+    rate.on_feedback({"backlog": 100})
+    for _ in range(len(LEVELS) + 3):
+        rate.update()
+    assert rate.level == len(LEVELS) - 1
+
+
+def test_unacknowledged_frames_count_as_congestion():
+    rate = controller(max_inflight=2)
+    for mid in range(3):
+        rate.on_sent(mid, 1000)
+    rate.update()
+    assert rate.level == 1
+
+
+def test_level_recovers_after_healthy_intervals():
+    rate = controller(upgrade_after=3)
+    rate.on_feedback({"backlog": 10})
+    rate.update()
+    rate.on_feedback({"backlog": 0})
+    for _ in range(2):
+        rate.update()
+    assert rate.level == 1
+    rate.update()
+    assert rate.level == 0
+
+
+def test_frame_rate_capped_by_the_receiver_capacity():
+    rate = controller()
+    rate.on_feedback({"fps": 1, "capacity": 8})
+    assert rate.fps == 8.0
+    rate.on_feedback({"fps": 1, "capacity": 0.5})
+    assert rate.fps == 1.0
+
+
+def test_processed_rate_only_caps_with_a_backlog():
+    rate = controller()
+    rate.on_feedback({"fps": 2, "backlog": 0})
+    assert rate.fps == rate.levels[0][2]  # an idle receiver processes few frames by design
+    rate.on_feedback({"fps": 5, "backlog": 3})
+    assert rate.fps == 6.0